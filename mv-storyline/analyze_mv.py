@@ -1,20 +1,27 @@
+import argparse
+import asyncio
+import hashlib
+import random
 import sys
 import json
 import os
 import re
 from dotenv import load_dotenv
 from google import genai
+from google.genai import errors
 from google.genai.types import Part
 
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
-GEMINI_API = os.getenv("GEMINI_API")
-if not GEMINI_API:
-    print("Error: GEMINI_API not found in .env", file=sys.stderr)
-    sys.exit(1)
-
-client = genai.Client(api_key=GEMINI_API)
 MODEL = "gemini-2.5-flash"
+OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Model results by video id and prompt/model hash, so re-runs skip the call
+CACHE_DIR = os.path.join(OUTPUT_DIR, ".cache")
+
+# Rate limits and transient server errors are retried with backoff
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+MAX_BACKOFF_SECONDS = 60.0
 
 PROMPT = """You are analyzing a K-pop music video to generate game data for an escape room game. Watch the entire video carefully and produce a JSON response with exactly this structure:
 
@@ -89,16 +96,30 @@ Rules:
 Return ONLY valid JSON, no markdown fences or extra text."""
 
 
-def analyze_mv(youtube_url: str) -> dict:
-    response = client.models.generate_content(
-        model=MODEL,
-        contents=[
-            Part.from_uri(file_uri=youtube_url, mime_type="video/mp4"),
-            PROMPT,
-        ],
-    )
+def make_client() -> genai.Client:
+    api_key = os.getenv("GEMINI_API")
+    if not api_key:
+        print("Error: GEMINI_API not found in .env", file=sys.stderr)
+        sys.exit(1)
+    return genai.Client(api_key=api_key)
+
+
+def video_id_of(url: str) -> str:
+    match = re.search(r"(?:v=|youtu\.be/)([\w-]+)", url)
+    return match.group(1) if match else "output"
+
 
-    text = response.text.strip()
+def prompt_hash() -> str:
+    """Changes whenever MODEL or PROMPT does, invalidating cached results."""
+    return hashlib.sha256(f"{MODEL}\n{PROMPT}".encode()).hexdigest()[:12]
+
+
+def cache_path(video_id: str) -> str:
+    return os.path.join(CACHE_DIR, f"{video_id}-{prompt_hash()}.json")
+
+
+def parse_response(text: str) -> dict:
+    text = text.strip()
     # Strip markdown code fences if present
     if text.startswith("```"):
         text = text.split("\n", 1)[1]
@@ -110,30 +131,129 @@ def analyze_mv(youtube_url: str) -> dict:
     return json.loads(text.strip())
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python analyze_mv.py <youtube_url>", file=sys.stderr)
-        print("Example: python analyze_mv.py https://www.youtube.com/watch?v=dQw4w9WgXcQ", file=sys.stderr)
-        sys.exit(1)
+def retry_delay(error: errors.APIError, attempt: int) -> float:
+    """Seconds to wait before retrying: the server's RetryInfo if given, else backoff."""
+    details = error.details if isinstance(error.details, dict) else {}
+    for detail in details.get("error", {}).get("details", []):
+        delay = detail.get("retryDelay")  # e.g. "13s"
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return min(float(delay[:-1]), MAX_BACKOFF_SECONDS)
+            except ValueError:
+                pass
+    return min(2**attempt + random.random(), MAX_BACKOFF_SECONDS)
 
-    url = sys.argv[1]
-    print(f"Analyzing music video: {url}", file=sys.stderr)
-    print("This may take a minute...", file=sys.stderr)
 
-    result = analyze_mv(url)
+async def analyze_mv_async(youtube_url: str, client: genai.Client) -> dict:
+    """Have the model watch one MV and return its game data.
 
-    # Extract video ID from URL for the filename and enforce correct values
-    match = re.search(r"(?:v=|youtu\.be/)([\w-]+)", url)
-    video_id = match.group(1) if match else "output"
+    Rate limits and server errors are retried, waiting as long as the
+    server asks (retryDelay) or with exponential backoff.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = await client.aio.models.generate_content(
+                model=MODEL,
+                contents=[
+                    Part.from_uri(file_uri=youtube_url, mime_type="video/mp4"),
+                    PROMPT,
+                ],
+            )
+            return parse_response(response.text)
+        except errors.APIError as e:
+            if e.code not in RETRYABLE_CODES or attempt == MAX_RETRIES:
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"{youtube_url}: {e.code}, retrying in {delay:.1f}s", file=sys.stderr)
+            await asyncio.sleep(delay)
+
+
+def save_result(url: str, result: dict) -> str:
+    """Write <video_id>.json, enforcing the id and URL the model may get wrong."""
+    video_id = video_id_of(url)
     result["mv_id"] = video_id
     result["audio_url"] = url
-    output_path = os.path.join(os.path.dirname(__file__), f"{video_id}.json")
-
+    output_path = os.path.join(OUTPUT_DIR, f"{video_id}.json")
 
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2, ensure_ascii=False)
+    return output_path
+
+
+async def analyze_batch(
+    urls: list[str], client: genai.Client, concurrency: int = 4, force: bool = False
+) -> dict[str, str | Exception]:
+    """Analyze many MVs concurrently, at most `concurrency` model calls at a time.
+
+    A video whose result is cached for the current model and prompt is
+    saved from the cache without a call, unless force is set. Returns the
+    output path or the error of each URL.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    async def run(url: str) -> str:
+        cached = cache_path(video_id_of(url))
+        if not force and os.path.exists(cached):
+            with open(cached, encoding="utf-8") as f:
+                result = json.load(f)
+            print(f"{url}: cached", file=sys.stderr)
+        else:
+            async with semaphore:
+                print(f"Analyzing music video: {url}", file=sys.stderr)
+                result = await analyze_mv_async(url, client)
+            # Written aside and renamed, so an interrupted run leaves no partial entry
+            with open(cached + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(cached + ".tmp", cached)
+        return save_result(url, result)
 
-    print(f"Saved to {output_path}", file=sys.stderr)
+    # URLs of the same video would race for the same files, so run the first only
+    by_video: dict[str, str] = {}
+    for url in urls:
+        by_video.setdefault(video_id_of(url), url)
+    unique = list(by_video.values())
+    outcomes = await asyncio.gather(*(run(url) for url in unique), return_exceptions=True)
+    return dict(zip(unique, outcomes))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate escape room game data from K-pop music videos.",
+        epilog="Example: python analyze_mv.py https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    )
+    parser.add_argument("urls", nargs="*", help="YouTube URLs to analyze")
+    parser.add_argument("-f", "--file", help="file with one YouTube URL per line")
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=4, help="max concurrent model calls (default: 4)"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="call the model even if a cached result exists"
+    )
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            urls += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not urls:
+        parser.print_usage(sys.stderr)
+        sys.exit(1)
+
+    print(f"{len(urls)} video(s), this may take a minute...", file=sys.stderr)
+    outcomes = asyncio.run(
+        analyze_batch(urls, make_client(), concurrency=max(1, args.concurrency), force=args.force)
+    )
+
+    failed = 0
+    for url, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            failed += 1
+            print(f"Failed {url}: {outcome}", file=sys.stderr)
+        else:
+            print(f"Saved to {outcome}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.genai")
+from google.genai import errors  # noqa: E402
+
+import analyze_mv  # noqa: E402
+
+real_sleep = asyncio.sleep
+
+
+def url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+class FakeClient:
+    """Stands in for genai.Client: client.aio.models.generate_content(...).
+
+    Records each call's model and prompt and the peak number of calls in
+    flight. failures maps a video URL to errors raised by its first calls.
+    """
+
+    def __init__(self, latency: float = 0.02, failures: dict | None = None):
+        self.latency = latency
+        self.failures = failures or {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self.generate_content))
+
+    async def generate_content(self, model, contents):
+        video, prompt = contents
+        video_url = video.file_data.file_uri
+        self.calls.append((video_url, model, prompt))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await real_sleep(self.latency)
+            pending = self.failures.get(video_url)
+            if pending:
+                raise pending.pop(0)
+            return SimpleNamespace(text=json.dumps({"title": video_url, "members": []}))
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def output_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(analyze_mv, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(analyze_mv, "CACHE_DIR", str(tmp_path / ".cache"))
+    return tmp_path
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Delays the retry loop waited for, without waiting."""
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(analyze_mv.asyncio, "sleep", sleep)
+    return delays
+
+
+def rate_limited(retry_delay: str) -> errors.ClientError:
+    return errors.ClientError(429, {"error": {
+        "code": 429,
+        "message": "Resource has been exhausted",
+        "status": "RESOURCE_EXHAUSTED",
+        "details": [
+            {"@type": "type.googleapis.com/google.rpc.QuotaFailure", "violations": []},
+            {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": retry_delay},
+        ],
+    }})
+
+
+def test_batch_is_bounded_by_concurrency(output_dirs):
+    client = FakeClient()
+    urls = [url(f"video{i:06d}") for i in range(10)]
+
+    outcomes = asyncio.run(analyze_mv.analyze_batch(urls, client, concurrency=3))
+
+    assert len(client.calls) == 10
+    assert client.max_in_flight == 3
+    assert outcomes[urls[4]] == os.path.join(str(output_dirs), "video000004.json")
+    with open(outcomes[urls[4]], encoding="utf-8") as f:
+        saved = json.load(f)
+    assert (saved["mv_id"], saved["audio_url"]) == ("video000004", urls[4])
+
+
+def test_rate_limit_is_retried_after_the_servers_retry_delay(sleeps):
+    video = url("limited0001")
+    client = FakeClient(failures={video: [rate_limited("13s"), rate_limited("1.5s")]})
+
+    outcomes = asyncio.run(analyze_mv.analyze_batch([video], client))
+
+    assert sleeps == [13.0, 1.5]
+    assert len(client.calls) == 3
+    assert not isinstance(outcomes[video], Exception)
+
+
+def test_errors_are_reported_per_video(sleeps):
+    bad, good = url("forbidden01"), url("fine0000001")
+    forbidden = errors.ClientError(403, {"error": {"code": 403, "message": "Forbidden"}})
+    client = FakeClient(failures={bad: [forbidden]})
+
+    outcomes = asyncio.run(analyze_mv.analyze_batch([bad, good], client))
+
+    assert outcomes[bad] is forbidden  # not retryable
+    assert sleeps == []
+    assert not isinstance(outcomes[good], Exception)
+
+
+def test_cached_result_skips_the_model_call():
+    video = url("cached00001")
+    asyncio.run(analyze_mv.analyze_batch([video], FakeClient()))
+
+    client = FakeClient()
+    outcomes = asyncio.run(analyze_mv.analyze_batch([video], client))
+
+    assert client.calls == []
+    assert os.path.exists(outcomes[video])
+
+    asyncio.run(analyze_mv.analyze_batch([video], client, force=True))
+    assert len(client.calls) == 1
+
+
+@pytest.mark.parametrize("setting, value", [("PROMPT", "A shorter prompt"), ("MODEL", "gemini-2.5-pro")])
+def test_prompt_or_model_change_invalidates_the_cache(monkeypatch, setting, value):
+    video = url("changed0001")
+    asyncio.run(analyze_mv.analyze_batch([video], FakeClient()))
+    old_key = analyze_mv.cache_path("changed0001")
+
+    monkeypatch.setattr(analyze_mv, setting, value)
+    client = FakeClient()
+    asyncio.run(analyze_mv.analyze_batch([video], client))
+
+    assert analyze_mv.cache_path("changed0001") != old_key
+    assert [(model, prompt) for _, model, prompt in client.calls] == [
+        (analyze_mv.MODEL, analyze_mv.PROMPT)
+    ]
+
+
+def test_repeated_urls_of_one_video_share_a_call():
+    client = FakeClient()
+    urls = [url("repeated001"), "https://youtu.be/repeated001"]
+
+    outcomes = asyncio.run(analyze_mv.analyze_batch(urls, client))
+
+    assert list(outcomes) == [urls[0]]
+    assert len(client.calls) == 1
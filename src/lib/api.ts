@@ -11,6 +11,11 @@ export interface FrameInfo {
   url: string;
   width: number;
   height: number;
+  format?: string;
+  /** Downscaled variants keyed by name, e.g. { "480p": url } */
+  variants?: Record<string, string>;
+  /** Laplacian variance of the chosen frame, set with sharpness selection */
+  sharpness?: number | null;
 }
 
 export interface VideoInfo {
@@ -20,13 +25,36 @@ export interface VideoInfo {
   video_id: string;
 }
 
+export interface JobStats {
+  /** Seconds per pipeline stage, e.g. { download: 3.2, detect: 5.1 } */
+  stages: Record<string, number>;
+  total_seconds?: number | null;
+  /** Of the decoded video (the 360p copy with the detect download profile) */
+  width?: number | null;
+  height?: number | null;
+  fps?: number | null;
+  frame_count?: number | null;
+  frames_decoded?: number | null;
+  /** 0 when the video came from the server's video cache */
+  bytes_downloaded?: number | null;
+  bytes_uploaded?: number | null;
+  /** cProfile dump, for jobs started with profile: true */
+  profile_url?: string | null;
+}
+
 export interface JobStatus {
   job_id: string;
   status: "queued" | "downloading" | "detecting_scenes" | "extracting_frames" | "uploading" | "completed" | "failed";
+  /** Overall progress in percent (0-100) */
+  progress?: number;
   video_info?: VideoInfo | null;
   frames?: FrameInfo[];
   total_frames?: number;
   error?: string;
+  /** 1 = next to start, set while status is "queued" */
+  queue_position?: number | null;
+  /** Per-stage timings and counters, once the job has finished */
+  stats?: JobStats | null;
 }
 
 /** Start frame extraction for a YouTube URL */
@@ -43,6 +71,44 @@ export async function startExtraction(youtubeUrl: string): Promise<ExtractionJob
   return res.json();
 }
 
+export interface BatchItem {
+  youtube_url: string;
+  job_id: string;
+  status: JobStatus["status"] | "unknown";
+  progress: number;
+}
+
+export interface BatchStatus {
+  batch_id: string;
+  status: "queued" | "processing" | "completed" | "completed_with_errors" | "failed";
+  /** Number of distinct jobs; repeated URLs share one */
+  total: number;
+  /** Distinct jobs per status */
+  counts: Record<string, number>;
+  items: BatchItem[];
+}
+
+/** Start frame extraction for several YouTube URLs as one batch */
+export async function startBatchExtraction(youtubeUrls: string[]): Promise<BatchStatus> {
+  const res = await fetch(`${API_BASE}/api/extract/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ items: youtubeUrls.map((url) => ({ youtube_url: url })) }),
+  });
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}));
+    throw new Error(err.detail ?? "Failed to start batch extraction");
+  }
+  return res.json();
+}
+
+/** Get per-item and aggregate status of a batch */
+export async function getBatchStatus(batchId: string): Promise<BatchStatus> {
+  const res = await fetch(`${API_BASE}/api/extract/batch/${batchId}`);
+  if (!res.ok) throw new Error("Failed to fetch batch status");
+  return res.json();
+}
+
 /** Get current status of an extraction job */
 export async function getJobStatus(jobId: string): Promise<JobStatus> {
   const res = await fetch(`${API_BASE}/api/jobs/${jobId}`);
@@ -50,6 +116,44 @@ export async function getJobStatus(jobId: string): Promise<JobStatus> {
   return res.json();
 }
 
+export interface ExactFrames {
+  job_id: string;
+  /** "cache" = decoded from the kept video, "remote" = fetched from the stream */
+  source: "cache" | "remote";
+  /** index is the frame number, in timestamp order */
+  frames: FrameInfo[];
+}
+
+/** Extract frames at exact timestamps (seconds) from a completed job's video */
+export async function extractFramesAt(jobId: string, timestamps: number[]): Promise<ExactFrames> {
+  const res = await fetch(`${API_BASE}/api/jobs/${jobId}/frames`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ timestamps }),
+  });
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}));
+    throw new Error(err.detail ?? "Failed to extract frames");
+  }
+  return res.json();
+}
+
+/**
+ * URL of a frame resized to `width` (never upscaled) and/or re-encoded to `format`.
+ * Only frames served by the API (`/frames/...`) can be resized; other URLs are returned as-is.
+ */
+export function frameVariantUrl(
+  url: string,
+  options: { width?: number; format?: "png" | "jpeg" | "webp" | "avif" },
+): string {
+  if (!url.startsWith("/frames/")) return url;
+  const params = new URLSearchParams();
+  if (options.width) params.set("width", String(options.width));
+  if (options.format) params.set("format", options.format);
+  const query = params.toString();
+  return `${API_BASE}${url}${query ? `?${query}` : ""}`;
+}
+
 /** Poll job status until completed or failed */
 export function pollJobStatus(
   jobId: string,
@@ -75,3 +179,47 @@ export function pollJobStatus(
 
   return () => { stopped = true; };
 }
+
+export interface JobStreamHandlers {
+  /** Stage or percent progress changed */
+  onStatus?: (update: Pick<JobStatus, "status" | "progress" | "queue_position">) => void;
+  onVideo?: (video: VideoInfo) => void;
+  /** A frame finished uploading; frames arrive in completion order */
+  onFrame?: (frame: FrameInfo) => void;
+  /** Final status (completed or failed) */
+  onDone: (status: JobStatus) => void;
+}
+
+/** Follow a job over Server-Sent Events; falls back to polling if the stream fails */
+export function streamJobStatus(jobId: string, handlers: JobStreamHandlers): () => void {
+  const poll = () =>
+    pollJobStatus(jobId, (status) => {
+      handlers.onStatus?.(status);
+      if (status.status === "completed" || status.status === "failed") handlers.onDone(status);
+    });
+
+  if (typeof EventSource === "undefined") return poll();
+
+  const source = new EventSource(`${API_BASE}/api/jobs/${jobId}/events`);
+  let stopPolling: (() => void) | null = null;
+  let done = false;
+
+  source.addEventListener("status", (e) => handlers.onStatus?.(JSON.parse((e as MessageEvent).data)));
+  source.addEventListener("video", (e) => handlers.onVideo?.(JSON.parse((e as MessageEvent).data)));
+  source.addEventListener("frame", (e) => handlers.onFrame?.(JSON.parse((e as MessageEvent).data)));
+  source.addEventListener("done", (e) => {
+    done = true;
+    source.close();
+    handlers.onDone(JSON.parse((e as MessageEvent).data));
+  });
+  source.onerror = () => {
+    if (done || stopPolling) return;
+    source.close();
+    stopPolling = poll();
+  };
+
+  return () => {
+    source.close();
+    stopPolling?.();
+  };
+}
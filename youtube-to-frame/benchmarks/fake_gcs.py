@@ -0,0 +1,128 @@
+"""Minimal in-process GCS upload endpoint for offline benchmarks.
+
+Serves just the JSON API's multipart upload and media download on
+127.0.0.1, which is what GCSStorage uses for frames and manifests, so the
+real google-cloud-storage client and its connection pool are exercised with
+STORAGE_EMULATOR_HOST pointed here. Downloads honour ifGenerationNotMatch
+(304), like the real endpoint. latency adds a fixed delay per request to
+stand in for the network.
+
+Tests can queue error statuses for an object name in failures (answered
+in order, before the upload is accepted) and read the highest number of
+uploads in flight at once from max_in_flight.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class FakeGCS:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.objects: dict[str, tuple[int, bytes]] = {}  # "bucket/name" -> (generation, data)
+        self.requests: dict[str, int] = {"GET": 0, "POST": 0}
+        self.failures: dict[str, list[int]] = {}  # object name -> statuses to return first
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeGCS":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                # /upload/storage/v1/b/{bucket}/o?uploadType=multipart, the
+                # first part is the object's JSON metadata, the second its data
+                bucket = unquote(urlparse(self.path).path.split("/")[5])
+                boundary = body.split(b"\r\n", 1)[0]
+                parts = body.split(boundary)
+                meta = json.loads(parts[1].split(b"\r\n\r\n", 1)[1])
+                data = parts[2].split(b"\r\n\r\n", 1)[1][:-2]
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    self._delay("POST")
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+                        failures = fake.failures.get(meta["name"])
+                        status = failures.pop(0) if failures else None
+                if status is not None:
+                    error = {"error": {"code": status, "message": "injected failure"}}
+                    self._reply(status, json.dumps(error).encode(),
+                                {"Content-Type": "application/json"})
+                    return
+                generation = time.time_ns()
+                with fake._lock:
+                    fake.objects[f"{bucket}/{meta['name']}"] = (generation, data)
+                self._reply(200, json.dumps({
+                    "bucket": bucket,
+                    "name": meta["name"],
+                    "generation": str(generation),
+                    "contentType": meta.get("contentType"),
+                    "size": str(len(data)),
+                }).encode(), {"Content-Type": "application/json"})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                segments = url.path.split("/")
+                if segments[1] != "download":
+                    # Bucket metadata, which the client looks up in the background
+                    bucket = unquote(segments[4])
+                    self._reply(200, json.dumps({"name": bucket}).encode(),
+                                {"Content-Type": "application/json"})
+                    return
+                # /download/storage/v1/b/{bucket}/o/{name}?alt=media
+                key = f"{unquote(segments[5])}/{unquote('/'.join(segments[7:]))}"
+                query = parse_qs(url.query)
+                self._delay("GET")
+                with fake._lock:
+                    stored = fake.objects.get(key)
+                if stored is None:
+                    self._reply(404, b'{"error": {"code": 404}}', {})
+                elif query.get("ifGenerationNotMatch") == [str(stored[0])]:
+                    self._reply(304, b"", {})
+                else:
+                    self._reply(200, stored[1], {"X-Goog-Generation": str(stored[0])})
+
+            def _delay(self, method: str) -> None:
+                with fake._lock:
+                    fake.requests[method] += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+            def _reply(self, status: int, out: bytes, headers: dict) -> None:
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        return Handler
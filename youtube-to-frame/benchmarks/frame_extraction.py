@@ -0,0 +1,82 @@
+"""Compare FrameExtractor strategies on a synthetic clip.
+
+    python -m benchmarks.frame_extraction --max-frames 50 --gop 250
+
+Runs entirely offline: the clip is generated with cv2.VideoWriter.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_video
+from services.frame_extractor import FrameExtractor
+from services.scene_detector import Scene
+
+
+def _scenes_from_cuts(cuts: list[int], total: int, fps: float, max_frames: int) -> list[Scene]:
+    edges = [0] + cuts + [total]
+    scenes = [
+        Scene(
+            index=i,
+            start_time=a / fps,
+            end_time=b / fps,
+            mid_time=(a + b) / 2 / fps,
+            duration=(b - a) / fps,
+        )
+        for i, (a, b) in enumerate(zip(edges[:-1], edges[1:]))
+    ]
+    return scenes[:max_frames]
+
+
+def run(args) -> dict:
+    results = {"params": vars(args), "strategies": {}}
+    with tempfile.TemporaryDirectory(prefix="mv-bench-") as tmpdir:
+        video_path = os.path.join(tmpdir, "video.mp4")
+        cuts = make_video(
+            video_path,
+            width=args.width,
+            height=args.height,
+            fps=args.fps,
+            duration=args.duration,
+            scene_seconds=args.duration / args.max_frames,
+            gop=args.gop,
+        )
+        total = int(args.duration * args.fps)
+        scenes = _scenes_from_cuts(cuts, total, args.fps, args.max_frames)
+
+        for strategy in ("seek", "sequential", "auto"):
+            out_dir = os.path.join(tmpdir, strategy)
+            os.makedirs(out_dir)
+            extractor = FrameExtractor(strategy=strategy, max_walk_seconds=args.max_walk)
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                extracted = extractor.extract_at_timestamps(video_path, scenes, out_dir)
+                timings.append(time.perf_counter() - start)
+            results["strategies"][strategy] = {
+                "best_s": round(min(timings), 4),
+                "frames": len(extracted),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-frames", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=200.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--gop", type=int, default=250, help="keyframe interval")
+    parser.add_argument("--max-walk", type=float, default=1.0, help="auto always-walk limit (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
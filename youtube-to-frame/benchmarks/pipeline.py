@@ -0,0 +1,316 @@
+"""Time each extraction pipeline stage on synthetic clips, offline.
+
+    python -m benchmarks.pipeline --output bench.json
+    python -m benchmarks.pipeline --baseline bench.json --output new.json
+
+Clips are generated with cv2.VideoWriter (see benchmarks.synthetic) at a few
+resolutions, durations and cut densities. For each clip it times
+SceneDetector.detect / detect_top_scenes / detect_from_scores,
+FrameExtractor.extract_at_timestamps, the upload path of LocalStorage and
+GCSStorage and GCSStorage manifest reads (against an in-process fake GCS
+endpoint), and records the peak RSS of each stage. Nothing touches the
+network.
+
+With --baseline, every stage is compared with the same case in an earlier
+result file, and the exit code is 1 if any stage got slower (or used more
+memory) than --tolerance allows.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+import scenedetect
+
+from benchmarks.fake_gcs import FakeGCS
+from benchmarks.synthetic import make_video
+from services.frame_extractor import FrameExtractor
+from services.frame_upload import upload_extracted_frames
+from services.local_storage import LocalStorage
+from services.scene_detector import SceneDetector
+
+CASES = {
+    # name: make_video() arguments
+    "360p-60s-dense": dict(width=640, height=360, duration=60.0, scene_seconds=1.0),
+    "360p-60s-sparse": dict(width=640, height=360, duration=60.0, scene_seconds=8.0),
+    "720p-120s": dict(width=1280, height=720, duration=120.0, scene_seconds=3.0),
+    "1080p-60s": dict(width=1920, height=1080, duration=60.0, scene_seconds=3.0),
+}
+QUICK_CASES = ["360p-60s-dense", "720p-120s"]
+
+# Job-status lookups timed per run of the read_manifest_gcs stage
+MANIFEST_READS = 20
+
+# Per-stage metrics compared against a baseline, with the smallest absolute
+# change that counts (so millisecond stages do not flag on noise)
+COMPARED = {"best_s": 0.02, "peak_rss_mb": 5.0}
+
+
+class _PeakRSS:
+    """Sample this process's resident set size in a thread and keep the peak.
+
+    Reads /proc/self/statm (Linux). Elsewhere it falls back to ru_maxrss,
+    which is the peak over the whole process lifetime.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "_PeakRSS":
+        self.peak = _rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return _max_rss_bytes()
+
+
+def _max_rss_bytes() -> int:
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024  # bytes on macOS, KiB on Linux
+
+
+@contextmanager
+def _env(**values):
+    old = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in old.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _measure(fn, repeat: int) -> tuple[dict, object]:
+    """Run fn repeat times; return (timings and peak RSS, last result)."""
+    timings, peak, result = [], 0, None
+    for _ in range(repeat):
+        with _PeakRSS() as rss:
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+        peak = max(peak, rss.peak)
+    stats = {
+        "best_s": round(min(timings), 4),
+        "median_s": round(statistics.median(timings), 4),
+        "peak_rss_mb": round(peak / 2**20, 1),
+    }
+    return stats, result
+
+
+def _cut_recall(true_cuts: list[int], scenes, fps: float, tolerance: int = 1) -> float:
+    """Fraction of the clip's real cuts that a detected scene starts within tolerance frames of."""
+    if not true_cuts:
+        return 1.0
+    found = np.array([round(s.start_time * fps) for s in scenes[1:]])
+    if not len(found):
+        return 0.0
+    hits = sum(int(np.abs(found - cut).min() <= tolerance) for cut in true_cuts)
+    return round(hits / len(true_cuts), 3)
+
+
+def run_case(name: str, spec: dict, args, workdir: str, gcs: FakeGCS) -> dict:
+    spec = dict(spec, duration=spec["duration"] * args.duration_scale)
+    video_path = os.path.join(workdir, f"{name}.mp4")
+    start = time.perf_counter()
+    cuts = make_video(video_path, fps=args.fps, gop=args.gop, seed=args.seed, **spec)
+    result = {
+        "video": dict(spec, fps=args.fps, gop=args.gop, cuts=len(cuts),
+                      generate_s=round(time.perf_counter() - start, 2)),
+        "stages": {},
+    }
+    stages = result["stages"]
+
+    detector = SceneDetector(threshold=args.threshold)
+    stages["detect"], scenes = _measure(lambda: detector.detect(video_path), args.repeat)
+    stages["detect"]["scenes"] = len(scenes)
+    stages["detect"]["cut_recall"] = _cut_recall(cuts, scenes, args.fps)
+    scores = detector.scores
+
+    stages["detect_top_scenes"], top = _measure(
+        lambda: SceneDetector(threshold=args.threshold).detect_top_scenes(
+            video_path, max_scenes=args.max_frames
+        ),
+        args.repeat,
+    )
+    stages["detect_top_scenes_diverse"], _ = _measure(
+        lambda: SceneDetector(threshold=args.threshold, selection="diverse").detect_top_scenes(
+            video_path, max_scenes=args.max_frames
+        ),
+        args.repeat,
+    )
+    stages["detect_from_scores"], _ = _measure(
+        lambda: SceneDetector(threshold=args.threshold).detect_from_scores(video_path, scores),
+        args.repeat,
+    )
+
+    frames_dir = os.path.join(workdir, f"{name}-frames")
+    os.makedirs(frames_dir, exist_ok=True)
+    extractor = FrameExtractor()
+    stages["extract_at_timestamps"], extracted = _measure(
+        lambda: extractor.extract_at_timestamps(video_path, top, frames_dir), args.repeat
+    )
+    stages["extract_at_timestamps"]["frames"] = len(extracted)
+
+    runs = iter(range(10**6))
+    local = LocalStorage(
+        base_dir=os.path.join(workdir, f"{name}-local"), upload_workers=args.upload_workers
+    )
+    stages["upload_local"], _ = _measure(
+        lambda: upload_extracted_frames(local, f"{name}-{next(runs)}", extracted, "png"),
+        args.repeat,
+    )
+
+    with _env(STORAGE_EMULATOR_HOST=gcs.url):
+        from services.storage import GCSStorage
+
+        remote = GCSStorage("bench", upload_workers=args.upload_workers)
+        stages["upload_gcs"], _ = _measure(
+            lambda: upload_extracted_frames(remote, f"{name}-{next(runs)}", extracted, "png"),
+            args.repeat,
+        )
+
+        # Status lookups of a finished job: with no fresh window every read
+        # is one GET conditional on the cached generation
+        job_id = f"{name}-{next(runs)}"
+        remote.write_manifest(job_id, {"job_id": job_id, "frames": []})
+        reader = GCSStorage("bench", manifest_fresh_seconds=0)
+        requests_before = gcs.requests["GET"]
+        stages["read_manifest_gcs"], _ = _measure(
+            lambda: [reader.read_manifest(job_id) for _ in range(MANIFEST_READS)], args.repeat
+        )
+        stages["read_manifest_gcs"]["requests_per_read"] = round(
+            (gcs.requests["GET"] - requests_before) / (MANIFEST_READS * args.repeat), 2
+        )
+    return result
+
+
+def run(args) -> dict:
+    names = args.cases or (QUICK_CASES if args.quick else list(CASES))
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise SystemExit(f"Unknown cases: {', '.join(unknown)} (known: {', '.join(CASES)})")
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "scenedetect": scenedetect.__version__,
+            "numpy": np.__version__,
+        },
+        "params": {k: v for k, v in vars(args).items() if k not in ("baseline", "output")},
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="mv-bench-") as workdir, \
+            FakeGCS(latency=args.gcs_latency_ms / 1000) as gcs:
+        for name in names:
+            print(f"{name} ...", file=sys.stderr)
+            results["cases"][name] = run_case(name, CASES[name], args, workdir, gcs)
+    results["peak_rss_mb"] = round(_max_rss_bytes() / 2**20, 1)
+    return results
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Print a stage-by-stage comparison (to stderr) and return the regressions."""
+    regressions = []
+    out = sys.stderr
+    print(
+        f"{'case / stage':<44} {'metric':<12} {'baseline':>10} {'current':>10} {'change':>8}",
+        file=out,
+    )
+    for case, result in current["cases"].items():
+        old_case = baseline.get("cases", {}).get(case)
+        if old_case is None:
+            print(f"{case:<44} (not in baseline)", file=out)
+            continue
+        for stage, stats in result["stages"].items():
+            old = old_case["stages"].get(stage)
+            if old is None:
+                continue
+            for metric, min_delta in COMPARED.items():
+                if not old.get(metric) or metric not in stats:
+                    continue
+                change = stats[metric] / old[metric] - 1
+                flag = ""
+                if change > tolerance and stats[metric] - old[metric] > min_delta:
+                    flag = "  REGRESSION"
+                    regressions.append(f"{case} {stage} {metric}: {change:+.0%}")
+                print(
+                    f"{case + ' / ' + stage:<44} {metric:<12} {old[metric]:>10} "
+                    f"{stats[metric]:>10} {change:>+8.0%}{flag}",
+                    file=out,
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="*", help=f"subset of: {', '.join(CASES)}")
+    parser.add_argument("--quick", action="store_true", help=f"only {', '.join(QUICK_CASES)}")
+    parser.add_argument("--duration-scale", type=float, default=1.0,
+                        help="multiply every clip's duration")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--gop", type=int, default=None,
+                        help="re-encode to H.264 with this keyframe interval (needs ffmpeg)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threshold", type=float, default=30.0)
+    parser.add_argument("--max-frames", type=int, default=20)
+    parser.add_argument("--upload-workers", type=int, default=8)
+    parser.add_argument("--gcs-latency-ms", type=float, default=20.0,
+                        help="delay per request at the fake GCS endpoint")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown / memory growth before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):", *regressions, sep="\n  ", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+
+def make_video(
+    path: str,
+    width: int = 640,
+    height: int = 360,
+    fps: float = 30.0,
+    duration: float = 60.0,
+    scene_seconds: float = 3.0,
+    gop: int | None = None,
+    seed: int = 0,
+) -> list[int]:
+    """Write a synthetic MV-like clip and return the frame numbers of its cuts.
+
+    Each scene is a random block pattern that drifts slowly sideways, so
+    consecutive frames differ a little and cuts differ a lot. Scene lengths
+    vary between 0.5x and 1.5x scene_seconds.
+
+    If gop is set and ffmpeg is on PATH (it is in the Docker image), the clip
+    is re-encoded to H.264 with that keyframe interval, which is what seeking
+    cost depends on. Otherwise it stays OpenCV's mp4v with short GOPs.
+    """
+    rng = np.random.default_rng(seed)
+    raw_path = f"{path}.raw.mp4" if gop and shutil.which("ffmpeg") else path
+    writer = cv2.VideoWriter(
+        raw_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+    )
+    if not writer.isOpened():
+        raise RuntimeError(f"Failed to open video writer: {path}")
+
+    total = int(duration * fps)
+    cuts: list[int] = []
+    frame_num = 0
+    block = max(4, width // 32)
+
+    try:
+        while frame_num < total:
+            if frame_num:
+                cuts.append(frame_num)
+            length = int(scene_seconds * fps * rng.uniform(0.5, 1.5))
+            grid = rng.integers(
+                0, 255, (height // block + 1, width // block + 1, 3), dtype=np.uint8
+            )
+            base = cv2.resize(
+                grid, (grid.shape[1] * block, grid.shape[0] * block),
+                interpolation=cv2.INTER_NEAREST,
+            )[:height, :width]
+
+            for i in range(min(length, total - frame_num)):
+                frame = np.ascontiguousarray(np.roll(base, i, axis=1))
+                writer.write(frame)
+                frame_num += 1
+    finally:
+        writer.release()
+
+    if raw_path != path:
+        subprocess.run(
+            [
+                "ffmpeg", "-y", "-loglevel", "error", "-i", raw_path,
+                "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+                path,
+            ],
+            check=True,
+        )
+        os.remove(raw_path)
+
+    return cuts
@@ -12,12 +12,88 @@ class Settings(BaseSettings):
     scene_threshold: float = 30.0
     video_max_duration: int = 600
 
+    # Scene detection speed mode (0 = PySceneDetect auto downscale / no skip)
+    scene_downscale: int = 0
+    scene_frame_skip: int = 0
+    # Processes for segmented scene detection (1 = serial, 0 = all cores)
+    scene_workers: int = 1
+    # Top scene selection: "duration" | "diverse" (skip frames whose
+    # perceptual hashes are within N bits among the pool * max_frames longest)
+    scene_selection: str = "duration"
+    scene_diversity_pool: int = 3
+    scene_min_hash_distance: int = 10
+
+    # Download: "full" (1080p + audio) | "detect" (low-res for detection,
+    # full-res frames fetched from the remote stream)
+    download_profile: str = "full"
+    remote_fetch_workers: int = 4
+    # yt-dlp metadata cache (stream URLs expire after ~6h, keep TTL below)
+    metadata_cache_ttl: int = 1800
+    metadata_cache_max_entries: int = 256
+
+    # Downloaded videos reused across jobs (LRU, 0 = off); full-resolution
+    # ones also serve exact-timestamp extraction
+    video_cache_dir: str = "video_cache"
+    video_cache_max_mb: int = 5120
+    # Resized / re-encoded frames served by /frames?width=&format= (LRU)
+    frame_variant_cache_dir: str = "frame_variant_cache"
+    frame_variant_cache_max_mb: int = 512
+
+    # Frame extraction: "auto" | "seek" | "sequential"
+    extract_strategy: str = "auto"
+    extract_max_walk_seconds: float = 1.0
+    # Frames scored per scene to keep the sharpest (1 = midpoint only),
+    # spread over this middle fraction of the scene
+    frame_sharpness_samples: int = 1
+    frame_sharpness_span: float = 0.5
+
+    # Output encoding: "png" | "jpeg" | "webp" | "avif", variants are heights
+    frame_format: str = "png"
+    frame_quality: int = 90
+    frame_variants: list[int] = []
+
+    # Capture frames during scene detection instead of a second decode
+    single_pass: bool = False
+    single_pass_buffer: int = 16
+
+    # Result cache (reuse manifests for identical requests)
+    result_cache_ttl: int = 86400
+    result_cache_max_entries: int = 1024
+
+    # Job scheduler: concurrent jobs, waiting jobs before 429, shutdown drain
+    job_workers: int = 2
+    job_queue_size: int = 32
+    job_drain_timeout: float = 300.0
+    # Batch jobs: share of job_workers they may occupy (at least 1, and never
+    # all of them unless job_workers is 1), waiting batch jobs before 429
+    batch_worker_share: float = 0.5
+    batch_queue_size: int = 500
+    # Job status store: "sqlite" (shared by local processes) | "memory"
+    job_store: str = "sqlite"
+    job_store_path: str = "jobs.db"
+    job_ttl: int = 86400
+    # Unfinished jobs whose process stopped renewing their heartbeat for this
+    # long (crash, OOM kill) are reported failed and restarted on request
+    job_stale_seconds: float = 60.0
+
+    # Cloud Tasks worker: concurrent jobs per instance, lease on a job
+    # (should exceed the longest job), Retry-After when busy or duplicate
+    worker_concurrency: int = 2
+    worker_lease_seconds: int = 1800
+    worker_retry_after: int = 30
+
     api_host: str = "0.0.0.0"
     api_port: int = 8080
 
     # Storage
     use_gcs: bool = False
     frames_dir: str = "extracted_frames"
+    upload_workers: int = 8
+    upload_retries: int = 3
+    # GCS manifests kept in memory by generation; re-checked (one conditional
+    # GET) once older than the fresh window
+    manifest_cache_max_entries: int = 512
+    manifest_cache_fresh_seconds: float = 5.0
 
     class Config:
         env_file = ".env"
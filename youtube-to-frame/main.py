@@ -1,15 +1,26 @@
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from routers import extract, health, worker
+from config import get_settings
+from routers import extract, frames, health, worker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Graceful drain: let accepted jobs finish before the process exits
+    await run_in_threadpool(extract.drain_jobs, get_settings().job_drain_timeout)
+
 
 app = FastAPI(
     title="MV Escape - Frame Extractor",
     description="YouTube MV에서 주요 장면 프레임을 추출하는 API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS for local dev
@@ -23,8 +34,7 @@ app.add_middleware(
 app.include_router(health.router)
 app.include_router(extract.router, prefix="/api")
 app.include_router(worker.router)
+# Serve extracted frames locally, with caching headers and resized variants
+app.include_router(frames.router)
 
-# Serve extracted frames locally
-frames_dir = os.environ.get("FRAMES_DIR", "extracted_frames")
-os.makedirs(frames_dir, exist_ok=True)
-app.mount("/frames", StaticFiles(directory=frames_dir), name="frames")
+os.makedirs(os.environ.get("FRAMES_DIR", "extracted_frames"), exist_ok=True)
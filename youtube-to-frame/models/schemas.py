@@ -1,11 +1,38 @@
 from datetime import datetime
-from pydantic import BaseModel, Field, HttpUrl
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, Field, HttpUrl, field_validator
 
 
 class ExtractRequest(BaseModel):
     youtube_url: str = Field(..., description="YouTube video URL")
     max_frames: int = Field(default=20, ge=1, le=50, description="Maximum frames to extract")
     scene_threshold: float = Field(default=30.0, ge=5.0, le=90.0, description="Scene detection sensitivity")
+    downscale: int | None = Field(default=None, ge=1, le=16, description="Downscale factor for scene detection (default: server setting)")
+    frame_skip: int | None = Field(default=None, ge=0, le=4, description="Frames skipped between analysed frames (default: server setting)")
+    scene_selection: Literal["duration", "diverse"] | None = Field(default=None, description="Longest scenes, or longest scenes without near-duplicate frames (default: server setting)")
+    sharpness_samples: int | None = Field(default=None, ge=1, le=15, description="Frames scored per scene to keep the sharpest, 1 = midpoint only (default: server setting)")
+    image_format: Literal["png", "jpeg", "webp", "avif"] | None = Field(default=None, description="Output image format (default: server setting)")
+    quality: int | None = Field(default=None, ge=1, le=100, description="Lossy encoding quality (default: server setting)")
+    variants: list[Annotated[int, Field(ge=16, le=2160)]] | None = Field(default=None, max_length=4, description="Extra downscaled variant heights, e.g. [480] (default: server setting)")
+    profile: bool = Field(default=False, description="Store a cProfile dump of the job next to its manifest (debugging)")
+
+    @field_validator("variants")
+    @classmethod
+    def _unique_variants(cls, variants: list[int] | None) -> list[int] | None:
+        if variants is not None and len(set(variants)) != len(variants):
+            raise ValueError("variant heights must be unique")
+        return variants
+
+
+class ExtractionTask(ExtractRequest):
+    """Body of a Cloud Tasks delivery to /worker/process."""
+
+    job_id: str
+
+
+class BatchExtractRequest(BaseModel):
+    items: list[ExtractRequest] = Field(..., min_length=1, max_length=100, description="Extraction requests; repeats share one job")
 
 
 class FrameInfo(BaseModel):
@@ -14,6 +41,9 @@ class FrameInfo(BaseModel):
     url: str
     width: int
     height: int
+    format: str = "png"
+    variants: dict[str, str] = {}  # e.g. {"480p": url}
+    sharpness: float | None = None  # Laplacian variance, with sharpness selection
 
 
 class VideoMeta(BaseModel):
@@ -23,6 +53,20 @@ class VideoMeta(BaseModel):
     video_id: str
 
 
+class JobStats(BaseModel):
+    stages: dict[str, float] = {}  # seconds per stage, e.g. {"download": 3.2}
+    total_seconds: float | None = None
+    # The decoded video (the 360p copy with DOWNLOAD_PROFILE=detect)
+    width: int | None = None
+    height: int | None = None
+    fps: float | None = None
+    frame_count: int | None = None
+    frames_decoded: int | None = None  # by detection and local extraction
+    bytes_downloaded: int | None = None  # 0 on a video cache hit
+    bytes_uploaded: int | None = None
+    profile_url: str | None = None  # cProfile dump, with profile=true
+
+
 class ExtractResponse(BaseModel):
     job_id: str
     status: str  # "processing" | "completed" | "failed"
@@ -32,12 +76,43 @@ class ExtractResponse(BaseModel):
 class JobStatusResponse(BaseModel):
     job_id: str
     status: str
+    progress: float = 0.0  # percent, 0-100
     video_info: VideoMeta | None = None
     frames: list[FrameInfo] = []
     total_frames: int = 0
     created_at: datetime | None = None
     completed_at: datetime | None = None
     error: str | None = None
+    queue_position: int | None = None  # 1 = next to start, while "queued"
+    stats: JobStats | None = None  # once finished
+
+
+class BatchItem(BaseModel):
+    youtube_url: str
+    job_id: str
+    status: str
+    progress: float = 0.0
+
+
+class BatchExtractResponse(BaseModel):
+    batch_id: str
+    status: str  # "queued" | "processing" | "completed" | "completed_with_errors" | "failed"
+    created_at: datetime
+    total: int = 0  # distinct jobs
+    counts: dict[str, int] = {}  # distinct jobs per status
+    items: list[BatchItem] = []  # in request order, repeats included
+
+
+class ExactFramesRequest(BaseModel):
+    timestamps: list[Annotated[float, Field(ge=0)]] = Field(..., min_length=1, max_length=50, description="Timestamps (seconds) to extract frames at")
+    image_format: Literal["png", "jpeg", "webp", "avif"] | None = Field(default=None, description="Output image format (default: server setting)")
+    quality: int | None = Field(default=None, ge=1, le=100, description="Lossy encoding quality (default: server setting)")
+
+
+class ExactFramesResponse(BaseModel):
+    job_id: str
+    source: str  # "cache" (kept video) | "remote" (fetched from the stream)
+    frames: list[FrameInfo] = []  # index is the frame number, in timestamp order
 
 
 class ErrorResponse(BaseModel):
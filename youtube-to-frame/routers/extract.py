@@ -1,14 +1,24 @@
-import os
+import asyncio
+import json
 import shutil
 import tempfile
-import threading
+import time
 import uuid
 from datetime import datetime, timezone
+from typing import Callable
 
-from fastapi import APIRouter, HTTPException
+import yt_dlp
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from config import get_settings
 from models.schemas import (
+    BatchExtractRequest,
+    BatchExtractResponse,
+    BatchItem,
+    ExactFramesRequest,
+    ExactFramesResponse,
     ExtractRequest,
     ExtractResponse,
     JobStatusResponse,
@@ -16,110 +26,172 @@ from models.schemas import (
     FrameInfo,
 )
 from services.downloader import Downloader
-from services.scene_detector import SceneDetector
+from services.metadata_cache import get_metadata_cache
+from services.scene_detector import Scene
 from services.frame_extractor import FrameExtractor
+from services.image_encoder import FrameEncoder
+from services.result_cache import ResultCache, get_result_cache
+from services.job_scheduler import (
+    QueueFullError,
+    SchedulerClosedError,
+    get_job_scheduler,
+)
+from services.frame_upload import upload_extracted_frames
+from services.job_store import FINISHED, get_job_store
+from services.pipeline import ExtractionFailed, frame_encoder, or_default, run_extraction
+from services.progress import JobProgress, get_job_events
 from services.storage_factory import get_storage
+from services.video_cache import get_video_cache
 
 router = APIRouter(tags=["extract"])
 
-# In-memory job store (replace with DB/Redis in production)
-_jobs: dict[str, dict] = {}
+# Job event stream: store re-read interval (for jobs run by other
+# processes) and idle keep-alive for proxies
+SSE_POLL_SECONDS = 1.0
+SSE_KEEPALIVE_SECONDS = 15.0
 
 
 def _process_video(job_id: str, request: ExtractRequest):
-    """Process video: download → detect scenes → extract frames → upload to GCS."""
-    settings = get_settings()
-    tmpdir = tempfile.mkdtemp(prefix="mv-frame-")
-
+    """Run an API job through the extraction pipeline, recording it in the job store."""
+    progress = JobProgress(get_job_store(), job_id, get_job_events())
     try:
-        _jobs[job_id]["status"] = "downloading"
-
-        # 1. Download video
-        downloader = Downloader(max_duration=settings.video_max_duration)
-        video_info = downloader.download(request.youtube_url, output_dir=tmpdir)
-
-        _jobs[job_id]["status"] = "detecting_scenes"
-        _jobs[job_id]["video_info"] = {
-            "title": video_info.title,
-            "duration": video_info.duration,
-            "channel": video_info.channel,
-            "video_id": video_info.video_id,
-        }
-
-        # 2. Detect scenes
-        detector = SceneDetector(threshold=request.scene_threshold)
-        scenes = detector.detect_top_scenes(
-            video_info.filepath, max_scenes=request.max_frames
-        )
-
-        if not scenes:
-            raise RuntimeError("No scenes detected in video")
-
-        _jobs[job_id]["status"] = "extracting_frames"
+        manifest, stats = run_extraction(job_id, request, "api", progress)
+    except ExtractionFailed as e:
+        progress.stage("failed", error=str(e), stats=e.stats)
+        return
+
+    get_result_cache().put(job_id, manifest)
+    progress.stage(
+        "completed",
+        frames=manifest["frames"],
+        total_frames=manifest["total_frames"],
+        completed_at=datetime.now(timezone.utc),
+        stats=stats,
+    )
 
-        # 3. Extract frames
-        frames_dir = os.path.join(tmpdir, "frames")
-        os.makedirs(frames_dir, exist_ok=True)
 
-        extractor = FrameExtractor()
-        extracted = extractor.extract_at_timestamps(
-            video_info.filepath, scenes, frames_dir
+def _in_flight_response(job: dict | None, job_id: str) -> ExtractResponse | None:
+    """Return a response for a job that is still running, if any."""
+    if job and job["status"] not in FINISHED:
+        return ExtractResponse(
+            job_id=job_id, status=job["status"], created_at=job["created_at"]
         )
-
-        _jobs[job_id]["status"] = "uploading"
-
-        # 4. Upload to GCS
-        storage = get_storage(bucket_name=settings.gcs_bucket_name)
-        frame_infos = []
-
-        for frame in extracted:
-            blob_name = storage.upload_frame(frame.filepath, job_id, frame.index)
-            url = storage.get_public_url(blob_name)
-            frame_infos.append(
-                {
-                    "index": frame.index,
-                    "timestamp": frame.timestamp,
-                    "url": url,
-                    "width": frame.width,
-                    "height": frame.height,
-                }
-            )
-
-        # 5. Write manifest
-        manifest = {
-            "job_id": job_id,
-            "video_info": _jobs[job_id]["video_info"],
-            "frames": frame_infos,
-            "total_frames": len(frame_infos),
-            "completed_at": datetime.now(timezone.utc).isoformat(),
+    return None
+
+
+def _job_from_manifest(manifest: dict, created_at: datetime | None) -> dict:
+    """Build a job entry from a manifest."""
+    if manifest.get("status") == "failed":
+        return {
+            "status": "failed",
+            "created_at": created_at,
+            "video_info": None,
+            "frames": [],
+            "total_frames": 0,
+            "completed_at": datetime.fromisoformat(manifest["completed_at"]),
+            "error": manifest.get("error"),
+            "stats": manifest.get("stats"),
         }
-        storage.write_manifest(job_id, manifest)
+    return {
+        "status": "completed",
+        "created_at": created_at,
+        "video_info": manifest.get("video_info"),
+        "frames": manifest["frames"],
+        "total_frames": manifest.get("total_frames", len(manifest["frames"])),
+        "completed_at": datetime.fromisoformat(manifest["completed_at"]),
+        "error": None,
+        "stats": manifest.get("stats"),
+    }
 
-        # 6. Update job status
-        _jobs[job_id]["status"] = "completed"
-        _jobs[job_id]["frames"] = frame_infos
-        _jobs[job_id]["total_frames"] = len(frame_infos)
-        _jobs[job_id]["completed_at"] = datetime.now(timezone.utc)
 
-    except Exception as e:
-        _jobs[job_id]["status"] = "failed"
-        _jobs[job_id]["error"] = str(e)
+def _job_from_storage(job_id: str) -> dict | None:
+    """Rebuild a finished job from its storage manifest, if there is one."""
+    storage = get_storage(bucket_name=get_settings().gcs_bucket_name)
+    manifest = storage.read_manifest(job_id)
+    if not manifest or "completed_at" not in manifest:
+        return None
+    return _job_from_manifest(manifest, created_at=None)
 
-    finally:
-        shutil.rmtree(tmpdir, ignore_errors=True)
 
-
-@router.post("/extract", response_model=ExtractResponse, status_code=202)
-async def extract_frames(request: ExtractRequest):
-    """Start a frame extraction job from a YouTube video."""
-    # Validate URL
+def _validate_request(request: ExtractRequest) -> None:
+    """Raise HTTPException 400 for a request that cannot be processed."""
     if not Downloader.validate_url(request.youtube_url):
         raise HTTPException(status_code=400, detail="Invalid YouTube URL")
 
-    job_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc)
+    try:
+        frame_encoder(request)
+        # Known videos are checked right away, unknown ones in the job
+        Downloader(
+            max_duration=get_settings().video_max_duration,
+            metadata_cache=get_metadata_cache(),
+        ).check_cached(request.youtube_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _effective_params(request: ExtractRequest) -> dict:
+    """The parameters a job actually runs with, server defaults filled in.
+
+    Omitting a parameter and passing its default give the same result, and
+    a changed server default gives a different one.
+    """
+    settings = get_settings()
+    selection = or_default(request.scene_selection, settings.scene_selection)
+    sharpness_samples = or_default(request.sharpness_samples, settings.frame_sharpness_samples)
+    params = {
+        "max_frames": request.max_frames,
+        "scene_threshold": request.scene_threshold,
+        "downscale": or_default(request.downscale, settings.scene_downscale),
+        "frame_skip": or_default(request.frame_skip, settings.scene_frame_skip),
+        "scene_selection": selection,
+        "sharpness_samples": sharpness_samples,
+        "image_format": or_default(request.image_format, settings.frame_format),
+        "quality": or_default(request.quality, settings.frame_quality),
+        "variants": sorted(or_default(request.variants, settings.frame_variants)),
+        "download_profile": settings.download_profile,
+        "profile": request.profile,
+    }
+    if selection == "diverse":
+        params["diversity_pool"] = settings.scene_diversity_pool
+        params["min_hash_distance"] = settings.scene_min_hash_distance
+    if sharpness_samples > 1:
+        params["sharpness_span"] = settings.frame_sharpness_span
+    return params
+
+
+def _job_id_for(request: ExtractRequest) -> str:
+    # Identical requests map to the same job id, so repeats reuse its result
+    video_id = Downloader.extract_video_id(request.youtube_url)
+    cache_key = ResultCache.make_key(video_id, _effective_params(request))
+    return ResultCache.job_id_for(cache_key)
+
+
+def _reuse_or_claim(job_id: str, now: datetime) -> ExtractResponse | None:
+    """Return the existing job for job_id, or claim it and return None.
+
+    A None result means the caller now owns a "queued" job and must
+    schedule it (or delete it if scheduling fails).
+    """
+    jobs = get_job_store()
+
+    # Share an in-flight job instead of starting a duplicate
+    job = jobs.get(job_id)
+    in_flight = _in_flight_response(job, job_id)
+    if in_flight:
+        return in_flight
+
+    manifest = get_result_cache().get(job_id)
+    if manifest is not None:
+        if job is None or job["status"] != "completed":
+            job = _job_from_manifest(manifest, created_at=now)
+            jobs.put(job_id, job)
+        return ExtractResponse(
+            job_id=job_id, status="completed", created_at=job["created_at"]
+        )
 
-    _jobs[job_id] = {
+    # claim() is atomic, so a duplicate started meanwhile (by this or
+    # another process) is shared rather than started twice
+    new_job = {
         "status": "queued",
         "created_at": now,
         "video_info": None,
@@ -128,24 +200,164 @@ async def extract_frames(request: ExtractRequest):
         "completed_at": None,
         "error": None,
     }
+    if not jobs.claim(job_id, new_job):
+        job = jobs.get(job_id)
+        return _in_flight_response(job, job_id) or ExtractResponse(
+            job_id=job_id, status=job["status"], created_at=job["created_at"]
+        )
+    return None
 
-    # Process in a separate thread so the event loop stays responsive
-    thread = threading.Thread(
-        target=_process_video, args=(job_id, request), daemon=True
-    )
-    thread.start()
+
+def _scheduler_error(e: Exception) -> HTTPException:
+    if isinstance(e, QueueFullError):
+        return HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+    return HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/extract", response_model=ExtractResponse, status_code=202)
+async def extract_frames(request: ExtractRequest):
+    """Start a frame extraction job from a YouTube video."""
+    _validate_request(request)
+    job_id = _job_id_for(request)
+    now = datetime.now(timezone.utc)
+
+    existing = await run_in_threadpool(_reuse_or_claim, job_id, now)
+    if existing:
+        return existing
+
+    # Run on the bounded worker pool so the event loop stays responsive
+    try:
+        get_job_scheduler().submit(job_id, _process_video, job_id, request)
+    except (QueueFullError, SchedulerClosedError) as e:
+        await run_in_threadpool(get_job_store().delete, job_id)
+        raise _scheduler_error(e)
 
     return ExtractResponse(job_id=job_id, status="queued", created_at=now)
 
 
-@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
-async def get_job_status(job_id: str):
-    """Get the status and results of a frame extraction job."""
-    if job_id not in _jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
+@router.post("/extract/batch", response_model=BatchExtractResponse, status_code=202)
+async def extract_batch(request: BatchExtractRequest):
+    """Start extraction jobs for many videos under one batch id.
+
+    Items resolving to the same job (same video and parameters) share it.
+    Batch jobs wait in their own lane: interactive /extract jobs start
+    first, batches are served round-robin, and together they use at most
+    BATCH_WORKER_SHARE of the workers. The whole batch is rejected with 429
+    if the lane cannot take its new jobs.
+    """
+    errors = []
+    for i, item in enumerate(request.items):
+        try:
+            _validate_request(item)
+        except HTTPException as e:
+            errors.append(f"items[{i}]: {e.detail}")
+    if errors:
+        raise HTTPException(status_code=400, detail="; ".join(errors))
+
+    job_ids = [_job_id_for(item) for item in request.items]
+    now = datetime.now(timezone.utc)
+    batch_id = uuid.uuid4().hex
 
-    job = _jobs[job_id]
+    def claim_all() -> list[tuple[str, Callable, tuple]]:
+        to_run = []
+        for job_id, item in dict(zip(job_ids, request.items)).items():
+            if _reuse_or_claim(job_id, now) is None:
+                to_run.append((job_id, _process_video, (job_id, item)))
+        return to_run
 
+    to_run = await run_in_threadpool(claim_all)
+    try:
+        get_job_scheduler().submit_batch(batch_id, to_run)
+    except (QueueFullError, SchedulerClosedError) as e:
+        jobs = get_job_store()
+        for job_id, _, _ in to_run:
+            await run_in_threadpool(jobs.delete, job_id)
+        raise _scheduler_error(e)
+
+    batch = {
+        "created_at": now,
+        "items": [
+            {"youtube_url": item.youtube_url, "job_id": job_id}
+            for item, job_id in zip(request.items, job_ids)
+        ],
+    }
+    await run_in_threadpool(get_job_store().put_batch, batch_id, batch)
+    return await run_in_threadpool(_batch_response, batch_id, batch)
+
+
+@router.get("/extract/batch/{batch_id}", response_model=BatchExtractResponse)
+async def get_batch_status(batch_id: str):
+    """Get per-item and aggregate status of a batch."""
+    batch = await run_in_threadpool(get_job_store().get_batch, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return await run_in_threadpool(_batch_response, batch_id, batch)
+
+
+def _batch_response(batch_id: str, batch: dict) -> BatchExtractResponse:
+    job_ids = list(dict.fromkeys(item["job_id"] for item in batch["items"]))
+    jobs = get_job_store().get_many(job_ids)
+    for job_id in job_ids:
+        if job_id not in jobs:
+            # Evicted from the store; finished jobs still have a manifest
+            jobs[job_id] = _job_from_storage(job_id) or {"status": "unknown"}
+
+    counts: dict[str, int] = {}
+    for job in jobs.values():
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+
+    unfinished = set(counts) - {*FINISHED, "unknown"}
+    if not unfinished:
+        if set(counts) == {"completed"}:
+            status = "completed"
+        elif "completed" in counts:
+            status = "completed_with_errors"
+        else:
+            status = "failed"
+    elif set(counts) == {"queued"}:
+        status = "queued"
+    else:
+        status = "processing"
+
+    return BatchExtractResponse(
+        batch_id=batch_id,
+        status=status,
+        created_at=batch["created_at"],
+        total=len(job_ids),
+        counts=counts,
+        items=[
+            BatchItem(
+                youtube_url=item["youtube_url"],
+                job_id=item["job_id"],
+                status=jobs[item["job_id"]]["status"],
+                progress=jobs[item["job_id"]].get("progress") or 0.0,
+            )
+            for item in batch["items"]
+        ],
+    )
+
+
+async def _load_job(job_id: str) -> dict:
+    job = await run_in_threadpool(get_job_store().get, job_id)
+
+    if job is None:
+        # Not known here (another instance, restart, or a Cloud Tasks job):
+        # the storage manifest is the source of truth for finished jobs
+        job = await run_in_threadpool(_job_from_storage, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _queue_position(job_id: str, job: dict) -> int | None:
+    if job["status"] == "queued":
+        return get_job_scheduler().position(job_id)
+    return None
+
+
+def _status_response(job_id: str, job: dict) -> JobStatusResponse:
     video_info = None
     if job["video_info"]:
         video_info = VideoMeta(**job["video_info"])
@@ -155,10 +367,208 @@ async def get_job_status(job_id: str):
     return JobStatusResponse(
         job_id=job_id,
         status=job["status"],
+        progress=job.get("progress") or 0.0,
         video_info=video_info,
         frames=frames,
         total_frames=job["total_frames"],
         created_at=job["created_at"],
         completed_at=job["completed_at"],
         error=job.get("error"),
+        queue_position=_queue_position(job_id, job),
+        stats=job.get("stats"),
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """Get the status and results of a frame extraction job."""
+    return _status_response(job_id, await _load_job(job_id))
+
+
+@router.post("/jobs/{job_id}/frames", response_model=ExactFramesResponse)
+async def extract_exact_frames(job_id: str, request: ExactFramesRequest):
+    """Extract frames at arbitrary timestamps of a completed job's video.
+
+    Uses the video kept from the job and its keyframe index, so each frame
+    costs at most one GOP of decoding. Without a kept copy (evicted, another
+    instance, or DOWNLOAD_PROFILE=detect) frames are fetched from the
+    remote stream instead, which is slower.
+    """
+    job = await _load_job(job_id)
+    if job["status"] != "completed" or not job["video_info"]:
+        raise HTTPException(status_code=409, detail="Job has not completed")
+    # yt-dlp rounds durations to whole seconds; frame_at() clamps to the last frame
+    duration = job["video_info"]["duration"]
+    beyond = [t for t in request.timestamps if duration and t >= duration + 1]
+    if beyond:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Timestamps beyond the video's duration ({duration}s): {beyond}",
+        )
+
+    settings = get_settings()
+    try:
+        encoder = FrameEncoder(
+            fmt=or_default(request.image_format, settings.frame_format),
+            quality=or_default(request.quality, settings.frame_quality),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        source, frames = await run_in_threadpool(
+            _extract_exact, job_id, job["video_info"]["video_id"], request.timestamps, encoder
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except yt_dlp.utils.DownloadError as e:
+        raise HTTPException(status_code=502, detail=f"Cannot fetch the video: {e}")
+    return ExactFramesResponse(
+        job_id=job_id, source=source, frames=[FrameInfo(**f) for f in frames]
+    )
+
+
+def _extract_exact(
+    job_id: str, video_id: str, timestamps: list[float], encoder: FrameEncoder
+) -> tuple[str, list[dict]]:
+    """Return (source, manifest frame dicts) for frames at timestamps."""
+    settings = get_settings()
+    extractor = FrameExtractor(
+        strategy=settings.extract_strategy,
+        max_walk_seconds=settings.extract_max_walk_seconds,
+        encoder=encoder,
     )
+    tmpdir = tempfile.mkdtemp(prefix="mv-exact-")
+
+    try:
+        kept = get_video_cache().checkout(video_id, "full", tmpdir)
+        if kept and kept.index:
+            index = kept.index
+            source, fps = "cache", index.fps
+            numbers = sorted({index.frame_at(t) for t in timestamps})
+            extracted = extractor.extract_at_timestamps(
+                kept.path, _frame_scenes(numbers, fps), tmpdir, keyframes=index.keyframes or None
+            )
+        else:
+            downloader = Downloader(
+                max_duration=settings.video_max_duration,
+                metadata_cache=get_metadata_cache(),
+            )
+            stream = downloader.get_full_stream(f"https://www.youtube.com/watch?v={video_id}")
+            if stream is None or not stream.get("fps"):
+                raise LookupError("Video is not available for exact-timestamp extraction")
+            source, fps = "remote", stream["fps"]
+            numbers = sorted({max(0, int(t * fps)) for t in timestamps})
+            extracted = extractor.extract_remote(
+                stream, _frame_scenes(numbers, fps), tmpdir, workers=settings.remote_fetch_workers
+            )
+
+        for frame in extracted:
+            frame.timestamp = frame.index / fps
+        storage = get_storage(bucket_name=settings.gcs_bucket_name)
+        return source, upload_extracted_frames(
+            storage, f"{job_id}/exact", extracted, encoder.format
+        )
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _frame_scenes(numbers: list[int], fps: float) -> list[Scene]:
+    """One-frame scenes for FrameExtractor, indexed by frame number."""
+    # Aim at the middle of each frame so float rounding cannot pick the one before
+    return [
+        Scene(
+            index=n,
+            start_time=n / fps,
+            end_time=(n + 1) / fps,
+            mid_time=(n + 0.5) / fps,
+            duration=1 / fps,
+        )
+        for n in numbers
+    ]
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """Stream job progress as Server-Sent Events.
+
+    Events: "status" ({status, progress, queue_position}) whenever one of
+    them changes, "video" once video_info is known, "frame" for each frame
+    as soon as it is uploaded, and a final "done" with the full job status.
+    """
+    await _load_job(job_id)
+    return StreamingResponse(
+        _job_event_stream(job_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _job_event_stream(job_id: str, request: Request):
+    events = get_job_events()
+    wake = events.subscribe(job_id)
+    sent_status = None
+    sent_video = False
+    sent_frames: set[int] = set()
+    last_sent = time.monotonic()
+
+    try:
+        while True:
+            # Cleared before reading, so a change during the read wakes us again
+            wake.clear()
+            try:
+                job = await _load_job(job_id)
+            except HTTPException:
+                return  # evicted while streaming
+
+            chunks = []
+            status = {
+                "status": job["status"],
+                "progress": job.get("progress") or 0.0,
+                "queue_position": _queue_position(job_id, job),
+            }
+            if status != sent_status:
+                chunks.append(_sse("status", status))
+                sent_status = status
+            if job["video_info"] and not sent_video:
+                chunks.append(_sse("video", job["video_info"]))
+                sent_video = True
+            for frame in job["frames"]:
+                if frame["index"] not in sent_frames:
+                    chunks.append(_sse("frame", frame))
+                    sent_frames.add(frame["index"])
+            if job["status"] in FINISHED:
+                chunks.append(_sse("done", _status_response(job_id, job).model_dump(mode="json")))
+                yield "".join(chunks)
+                return
+
+            if not chunks and time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                chunks.append(": keep-alive\n\n")
+            if chunks:
+                yield "".join(chunks)
+                last_sent = time.monotonic()
+
+            if await request.is_disconnected():
+                return
+            # Local jobs wake us immediately; the timeout covers other processes
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=SSE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        events.unsubscribe(job_id, wake)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def drain_jobs(timeout: float | None = None) -> None:
+    """Finish running and queued jobs; fail the ones that could not start."""
+    jobs = get_job_store()
+    for job_id in get_job_scheduler().shutdown(timeout):
+        jobs.update(
+            job_id, status="failed", error="Server shut down before the job started"
+        )
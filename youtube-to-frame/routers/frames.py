@@ -0,0 +1,72 @@
+import os
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+
+from services.frame_variants import content_digest, format_of, get_frame_variant_cache
+from services.image_encoder import content_type_for
+
+router = APIRouter(tags=["frames"])
+
+# Frame paths are reused: a job re-run after RESULT_CACHE_TTL or a failure,
+# and exact-timestamp requests, rewrite them. Caches keep a frame briefly,
+# then revalidate it with its ETag (a 304 when unchanged).
+FRAME_CACHE = "public, max-age=60, must-revalidate"
+# Manifests, leases and other job files change while a job runs
+REVALIDATE = "no-cache"
+
+
+@router.api_route("/frames/{path:path}", methods=["GET", "HEAD"])
+def get_frame(
+    path: str,
+    request: Request,
+    width: int | None = Query(
+        default=None, ge=16, le=3840, description="Resize to this width (never upscales)"
+    ),
+    fmt: Literal["png", "jpeg", "webp", "avif"] | None = Query(
+        default=None, alias="format", description="Re-encode to this format"
+    ),
+):
+    """Serve a file from local storage (FRAMES_DIR), with content-hash ETags.
+
+    With width and/or format, the frame is resized / re-encoded on first
+    request and kept in the frame variant cache, so repeat requests are
+    served from disk.
+    """
+    base = os.path.realpath(os.environ.get("FRAMES_DIR", "extracted_frames"))
+    filepath = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, filepath]) != base or not os.path.isfile(filepath):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    is_frame = format_of(filepath) is not None
+    if (width or fmt) and not is_frame:
+        raise HTTPException(status_code=400, detail="width and format apply to frame images only")
+
+    etag = content_digest(filepath)
+    if width or fmt:
+        etag += f"-{width or 0}-{fmt or format_of(filepath)}"
+    headers = {"ETag": f'"{etag}"', "Cache-Control": FRAME_CACHE if is_frame else REVALIDATE}
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if width or fmt:
+        try:
+            filepath = get_frame_variant_cache().get_or_create(filepath, width, fmt)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except (FileNotFoundError, RuntimeError):
+            raise HTTPException(status_code=404, detail="Not found")
+
+    media_type = content_type_for(filepath) if is_frame else None
+    return FileResponse(filepath, media_type=media_type, headers=headers)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+    return etag in tags
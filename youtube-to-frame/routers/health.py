@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 router = APIRouter(tags=["health"])
 
@@ -6,3 +7,9 @@ router = APIRouter(tags=["health"])
 @router.get("/health")
 async def health_check():
     return {"status": "ok", "service": "mv-frame-extractor"}
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics of this process (stage latencies, jobs, bytes)."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
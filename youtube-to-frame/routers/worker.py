@@ -1,99 +1,116 @@
-import os
-import shutil
-import tempfile
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from config import get_settings
-from services.downloader import Downloader
-from services.scene_detector import SceneDetector
-from services.frame_extractor import FrameExtractor
+from models.schemas import ExtractionTask
+from services.pipeline import ExtractionFailed, run_extraction
 from services.storage_factory import get_storage
 
 router = APIRouter(tags=["worker"])
 
+_executor: ThreadPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+_executor_lock = threading.Lock()
 
-@router.post("/worker/process")
-async def process_extraction(request: Request):
-    """Worker endpoint called by Cloud Tasks to process a video."""
-    # Verify request is from Cloud Tasks (in production, check OIDC token)
-    payload = await request.json()
 
-    job_id = payload["job_id"]
-    youtube_url = payload["youtube_url"]
-    max_frames = payload.get("max_frames", 20)
-    scene_threshold = payload.get("scene_threshold", 30.0)
+def _worker_pool() -> tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    """Executor for extraction jobs, with one slot per allowed concurrent job."""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            concurrency = max(1, get_settings().worker_concurrency)
+            _executor = ThreadPoolExecutor(
+                max_workers=concurrency, thread_name_prefix="task-worker"
+            )
+            _slots = threading.BoundedSemaphore(concurrency)
+        return _executor, _slots
 
-    settings = get_settings()
-    tmpdir = tempfile.mkdtemp(prefix="mv-frame-")
 
+@router.post("/worker/process")
+async def process_extraction(task: ExtractionTask):
+    """Worker endpoint called by Cloud Tasks to process a video.
+
+    The work runs on a bounded executor, so the event loop (and /health)
+    stays responsive. Deliveries are idempotent: a job with a completed
+    manifest returns right away, and a storage lease makes sure only one
+    delivery of a job runs at a time; the manifest is checked again once
+    the lease is taken. Busy instances and duplicate deliveries get a
+    non-2xx response, so Cloud Tasks retries them later.
+    """
+    # Verify request is from Cloud Tasks (in production, check OIDC token)
+    job_id = task.job_id
+    settings = get_settings()
+    storage = get_storage(bucket_name=settings.gcs_bucket_name)
+
+    manifest = await run_in_threadpool(storage.read_manifest, job_id)
+    if _is_completed(manifest):
+        return _completed_response(job_id, manifest)
+
+    executor, slots = _worker_pool()
+    if not slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=429,
+            detail="Worker is at capacity",
+            headers={"Retry-After": str(settings.worker_retry_after)},
+        )
     try:
-        # 1. Download
-        downloader = Downloader(max_duration=settings.video_max_duration)
-        video_info = downloader.download(youtube_url, output_dir=tmpdir)
-
-        # 2. Detect scenes
-        detector = SceneDetector(threshold=scene_threshold)
-        scenes = detector.detect_top_scenes(video_info.filepath, max_scenes=max_frames)
-
-        if not scenes:
-            raise RuntimeError("No scenes detected in video")
+        owner = uuid.uuid4().hex
+        leased = await run_in_threadpool(
+            storage.acquire_lease, job_id, owner, settings.worker_lease_seconds
+        )
+        if not leased:
+            raise HTTPException(
+                status_code=409,
+                detail="Job is already being processed",
+                headers={"Retry-After": str(settings.worker_retry_after)},
+            )
+        try:
+            # A delivery that held the lease may have finished the job meanwhile
+            manifest = await run_in_threadpool(storage.read_manifest, job_id)
+            if _is_completed(manifest):
+                return _completed_response(job_id, manifest)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, _run_extraction, task)
+        finally:
+            await run_in_threadpool(storage.release_lease, job_id, owner)
+    finally:
+        slots.release()
 
-        # 3. Extract frames
-        frames_dir = os.path.join(tmpdir, "frames")
-        os.makedirs(frames_dir, exist_ok=True)
 
-        extractor = FrameExtractor()
-        extracted = extractor.extract_at_timestamps(
-            video_info.filepath, scenes, frames_dir
-        )
+def _is_completed(manifest: dict | None) -> bool:
+    return bool(manifest) and manifest.get("status") != "failed"
 
-        # 4. Upload to GCS
-        storage = get_storage(bucket_name=settings.gcs_bucket_name)
-        frame_infos = []
-
-        for frame in extracted:
-            blob_name = storage.upload_frame(frame.filepath, job_id, frame.index)
-            url = storage.get_public_url(blob_name)
-            frame_infos.append(
-                {
-                    "index": frame.index,
-                    "timestamp": frame.timestamp,
-                    "url": url,
-                    "width": frame.width,
-                    "height": frame.height,
-                }
-            )
 
-        # 5. Write manifest
-        manifest = {
-            "job_id": job_id,
-            "video_info": {
-                "title": video_info.title,
-                "duration": video_info.duration,
-                "channel": video_info.channel,
-                "video_id": video_info.video_id,
-            },
-            "frames": frame_infos,
-            "total_frames": len(frame_infos),
-            "completed_at": datetime.now(timezone.utc).isoformat(),
-        }
-        storage.write_manifest(job_id, manifest)
+def _completed_response(job_id: str, manifest: dict) -> dict:
+    return {
+        "status": "completed",
+        "job_id": job_id,
+        "total_frames": manifest.get("total_frames", 0),
+    }
 
-        return {"status": "completed", "job_id": job_id, "total_frames": len(frame_infos)}
 
-    except Exception as e:
+def _run_extraction(task: ExtractionTask) -> dict:
+    """Run one delivery through the extraction pipeline. Runs on the executor."""
+    job_id = task.job_id
+    try:
+        manifest, _ = run_extraction(job_id, task, "worker")
+    except ExtractionFailed as e:
         # Write error manifest so the API can report failure
-        storage = get_storage(bucket_name=settings.gcs_bucket_name)
+        storage = get_storage(bucket_name=get_settings().gcs_bucket_name)
         error_manifest = {
             "job_id": job_id,
             "status": "failed",
             "error": str(e),
             "completed_at": datetime.now(timezone.utc).isoformat(),
+            "stats": e.stats,
         }
         storage.write_manifest(job_id, error_manifest)
         raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        shutil.rmtree(tmpdir, ignore_errors=True)
+    return _completed_response(job_id, manifest)
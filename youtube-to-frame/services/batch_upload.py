@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass
+class UploadResult:
+    local_path: str
+    index: int
+    variant: str | None = None
+    blob_name: str | None = None
+    error: str | None = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def upload_concurrently(
+    upload_one: Callable[[str, str, int, str | None], str],
+    items: list[tuple],
+    job_id: str,
+    max_workers: int = 8,
+    retries: int = 3,
+    backoff: float = 0.5,
+    retryable: tuple[type[BaseException], ...] = (Exception,),
+    on_result: Callable[[UploadResult], None] | None = None,
+) -> list[UploadResult]:
+    """Upload (local_path, index[, variant]) items in parallel.
+
+    upload_one(local_path, job_id, index, variant) must return the blob name.
+    Failures matching retryable are retried with exponential backoff; every
+    item gets an UploadResult in input order, so one bad blob never hides the
+    outcome of the others. on_result, if given, is called from the worker
+    thread as soon as each item finishes.
+    """
+
+    def run(item: tuple) -> UploadResult:
+        result = attempt_all(item)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    def attempt_all(item: tuple) -> UploadResult:
+        local_path, index, *rest = item
+        result = UploadResult(local_path, index, rest[0] if rest else None)
+        for attempt in range(retries + 1):
+            result.attempts = attempt + 1
+            try:
+                result.blob_name = upload_one(local_path, job_id, index, result.variant)
+                result.error = None
+                return result
+            except retryable as e:
+                result.error = f"{type(e).__name__}: {e}"
+                if attempt < retries:
+                    time.sleep(backoff * 2**attempt)
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+                return result
+        return result
+
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        return list(pool.map(run, items))
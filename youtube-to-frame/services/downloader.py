@@ -1,9 +1,19 @@
+import glob
 import os
 import tempfile
 from dataclasses import dataclass
+from typing import Callable
 
 import yt_dlp
 
+from services.metadata_cache import MetadataCache
+from services.metrics import DOWNLOADED_BYTES
+from services.video_cache import VideoCache
+
+FULL_FORMAT = "bestvideo[height<=1080]+bestaudio/best[height<=1080]/best"
+# Video-only, low resolution: enough for scene detection, no ffmpeg merge
+DETECT_FORMAT = "bestvideo[height<=360]/best[height<=360]/worstvideo/worst"
+
 
 @dataclass
 class VideoInfo:
@@ -12,11 +22,34 @@ class VideoInfo:
     channel: str
     video_id: str
     filepath: str
+    # Full-resolution video stream (url, http_headers, cookies, ...) when
+    # filepath is a low-res detection copy; frames are then fetched from it
+    full_stream: dict | None = None
+    # Bytes fetched from YouTube for this job, 0 when served from the video cache
+    downloaded_bytes: int = 0
 
 
 class Downloader:
-    def __init__(self, max_duration: int = 600):
+    """Download YouTube videos with yt-dlp.
+
+    Metadata is extracted once per job and the same info dict drives the
+    download. With a metadata_cache, repeat videos skip extraction entirely,
+    and with a video_cache, repeat videos skip the download as well.
+    ydl_class can be replaced by a stub exposing extract_info() and
+    process_ie_result() to run without network access.
+    """
+
+    def __init__(
+        self,
+        max_duration: int = 600,
+        metadata_cache: MetadataCache | None = None,
+        ydl_class=yt_dlp.YoutubeDL,
+        video_cache: VideoCache | None = None,
+    ):
         self.max_duration = max_duration
+        self.metadata_cache = metadata_cache
+        self.video_cache = video_cache
+        self.ydl_class = ydl_class
 
     def _base_opts(self) -> dict:
         """Return base yt-dlp options."""
@@ -32,30 +65,161 @@ class Downloader:
 
         return opts
 
-    def download(self, youtube_url: str, output_dir: str | None = None) -> VideoInfo:
-        """Download a YouTube video and return its info."""
-        # First, extract info without downloading to validate
+    def download(
+        self,
+        youtube_url: str,
+        output_dir: str | None = None,
+        profile: str = "full",
+        progress: Callable[[float], None] | None = None,
+    ) -> VideoInfo:
+        """Download a YouTube video and return its info.
+
+        profile "full" downloads up to 1080p with audio merged to mp4.
+        profile "detect" downloads a low-res video-only stream for scene
+        detection and records the full-resolution stream in full_stream, so
+        only the frames that are actually needed are fetched at 1080p. It
+        falls back to "full" when no directly seekable stream is available.
+        progress, if given, is called with the downloaded fraction (0-1).
+
+        A video in the video cache is linked into output_dir instead; a
+        cached full video serves both profiles.
+        """
+        if profile not in ("full", "detect"):
+            raise ValueError(f"Unknown download profile: {profile}")
+
+        if output_dir is None:
+            output_dir = tempfile.mkdtemp(prefix="mv-frame-")
+
+        video_info = self._from_video_cache(youtube_url, output_dir, profile)
+        if video_info is not None:
+            if progress is not None:
+                progress(1.0)
+            return video_info
+
+        # Extract (or reuse) info once to validate, then download from it
+        info, cached = self._get_info(youtube_url)
+        self._check_duration(info)
+
+        try:
+            video_info = self._download_info(info, output_dir, profile, progress)
+        except yt_dlp.utils.DownloadError:
+            if not cached:
+                raise
+            # Stream URLs in a cached entry may have expired, extract again
+            self.metadata_cache.invalidate(info.get("id"))
+            info, _ = self._get_info(youtube_url)
+            video_info = self._download_info(info, output_dir, profile, progress)
+
+        video_info.downloaded_bytes = os.path.getsize(video_info.filepath)
+        DOWNLOADED_BYTES.inc(video_info.downloaded_bytes)
+        if self.video_cache is not None:
+            self.video_cache.put(
+                video_info.video_id,
+                "full" if video_info.full_stream is None else "detect",
+                video_info.filepath,
+                _video_meta(video_info),
+            )
+        return video_info
+
+    def _from_video_cache(
+        self, youtube_url: str, output_dir: str, profile: str
+    ) -> VideoInfo | None:
+        """Return a cached download linked into output_dir, or None."""
+        video_id = self.extract_video_id(youtube_url)
+        if self.video_cache is None or not video_id:
+            return None
+
+        hit = self.video_cache.checkout(video_id, "full", output_dir)
+        if hit is not None:
+            self._check_duration(hit.meta)
+            return VideoInfo(**hit.meta, filepath=hit.path)
+        if profile != "detect":
+            return None
+
+        hit = self.video_cache.checkout(video_id, "detect", output_dir)
+        if hit is None:
+            return None
+        # Stream URLs expire, so the full stream comes from fresh metadata
+        full_stream = self.get_full_stream(youtube_url)
+        if full_stream is None:
+            os.remove(hit.path)
+            return None
+        return VideoInfo(**hit.meta, filepath=hit.path, full_stream=full_stream)
+
+    def get_info(self, youtube_url: str) -> dict:
+        """Return video metadata, from the metadata cache when fresh."""
+        return self._get_info(youtube_url)[0]
+
+    def get_full_stream(self, youtube_url: str) -> dict | None:
+        """Return the full-resolution seekable stream (as in full_stream), if any."""
+        info = self.get_info(youtube_url)
+        self._check_duration(info)
+        return self._pick_stream(info.get("formats") or [], max_height=1080)
+
+    def check_cached(self, youtube_url: str) -> None:
+        """Reject a video over max_duration using cached metadata only.
+
+        Does nothing on a cache miss, so it never makes a network call.
+        """
+        if self.metadata_cache is None:
+            return
+        info = self.metadata_cache.peek(self.extract_video_id(youtube_url))
+        if info is not None:
+            self._check_duration(info)
+
+    def _get_info(self, youtube_url: str) -> tuple[dict, bool]:
+        """Return (info, from_cache)."""
+        cache = self.metadata_cache
+        if cache is not None:
+            info = cache.get(self.extract_video_id(youtube_url))
+            if info is not None:
+                return info, True
+
         info = self._extract_info(youtube_url)
+        if cache is not None:
+            cache.put(info.get("id") or self.extract_video_id(youtube_url), info)
+        return info, False
 
-        if info["duration"] and info["duration"] > self.max_duration:
+    def _check_duration(self, info: dict) -> None:
+        if info.get("duration") and info["duration"] > self.max_duration:
             raise ValueError(
                 f"Video duration ({info['duration']}s) exceeds limit ({self.max_duration}s)"
             )
 
-        # Download
-        if output_dir is None:
-            output_dir = tempfile.mkdtemp(prefix="mv-frame-")
-
-        filepath = os.path.join(output_dir, "video.mp4")
+    def _download_info(
+        self, info: dict, output_dir: str, profile: str, progress=None
+    ) -> VideoInfo:
+        """Download the video described by an already extracted info dict."""
         ydl_opts = self._base_opts()
-        ydl_opts.update({
-            "format": "bestvideo[height<=1080]+bestaudio/best[height<=1080]/best",
-            "merge_output_format": "mp4",
-            "outtmpl": filepath,
-        })
+        if progress is not None:
+            ydl_opts["progress_hooks"] = [_progress_hook(progress)]
+        full_stream = None
+        if profile == "detect":
+            full_stream = self._pick_stream(info.get("formats") or [], max_height=1080)
+            if full_stream is None:
+                # Nothing seekable at full resolution, so download it instead
+                profile = "full"
+
+        if profile == "detect":
+            ydl_opts.update({
+                "format": DETECT_FORMAT,
+                "outtmpl": os.path.join(output_dir, "detect.%(ext)s"),
+            })
+        else:
+            ydl_opts.update({
+                "format": FULL_FORMAT,
+                "merge_output_format": "mp4",
+                "outtmpl": os.path.join(output_dir, "video.mp4"),
+            })
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([youtube_url])
+        # Same as yt-dlp's --load-info-json: no second metadata round-trip
+        with self.ydl_class(ydl_opts) as ydl:
+            ydl.process_ie_result(info, download=True)
+
+        if profile == "detect":
+            filepath = glob.glob(os.path.join(output_dir, "detect.*"))[0]
+        else:
+            filepath = os.path.join(output_dir, "video.mp4")
 
         return VideoInfo(
             title=info.get("title", "Unknown"),
@@ -63,14 +227,50 @@ class Downloader:
             channel=info.get("channel", info.get("uploader", "Unknown")),
             video_id=info.get("id", ""),
             filepath=filepath,
+            full_stream=full_stream,
         )
 
+    @staticmethod
+    def _pick_stream(formats: list[dict], max_height: int) -> dict | None:
+        """Pick the best directly seekable (HTTP) video format up to max_height.
+
+        Only plain http(s) URLs qualify: fragmented formats (http_dash_segments,
+        m3u8) are manifests that ffmpeg cannot range-seek as one URL.
+        """
+        candidates = [
+            f for f in formats
+            if f.get("url")
+            and f.get("vcodec") not in (None, "none")
+            and (f.get("height") or 0) <= max_height
+            and f.get("protocol") in ("http", "https")
+        ]
+        if not candidates:
+            return None
+
+        fmt = max(candidates, key=lambda f: (f.get("height") or 0, f.get("tbr") or 0))
+        return {
+            "url": fmt["url"],
+            "http_headers": fmt.get("http_headers") or {},
+            "cookies": fmt.get("cookies"),  # Set-Cookie format, as ffmpeg expects
+            "width": fmt.get("width"),
+            "height": fmt.get("height"),
+            "fps": fmt.get("fps"),
+        }
+
     def _extract_info(self, youtube_url: str) -> dict:
         """Extract video metadata without downloading."""
         ydl_opts = self._base_opts()
         ydl_opts["extract_flat"] = False
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            return ydl.extract_info(youtube_url, download=False)
+        with self.ydl_class(ydl_opts) as ydl:
+            info = ydl.extract_info(youtube_url, download=False)
+        return yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True)
+
+    @staticmethod
+    def extract_video_id(url: str) -> str | None:
+        """Extract the YouTube video id from a URL without a network call."""
+        import re
+        match = re.search(r"(?:v=|youtu\.be/|shorts/)([\w-]+)", url)
+        return match.group(1) if match else None
 
     @staticmethod
     def validate_url(url: str) -> bool:
@@ -78,3 +278,25 @@ class Downloader:
         import re
         pattern = r"^(https?://)?(www\.)?(youtube\.com/watch\?v=|youtu\.be/|youtube\.com/shorts/)[\w-]+"
         return bool(re.match(pattern, url))
+
+
+def _video_meta(video_info: VideoInfo) -> dict:
+    return {
+        "title": video_info.title,
+        "duration": video_info.duration,
+        "channel": video_info.channel,
+        "video_id": video_info.video_id,
+    }
+
+
+def _progress_hook(progress: Callable[[float], None]):
+    """yt-dlp progress hook reporting the downloaded fraction of the current file."""
+
+    def hook(status: dict) -> None:
+        total = status.get("total_bytes") or status.get("total_bytes_estimate")
+        if status.get("status") == "downloading" and total:
+            progress(status.get("downloaded_bytes", 0) / total)
+        elif status.get("status") == "finished":
+            progress(1.0)
+
+    return hook
@@ -1,8 +1,15 @@
-from dataclasses import dataclass
+import bisect
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
 import cv2
+import numpy as np
 
+from services.image_encoder import FrameEncoder
 from services.scene_detector import Scene
+from services.sharpness import sample_frames, sharpest
 
 
 @dataclass
@@ -12,43 +19,255 @@ class ExtractedFrame:
     filepath: str
     width: int
     height: int
+    variants: dict[str, str] = field(default_factory=dict)  # name -> filepath
+    sharpness: float | None = None  # Laplacian variance, with sharpness selection
 
 
 class FrameExtractor:
+    """Extract scene frames with OpenCV.
+
+    strategy controls how the capture moves between target frames:
+    "seek" calls CAP_PROP_POS_FRAMES for every target, "sequential" walks
+    forward with grab() and only retrieve()s wanted frames, and "auto" picks
+    per gap. A seek re-decodes from the previous keyframe, so its cost depends
+    on the GOP length, which is unknown up front. "auto" therefore always walks
+    gaps up to max_walk_seconds, and for longer gaps compares the measured
+    cost of a seek with gap x the measured cost of one grab().
+
+    With sharpness_samples > 1, that many frames around each scene's midpoint
+    (over the middle sharpness_span of the scene) are read in the same
+    forward pass and the sharpest one is kept, which avoids motion-blurred
+    midpoints.
+    """
+
+    def __init__(
+        self,
+        strategy: str = "auto",
+        max_walk_seconds: float = 1.0,
+        encoder: FrameEncoder | None = None,
+        sharpness_samples: int = 1,
+        sharpness_span: float = 0.5,
+    ):
+        if strategy not in ("auto", "seek", "sequential"):
+            raise ValueError(f"Unknown extraction strategy: {strategy}")
+        self.strategy = strategy
+        self.max_walk_seconds = max_walk_seconds
+        self.encoder = encoder or FrameEncoder()
+        self.sharpness_samples = max(1, sharpness_samples)
+        self.sharpness_span = sharpness_span
+        # Frames the last extract_at_timestamps() grabbed (remote fetches
+        # decode in ffmpeg and are not counted)
+        self.frames_decoded = 0
+
     def extract_at_timestamps(
-        self, video_path: str, scenes: list[Scene], output_dir: str
+        self,
+        video_path: str,
+        scenes: list[Scene],
+        output_dir: str,
+        keyframes: list[int] | None = None,
     ) -> list[ExtractedFrame]:
-        """Extract a frame at the midpoint of each scene."""
+        """Extract a frame at the midpoint of each scene (or the sharpest near it).
+
+        keyframes, the video's sorted keyframe frame numbers if known, replaces
+        the strategy: a target in the GOP being decoded is walked to, any
+        other is seeked to, so no GOP is decoded twice or skipped through.
+        """
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise RuntimeError(f"Failed to open video: {video_path}")
 
         fps = cap.get(cv2.CAP_PROP_FPS)
+        max_walk = self._max_walk_frames(fps)
         frames: list[ExtractedFrame] = []
+        pos = 0  # frame number the next grab() returns
+        grab_cost = seek_cost = None  # moving averages, seconds
+
+        # Scenes do not overlap, so each scene's samples are consecutive
+        targets = sorted(
+            (
+                (frame_number, scene)
+                for scene in scenes
+                for frame_number in self._sample_frames(scene, fps)
+            ),
+            key=lambda target: target[0],
+        )
+        pending: list[tuple[int, np.ndarray]] = []
+        self.frames_decoded = 0
+
+        def flush(scene: Scene) -> None:
+            frame = self._pick_frame(scene, pending, fps, output_dir)
+            if frame:
+                frames.append(frame)
+            pending.clear()
 
         try:
-            for scene in scenes:
-                frame_number = int(scene.mid_time * fps)
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-                ret, frame = cap.read()
-
-                if not ret:
-                    continue
-
-                filepath = f"{output_dir}/scene_{scene.index:03d}.png"
-                cv2.imwrite(filepath, frame)
-
-                h, w = frame.shape[:2]
-                frames.append(
-                    ExtractedFrame(
-                        index=scene.index,
-                        timestamp=scene.mid_time,
-                        filepath=filepath,
-                        width=w,
-                        height=h,
-                    )
-                )
+            for i, (frame_number, scene) in enumerate(targets):
+                gap = frame_number - pos
+
+                if keyframes:
+                    i_key = bisect.bisect_right(keyframes, frame_number)
+                    walk = gap >= 0 and (i_key == 0 or keyframes[i_key - 1] <= pos)
+                else:
+                    walk = 0 <= gap <= max_walk
+                    if not walk and gap > 0 and self.strategy == "auto" and seek_cost:
+                        walk = gap * grab_cost < seek_cost
+
+                # OpenCV decodes from the keyframe inside set(), so timing
+                # set() and the following grab() separately gives both costs
+                start = time.perf_counter()
+                if walk:
+                    for _ in range(gap):
+                        if not cap.grab():
+                            break
+                else:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                    seek_cost = _ema(seek_cost, time.perf_counter() - start)
+                    start = time.perf_counter()
+                ret = cap.grab()
+                grabbed = gap + 1 if walk else 1
+                self.frames_decoded += grabbed
+                grab_cost = _ema(grab_cost, (time.perf_counter() - start) / grabbed)
+                pos = frame_number + 1
+
+                if ret:
+                    ret, frame = cap.retrieve()
+                if ret:
+                    pending.append((frame_number, frame))
+                if i + 1 == len(targets) or targets[i + 1][1] is not scene:
+                    flush(scene)
         finally:
             cap.release()
 
         return frames
+
+    def _sample_frames(self, scene: Scene, fps: float) -> list[int]:
+        return sample_frames(
+            scene.start_time, scene.end_time, fps, self.sharpness_samples, self.sharpness_span
+        )
+
+    def _pick_frame(
+        self, scene: Scene, candidates: list[tuple[int, np.ndarray]], fps: float, output_dir: str
+    ) -> ExtractedFrame | None:
+        """Write the sharpest of a scene's (frame number, frame) candidates.
+
+        Without a frame rate (fps None or 0) frame numbers mean nothing, so
+        the single candidate is the scene's midpoint frame.
+        """
+        if not candidates:
+            return None
+        if self.sharpness_samples > 1 and fps:
+            best, score = sharpest([frame for _, frame in candidates])
+            frame_number, frame = candidates[best]
+            timestamp = frame_number / fps
+        else:
+            (_, frame), score, timestamp = candidates[0], None, scene.mid_time
+
+        filepath, variants = self.encoder.write(frame, output_dir, scene.index)
+        h, w = frame.shape[:2]
+        return ExtractedFrame(
+            index=scene.index,
+            timestamp=timestamp,
+            filepath=filepath,
+            width=w,
+            height=h,
+            variants=variants,
+            sharpness=score,
+        )
+
+    def extract_remote(
+        self, stream: dict, scenes: list[Scene], output_dir: str, workers: int = 4
+    ) -> list[ExtractedFrame]:
+        """Fetch the midpoint frame of each scene straight from a remote stream.
+
+        stream is Downloader's full_stream (url, http_headers, cookies). ffmpeg
+        seeks with HTTP range requests and decodes only from the keyframe
+        before each timestamp, so just a few GOPs are downloaded per frame
+        instead of the whole video. With sharpness selection, one ffmpeg run
+        per scene decodes forward over all of its samples; a stream with no
+        known frame rate falls back to the midpoint frame.
+        """
+
+        fps = stream.get("fps")
+
+        def fetch(scene: Scene) -> ExtractedFrame | None:
+            if self.sharpness_samples > 1 and fps:
+                numbers = self._sample_frames(scene, fps)
+                decoded = _fetch_remote_frames(stream, numbers, fps)
+                candidates = [(n, f) for n, f in zip(numbers, decoded) if f is not None]
+                return self._pick_frame(scene, candidates, fps, output_dir)
+
+            # Snap to the same frame extract_at_timestamps would pick
+            timestamp = int(scene.mid_time * fps) / fps if fps else scene.mid_time
+            frame = _fetch_remote_frame(stream, timestamp)
+            if frame is None:
+                return None
+            return self._pick_frame(scene, [(0, frame)], fps, output_dir)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return [f for f in pool.map(fetch, scenes) if f is not None]
+
+    def _max_walk_frames(self, fps: float) -> float:
+        """Largest gap (in frames) that is walked instead of seeked."""
+        if self.strategy == "seek":
+            return -1
+        if self.strategy == "sequential":
+            return float("inf")
+        return int(self.max_walk_seconds * fps)
+
+
+def _ffmpeg_input(stream: dict, timestamp: float) -> list[str]:
+    """ffmpeg arguments that open a remote stream seeked to timestamp."""
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    headers = "".join(f"{k}: {v}\r\n" for k, v in stream.get("http_headers", {}).items())
+    if headers:
+        cmd += ["-headers", headers]
+    if stream.get("cookies"):
+        cmd += ["-cookies", stream["cookies"]]
+    return cmd + ["-ss", f"{timestamp:.6f}", "-i", stream["url"]]
+
+
+def _fetch_remote_frame(stream: dict, timestamp: float, timeout: float = 60.0) -> np.ndarray | None:
+    """Decode the frame at timestamp from a remote stream with ffmpeg."""
+    cmd = _ffmpeg_input(stream, timestamp) + [
+        "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "-",
+    ]
+
+    proc = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    if proc.returncode != 0 or not proc.stdout:
+        return None
+    return cv2.imdecode(np.frombuffer(proc.stdout, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _fetch_remote_frames(
+    stream: dict, frame_numbers: list[int], fps: float, timeout: float = 120.0
+) -> list[np.ndarray | None]:
+    """Decode several nearby frames (sorted frame numbers) in one ffmpeg run.
+
+    ffmpeg seeks to the first frame and decodes forward, keeping only the
+    wanted frames. Frames are read as raw BGR, which needs the stream's
+    width and height; without them (or if the output does not match), each
+    frame is fetched on its own.
+    """
+    width, height = stream.get("width"), stream.get("height")
+    first = frame_numbers[0]
+    if width and height:
+        select = "+".join(f"eq(n\\,{n - first})" for n in frame_numbers)
+        cmd = _ffmpeg_input(stream, first / fps) + [
+            "-vf", f"select={select}", "-fps_mode", "passthrough",
+            "-frames:v", str(len(frame_numbers)),
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-",
+        ]
+        proc = subprocess.run(cmd, capture_output=True, timeout=timeout)
+        size = width * height * 3
+        if proc.returncode == 0 and proc.stdout and len(proc.stdout) % size == 0:
+            decoded = [
+                np.frombuffer(proc.stdout[i:i + size], np.uint8).reshape(height, width, 3)
+                for i in range(0, len(proc.stdout), size)
+            ]
+            return decoded + [None] * (len(frame_numbers) - len(decoded))
+
+    return [_fetch_remote_frame(stream, n / fps, timeout=timeout) for n in frame_numbers]
+
+
+def _ema(current: float | None, sample: float, weight: float = 0.3) -> float:
+    return sample if current is None else current + weight * (sample - current)
@@ -0,0 +1,82 @@
+import os
+import threading
+from typing import Callable
+
+from services.frame_extractor import ExtractedFrame
+from services.metrics import UPLOADED_BYTES
+
+
+def upload_extracted_frames(
+    storage,
+    job_id: str,
+    extracted: list[ExtractedFrame],
+    image_format: str,
+    on_frame: Callable[[dict], None] | None = None,
+) -> list[dict]:
+    """Upload frames and their variants in one batch and return manifest frame dicts.
+
+    on_frame, if given, receives each manifest frame dict as soon as the frame
+    and all of its variants are uploaded, in completion order.
+    Raises RuntimeError listing every blob that still failed after retries.
+    """
+    items = []
+    for frame in extracted:
+        items.append((frame.filepath, frame.index))
+        items += [(path, frame.index, name) for name, path in frame.variants.items()]
+
+    by_index = {frame.index: frame for frame in extracted}
+    pending = {frame.index: 1 + len(frame.variants) for frame in extracted}
+    done: dict[int, dict[str | None, str]] = {index: {} for index in by_index}
+    lock = threading.Lock()
+
+    def on_result(result) -> None:
+        if not result.ok:
+            return
+        with lock:
+            done[result.index][result.variant] = storage.get_public_url(result.blob_name)
+            pending[result.index] -= 1
+            finished = pending[result.index] == 0
+        if finished:
+            frame = by_index[result.index]
+            on_frame(_frame_info(frame, done[frame.index], image_format))
+
+    results = storage.upload_frames(items, job_id, on_result=on_result if on_frame else None)
+
+    UPLOADED_BYTES.inc(sum(os.path.getsize(r.local_path) for r in results if r.ok))
+    failed = [r for r in results if not r.ok]
+    if failed:
+        details = "; ".join(f"{r.local_path} ({r.attempts} attempts): {r.error}" for r in failed)
+        raise RuntimeError(f"Failed to upload {len(failed)}/{len(results)} files: {details}")
+
+    urls = {(r.index, r.variant): storage.get_public_url(r.blob_name) for r in results}
+    return [
+        _frame_info(
+            frame,
+            {variant: urls[(frame.index, variant)] for variant in [None, *frame.variants]},
+            image_format,
+        )
+        for frame in extracted
+    ]
+
+
+def frame_bytes(extracted: list[ExtractedFrame]) -> int:
+    """Size on disk of the frames and all of their variants."""
+    return sum(
+        os.path.getsize(path)
+        for frame in extracted
+        for path in [frame.filepath, *frame.variants.values()]
+    )
+
+
+def _frame_info(frame: ExtractedFrame, urls: dict[str | None, str], image_format: str) -> dict:
+    """Manifest frame dict; urls maps None to the full frame and names to variants."""
+    return {
+        "index": frame.index,
+        "timestamp": frame.timestamp,
+        "url": urls[None],
+        "width": frame.width,
+        "height": frame.height,
+        "format": image_format,
+        "variants": {name: urls[name] for name in frame.variants},
+        "sharpness": frame.sharpness,
+    }
@@ -0,0 +1,162 @@
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import cv2
+
+from services.image_encoder import FORMATS, FrameEncoder
+
+logger = logging.getLogger(__name__)
+
+# Content digests kept by (path, size, mtime), so unchanged files are hashed once
+DIGEST_CACHE_SIZE = 4096
+_digests: OrderedDict[tuple, str] = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def content_digest(path: str) -> str:
+    """Hash of a file's bytes, for ETags and variant names.
+
+    Memoized while the file's size and mtime are unchanged; a rewritten
+    file is hashed again.
+    """
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest is not None:
+            _digests.move_to_end(key)
+            return digest
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha.update(chunk)
+    digest = sha.hexdigest()[:32]
+
+    with _digests_lock:
+        _digests[key] = digest
+        while len(_digests) > DIGEST_CACHE_SIZE:
+            _digests.popitem(last=False)
+    return digest
+
+
+class FrameVariantCache:
+    """Resized / re-encoded copies of served frames, kept on disk.
+
+    A variant is named by a hash of its source file's content and the
+    requested width, format and quality, so a rewritten frame never serves
+    an old variant. Repeat requests are answered from disk without
+    decoding. Least recently used variants are evicted once the cache holds
+    more than max_bytes; like VideoCache, changes take a file lock on the
+    root, so processes on one host can share it.
+    """
+
+    def __init__(
+        self, root: str = "frame_variant_cache", max_bytes: int = 512 * 1024**2, quality: int = 90
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def get_or_create(self, source_path: str, width: int | None, fmt: str | None) -> str:
+        """Return the path of source_path at width (never upscaled) in fmt.
+
+        fmt defaults to the source's own format. Raises ValueError for a
+        format this OpenCV build cannot write and RuntimeError for a source
+        it cannot read.
+        """
+        fmt = fmt or format_of(source_path)
+        encoder = FrameEncoder(fmt=fmt, quality=self.quality)
+        key = ":".join(
+            str(part) for part in (content_digest(source_path), width, fmt, self.quality)
+        )
+        name = hashlib.sha256(key.encode()).hexdigest()[:32] + encoder.extension
+        path = os.path.join(self.root, name)
+        try:
+            os.utime(path)  # most recently used
+            return path
+        except FileNotFoundError:
+            pass
+
+        image = cv2.imread(source_path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise RuntimeError(f"Failed to read frame: {source_path}")
+        h, w = image.shape[:2]
+        if width is not None and width < w:
+            height = max(1, round(h * width / w))
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+        # Written aside and renamed, so readers never see a partial file
+        staging = os.path.join(self.root, f".staging-{uuid.uuid4().hex}{encoder.extension}")
+        try:
+            encoder.write_image(image, staging)
+            with self._locked():
+                os.replace(staging, path)
+                self._evict(keep=path)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+        return path
+
+    @contextmanager
+    def _locked(self):
+        """Serialize changes across threads (lock) and processes (flock)."""
+        with self._lock, open(os.path.join(self.root, ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used variants beyond max_bytes. Caller holds the lock."""
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort(reverse=True)
+
+        total = 0
+        for _, size, path in entries:
+            total += size
+            if total > self.max_bytes and path != keep:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning("Cannot evict frame variant %s: %s", path, e)
+
+
+def format_of(path: str) -> str | None:
+    """Image format name (as in FORMATS) for a file's extension, or None."""
+    ext = os.path.splitext(path)[1].lower()
+    return next((name for name, (e, _) in FORMATS.items() if e == ext), None)
+
+
+_cache: FrameVariantCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_frame_variant_cache() -> FrameVariantCache:
+    """Return the process-wide frame variant cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from config import get_settings
+
+            settings = get_settings()
+            _cache = FrameVariantCache(
+                settings.frame_variant_cache_dir,
+                max_bytes=settings.frame_variant_cache_max_mb * 1024**2,
+                quality=settings.frame_quality,
+            )
+        return _cache
@@ -0,0 +1,85 @@
+import os
+
+import cv2
+import numpy as np
+
+# format -> (file extension, OpenCV quality flag or None for lossless)
+FORMATS = {
+    "png": (".png", None),
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "avif": (".avif", getattr(cv2, "IMWRITE_AVIF_QUALITY", None)),
+}
+
+# Allowed variant heights (pixels)
+MIN_VARIANT_HEIGHT = 16
+MAX_VARIANT_HEIGHT = 2160
+
+CONTENT_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+}
+
+
+def content_type_for(path: str) -> str:
+    """Return the MIME type for a frame file based on its extension."""
+    return CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+class FrameEncoder:
+    """Encode a frame in the configured format, plus optional downscaled variants.
+
+    Variants are given as target heights (e.g. 480) and named "<height>p".
+    They are resized from the already decoded frame, so no extra decode is
+    needed. Heights at or above the source height are skipped.
+    """
+
+    def __init__(self, fmt: str = "png", quality: int = 90, variant_heights: list[int] | None = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        ext, _ = FORMATS[fmt]
+        if not cv2.haveImageWriter(f"frame{ext}"):
+            raise ValueError(f"Image format not supported by this OpenCV build: {fmt}")
+        for height in variant_heights or []:
+            if not MIN_VARIANT_HEIGHT <= height <= MAX_VARIANT_HEIGHT:
+                raise ValueError(
+                    f"Variant height must be {MIN_VARIANT_HEIGHT}-{MAX_VARIANT_HEIGHT}: {height}"
+                )
+        self.format = fmt
+        self.quality = quality
+        self.variant_heights = sorted(set(variant_heights or []), reverse=True)
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.format][0]
+
+    def write(self, frame: np.ndarray, output_dir: str, index: int) -> tuple[str, dict[str, str]]:
+        """Write the full frame and its variants. Returns (filepath, {variant: filepath})."""
+        filepath = f"{output_dir}/scene_{index:03d}{self.extension}"
+        self._imwrite(filepath, frame)
+
+        variants = {}
+        h, w = frame.shape[:2]
+        for height in self.variant_heights:
+            if height >= h:
+                continue
+            width = max(1, round(w * height / h))
+            small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            name = f"{height}p"
+            variant_path = f"{output_dir}/scene_{index:03d}_{name}{self.extension}"
+            self._imwrite(variant_path, small)
+            variants[name] = variant_path
+
+        return filepath, variants
+
+    def write_image(self, image: np.ndarray, filepath: str) -> None:
+        """Write one image as-is; filepath should end in self.extension."""
+        self._imwrite(filepath, image)
+
+    def _imwrite(self, filepath: str, image: np.ndarray) -> None:
+        _, flag = FORMATS[self.format]
+        params = [flag, self.quality] if flag is not None else []
+        if not cv2.imwrite(filepath, image, params):
+            raise RuntimeError(f"Failed to write frame: {filepath}")
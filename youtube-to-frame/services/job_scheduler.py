@@ -0,0 +1,232 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler queue has no room for another job."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class SchedulerClosedError(Exception):
+    """Raised when a job is submitted while the scheduler is draining."""
+
+
+class JobScheduler:
+    """Run jobs on a fixed pool of worker threads fed by bounded queues.
+
+    Jobs beyond max_queue waiting ones are rejected with QueueFullError
+    instead of piling up, so a burst cannot start unbounded concurrent
+    downloads and decodes. Jobs an idle worker is about to start do not
+    count as waiting, so max_queue=0 runs jobs only while a worker is free.
+    Queue positions are 1-based (1 = next to start).
+
+    Batch jobs wait in a separate lane (up to max_batch_queue), one FIFO per
+    batch served round-robin, so one large batch cannot starve another.
+    Interactive jobs always start first, and batch jobs never occupy more
+    than batch_share of the workers, and never all of them, which keeps at
+    least one free for interactive requests. With a single worker batches
+    need it too: an interactive job then waits for at most the batch job
+    already running.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 32,
+        batch_share: float = 0.5,
+        max_batch_queue: int = 1000,
+    ):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.batch_slots = max(1, math.floor(self.workers * batch_share))
+        if self.workers > 1:
+            self.batch_slots = min(self.batch_slots, self.workers - 1)
+        self.max_batch_queue = max(0, max_batch_queue)
+        self._queue: deque[tuple[str, Callable, tuple]] = deque()
+        self._batches: OrderedDict[str, deque[tuple[str, Callable, tuple]]] = OrderedDict()
+        self._batch_queued = 0
+        self._running: set[str] = set()
+        self._batch_running = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._avg_duration: float | None = None  # seconds, moving average
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job_id: str, fn: Callable, *args) -> int:
+        """Queue fn(*args) and return the job's queue position."""
+        with self._cond:
+            if self._closed:
+                raise SchedulerClosedError("Server is shutting down")
+            if len(self._queue) >= self.max_queue + self._idle_workers():
+                raise QueueFullError(self._retry_after(self.workers))
+            self._queue.append((job_id, fn, args))
+            self._cond.notify()
+            return len(self._queue)
+
+    def submit_batch(self, batch_id: str, jobs: list[tuple[str, Callable, tuple]]) -> None:
+        """Queue (job_id, fn, args) items of one batch, all or none."""
+        with self._cond:
+            if self._closed:
+                raise SchedulerClosedError("Server is shutting down")
+            free_slots = min(
+                self.batch_slots - self._batch_running,
+                self._idle_workers() - len(self._queue),
+            )
+            if self._batch_queued + len(jobs) > self.max_batch_queue + max(0, free_slots):
+                raise QueueFullError(self._retry_after(self.batch_slots))
+            self._batches.setdefault(batch_id, deque()).extend(jobs)
+            self._batch_queued += len(jobs)
+            self._cond.notify_all()
+
+    def position(self, job_id: str) -> int | None:
+        """Return the 1-based queue position of a waiting job, or None."""
+        with self._cond:
+            for i, (queued_id, _, _) in enumerate(self._queue):
+                if queued_id == job_id:
+                    return i + 1
+            # Round-robin: batches before ours in the rotation start up to
+            # i + 1 jobs before ours, the ones after it up to i
+            batches = list(self._batches.values())
+            for n, batch in enumerate(batches):
+                for i, (queued_id, _, _) in enumerate(batch):
+                    if queued_id == job_id:
+                        ahead = sum(min(len(b), i + 1) for b in batches[:n])
+                        ahead += sum(min(len(b), i) for b in batches[n + 1:])
+                        return len(self._queue) + ahead + i + 1
+        return None
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "batch_running": self._batch_running,
+                "batch_queued": self._batch_queued,
+                "batch_slots": self.batch_slots,
+            }
+
+    def shutdown(self, timeout: float | None = None) -> list[str]:
+        """Stop accepting jobs and wait for queued and running ones to finish.
+
+        Returns the ids of jobs still queued when timeout expired; they are
+        removed from the queue and never started.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            while self._queue or self._batches or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            dropped = [job_id for job_id, _, _ in self._queue]
+            dropped += [job_id for batch in self._batches.values() for job_id, _, _ in batch]
+            self._queue.clear()
+            self._batches.clear()
+            self._batch_queued = 0
+            self._cond.notify_all()
+            return dropped
+
+    def _idle_workers(self) -> int:
+        """Workers not running a job. Caller holds the lock."""
+        return self.workers - len(self._running)
+
+    def _retry_after(self, slots: int) -> int:
+        # Time until a queue slot frees up: one job per worker ahead of us
+        per_job = self._avg_duration or 30.0
+        return max(1, math.ceil(per_job / slots))
+
+    def _next_job(self) -> tuple[tuple[str, Callable, tuple], bool] | None:
+        """Pop the next runnable job as (job, is_batch). Caller holds the lock."""
+        if self._queue:
+            return self._queue.popleft(), False
+        if self._batches and self._batch_running < self.batch_slots:
+            batch_id, batch = next(iter(self._batches.items()))
+            job = batch.popleft()
+            self._batch_queued -= 1
+            del self._batches[batch_id]
+            if batch:
+                self._batches[batch_id] = batch  # back of the round-robin
+            return job, True
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    picked = self._next_job()
+                    if picked is not None or (self._closed and not self._queue and not self._batches):
+                        break
+                    self._cond.wait()
+                if picked is None:
+                    return
+                (job_id, fn, args), is_batch = picked
+                self._running.add(job_id)
+                if is_batch:
+                    self._batch_running += 1
+
+            start = time.monotonic()
+            try:
+                fn(*args)
+            except Exception:
+                # Jobs record their own failures; keep the worker alive
+                pass
+            finally:
+                elapsed = time.monotonic() - start
+                with self._cond:
+                    self._running.discard(job_id)
+                    if is_batch:
+                        self._batch_running -= 1
+                    self._avg_duration = (
+                        elapsed if self._avg_duration is None
+                        else self._avg_duration + 0.2 * (elapsed - self._avg_duration)
+                    )
+                    self._cond.notify_all()
+
+
+_scheduler: JobScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_job_scheduler() -> JobScheduler:
+    """Return the process-wide job scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from config import get_settings
+
+            settings = get_settings()
+            _scheduler = JobScheduler(
+                workers=settings.job_workers,
+                max_queue=settings.job_queue_size,
+                batch_share=settings.batch_worker_share,
+                max_batch_queue=settings.batch_queue_size,
+            )
+            _watch_queue(_scheduler)
+        return _scheduler
+
+
+def _watch_queue(scheduler: JobScheduler) -> None:
+    """Report the scheduler's waiting jobs on the queued-jobs gauge at scrape time."""
+    from services.metrics import JOBS_QUEUED
+
+    def queued() -> int:
+        stats = scheduler.stats()
+        return stats["queued"] + stats["batch_queued"]
+
+    JOBS_QUEUED.labels("api").set_function(queued)
@@ -0,0 +1,71 @@
+import cProfile
+import logging
+import marshal
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+def probe_video(video_path: str) -> dict:
+    """Resolution, frame rate and frame count of a video file (from its header)."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return {}
+        return {
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": round(cap.get(cv2.CAP_PROP_FPS), 3),
+            "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        }
+    finally:
+        cap.release()
+
+
+class JobProfiler:
+    """cProfile one job, when its request asks for it.
+
+    Only the job's own thread is profiled: upload threads, parallel
+    detection processes and ffmpeg show up as the time spent waiting on
+    them. Python 3.12+ allows one active profiler per process, so a job
+    that starts while another is being profiled runs without one.
+    """
+
+    def __init__(self, enabled: bool):
+        self._profiler: cProfile.Profile | None = None
+        if not enabled:
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            logger.warning("Job not profiled: %s", e)
+            return
+        self._profiler = profiler
+
+    def stop(self) -> bytes | None:
+        """Stop profiling and return the stats in pstats dump format, if profiled."""
+        if self._profiler is None:
+            return None
+        profiler, self._profiler = self._profiler, None
+        profiler.disable()
+        profiler.create_stats()
+        # What Profile.dump_stats() writes, readable with pstats.Stats(path)
+        return marshal.dumps(profiler.stats)
+
+
+def finish_stats(stats: dict, timer, profiler: JobProfiler, storage, job_id: str) -> dict:
+    """Add the timings of a StageTimer to stats and store the job's profile, if any.
+
+    A profile that cannot be stored is logged, never failing the job.
+    """
+    stats["stages"] = {stage: round(seconds, 3) for stage, seconds in timer.timings.items()}
+    stats["total_seconds"] = round(timer.elapsed(), 3)
+    data = profiler.stop()
+    if data is not None:
+        try:
+            stats["profile_url"] = storage.get_public_url(storage.write_profile(job_id, data))
+        except Exception as e:
+            logger.warning("Cannot store profile of job %s: %s", job_id, e)
+    return stats
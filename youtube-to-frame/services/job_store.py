@@ -0,0 +1,343 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# Columns that can be set on a job; datetimes and JSON fields are converted
+_FIELDS = (
+    "status", "created_at", "video_info", "frames", "total_frames",
+    "completed_at", "error", "progress", "stats",
+)
+_JSON_FIELDS = ("video_info", "frames", "stats")
+_DATETIME_FIELDS = ("created_at", "completed_at")
+_DEFAULTS = {"frames": [], "total_frames": 0, "progress": 0.0}
+FINISHED = ("completed", "failed")
+# claim() evicts expired jobs at most this often
+EVICT_INTERVAL = 60.0
+ABANDONED_ERROR = "The process running the job stopped before it finished"
+
+
+class MemoryJobStore:
+    """In-process job store. Jobs are lost on restart and not shared between workers."""
+
+    def __init__(self, ttl_seconds: int = 86400):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: dict[str, tuple[dict, float]] = {}  # job_id -> (job, updated_at)
+        self._batches: dict[str, tuple[dict, float]] = {}  # batch_id -> (batch, created_at)
+        self._lock = threading.Lock()
+        self._last_evict = time.time()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return dict(entry[0]) if entry else None
+
+    def put(self, job_id: str, job: dict) -> None:
+        with self._lock:
+            self._jobs[job_id] = (dict(job), time.time())
+
+    def claim(self, job_id: str, job: dict) -> bool:
+        """Store job unless an unfinished job with this id exists."""
+        if time.time() - self._last_evict > EVICT_INTERVAL:
+            self.evict_expired()
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry and entry[0]["status"] not in FINISHED:
+                return False
+            self._jobs[job_id] = (dict(job), time.time())
+            return True
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry:
+                entry[0].update(fields)
+                self._jobs[job_id] = (entry[0], time.time())
+
+    def get_many(self, job_ids: list[str]) -> dict[str, dict]:
+        with self._lock:
+            return {
+                job_id: dict(self._jobs[job_id][0]) for job_id in job_ids if job_id in self._jobs
+            }
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def put_batch(self, batch_id: str, batch: dict) -> None:
+        with self._lock:
+            self._batches[batch_id] = (dict(batch), time.time())
+
+    def get_batch(self, batch_id: str) -> dict | None:
+        with self._lock:
+            entry = self._batches.get(batch_id)
+            return dict(entry[0]) if entry else None
+
+    def evict_expired(self) -> int:
+        self._last_evict = time.time()
+        cutoff = self._last_evict - self.ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, (_, updated) in self._jobs.items() if updated < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+            for batch_id in [b for b, (_, created) in self._batches.items() if created < cutoff]:
+                del self._batches[batch_id]
+        return len(expired)
+
+
+class SQLiteJobStore:
+    """Job store in a SQLite file, shared by every process on the host.
+
+    Uses WAL mode with a busy timeout, so several uvicorn workers can read
+    and write concurrently. Each thread gets its own connection. Jobs not
+    updated for ttl_seconds are evicted (finished jobs are never updated
+    again, so this is their TTL).
+
+    Jobs claimed here record this process as their owner, and a background
+    thread renews their heartbeat every stale_seconds / 3. An unfinished job
+    whose heartbeat is older than stale_seconds lost its process (crash,
+    OOM kill): it reads as failed, and claim() takes it over.
+    """
+
+    def __init__(self, path: str = "jobs.db", ttl_seconds: int = 86400, stale_seconds: float = 60.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._last_evict = time.time()
+        self._heartbeat: threading.Thread | None = None
+        self._heartbeat_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT,
+                video_info TEXT,
+                frames TEXT NOT NULL DEFAULT '[]',
+                total_frames INTEGER NOT NULL DEFAULT 0,
+                completed_at TEXT,
+                error TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                stats TEXT,
+                owner TEXT,
+                heartbeat_at REAL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Databases created before progress tracking / job stats / heartbeats
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in (
+            ("progress", "REAL NOT NULL DEFAULT 0"),
+            ("stats", "TEXT"),
+            ("owner", "TEXT"),
+            ("heartbeat_at", "REAL"),
+        ):
+            if column in columns:
+                continue
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            except sqlite3.OperationalError:
+                pass  # added by another process meanwhile
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, job_id: str) -> dict | None:
+        row = self._conn().execute(
+            f"SELECT {', '.join(_FIELDS)}, heartbeat_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._job(row)
+
+    def _job(self, row: sqlite3.Row) -> dict:
+        job = {key: _decode(key, row[key]) for key in _FIELDS}
+        if job["status"] not in FINISHED and self._is_stale(row["heartbeat_at"]):
+            job["status"] = "failed"
+            job["error"] = job["error"] or ABANDONED_ERROR
+        return job
+
+    def _is_stale(self, heartbeat_at: float | None) -> bool:
+        # Jobs stored with put() have no owner and no heartbeat
+        return heartbeat_at is not None and heartbeat_at < time.time() - self.stale_seconds
+
+    def put(self, job_id: str, job: dict) -> None:
+        placeholders = ", ".join("?" for _ in _FIELDS)
+        self._conn().execute(
+            f"INSERT OR REPLACE INTO jobs (job_id, {', '.join(_FIELDS)}, updated_at) "
+            f"VALUES (?, {placeholders}, ?)",
+            (job_id, *_encode_job(job), time.time()),
+        )
+
+    def claim(self, job_id: str, job: dict) -> bool:
+        """Store job unless an unfinished job with this id exists.
+
+        Atomic across processes, so only one worker starts a given job. An
+        unfinished job whose owner stopped heartbeating is taken over.
+        """
+        if time.time() - self._last_evict > EVICT_INTERVAL:
+            self.evict_expired()
+        self._start_heartbeat()
+        now = time.time()
+        columns = (*_FIELDS, "owner", "heartbeat_at", "updated_at")
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{key} = excluded.{key}" for key in columns)
+        cur = self._conn().execute(
+            f"""
+            INSERT INTO jobs (job_id, {', '.join(columns)})
+            VALUES (?, {placeholders})
+            ON CONFLICT (job_id) DO UPDATE SET {updates}
+            WHERE jobs.status IN ({', '.join('?' for _ in FINISHED)})
+                OR jobs.heartbeat_at < ?
+            """,
+            (job_id, *_encode_job(job), self.owner, now, now, *FINISHED, now - self.stale_seconds),
+        )
+        return cur.rowcount > 0
+
+    def _start_heartbeat(self) -> None:
+        with self._heartbeat_lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(
+                    target=self._beat, name="job-heartbeat", daemon=True
+                )
+                self._heartbeat.start()
+
+    def _beat(self) -> None:
+        """Renew the heartbeat of this process's unfinished jobs, forever."""
+        while True:
+            time.sleep(self.stale_seconds / 3)
+            try:
+                self._conn().execute(
+                    f"UPDATE jobs SET heartbeat_at = ? WHERE owner = ? "
+                    f"AND status NOT IN ({', '.join('?' for _ in FINISHED)})",
+                    (time.time(), self.owner, *FINISHED),
+                )
+            except sqlite3.Error:
+                pass  # e.g. locked for longer than the busy timeout; retried next beat
+
+    def update(self, job_id: str, **fields) -> None:
+        unknown = set(fields) - set(_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        values = [_encode(key, value) for key, value in fields.items()]
+        self._conn().execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ? WHERE job_id = ?",
+            (*values, time.time(), job_id),
+        )
+
+    def get_many(self, job_ids: list[str]) -> dict[str, dict]:
+        """Return the existing jobs among job_ids, keyed by id, in one query."""
+        jobs = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(job_ids), 500):
+            chunk = job_ids[start:start + 500]
+            rows = self._conn().execute(
+                f"SELECT job_id, {', '.join(_FIELDS)}, heartbeat_at FROM jobs "
+                f"WHERE job_id IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            )
+            for row in rows:
+                jobs[row["job_id"]] = self._job(row)
+        return jobs
+
+    def delete(self, job_id: str) -> None:
+        self._conn().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def put_batch(self, batch_id: str, batch: dict) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO batches (batch_id, body, updated_at) VALUES (?, ?, ?)",
+            (batch_id, json.dumps(batch, ensure_ascii=False, default=str), time.time()),
+        )
+
+    def get_batch(self, batch_id: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT body FROM batches WHERE batch_id = ?", (batch_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        batch = json.loads(row["body"])
+        batch["created_at"] = datetime.fromisoformat(batch["created_at"])
+        return batch
+
+    def evict_expired(self) -> int:
+        self._last_evict = time.time()
+        cutoff = self._last_evict - self.ttl_seconds
+        cur = self._conn().execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+        self._conn().execute("DELETE FROM batches WHERE updated_at < ?", (cutoff,))
+        return cur.rowcount
+
+
+def _encode_job(job: dict) -> list:
+    return [_encode(key, job.get(key)) for key in _FIELDS]
+
+
+def _encode(key: str, value):
+    if value is None:
+        value = _DEFAULTS.get(key)
+    if value is None:
+        return None
+    if key in _JSON_FIELDS:
+        return json.dumps(value, ensure_ascii=False)
+    if key in _DATETIME_FIELDS:
+        return value.isoformat()
+    return value
+
+
+def _decode(key: str, value):
+    if key in _JSON_FIELDS:
+        return json.loads(value) if value is not None else None
+    if key in _DATETIME_FIELDS and value is not None:
+        return datetime.fromisoformat(value)
+    return value
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Return the process-wide job store selected by JOB_STORE."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            from config import get_settings
+
+            settings = get_settings()
+            if settings.job_store == "sqlite":
+                _store = SQLiteJobStore(
+                    settings.job_store_path,
+                    ttl_seconds=settings.job_ttl,
+                    stale_seconds=settings.job_stale_seconds,
+                )
+            elif settings.job_store == "memory":
+                _store = MemoryJobStore(ttl_seconds=settings.job_ttl)
+            else:
+                raise ValueError(f"Unknown job store: {settings.job_store}")
+        return _store
@@ -1,38 +1,70 @@
+import fcntl
 import json
+import mimetypes
 import os
 import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from services.batch_upload import UploadResult, upload_concurrently
+
+# /frames falls back to mimetypes for content types; make sure newer formats are known
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
 
 
 class LocalStorage:
     """Local filesystem storage for development. Mirrors GCSStorage interface."""
 
-    def __init__(self, base_dir: str = "extracted_frames"):
+    def __init__(
+        self, base_dir: str = "extracted_frames", upload_workers: int = 8, upload_retries: int = 3
+    ):
         self.base_dir = base_dir
+        self.upload_workers = upload_workers
+        self.upload_retries = upload_retries
         os.makedirs(base_dir, exist_ok=True)
 
-    def upload_frame(self, local_path: str, job_id: str, index: int) -> str:
+    def upload_frame(
+        self, local_path: str, job_id: str, index: int, variant: str | None = None
+    ) -> str:
         """Copy a frame to local storage. Returns the relative path."""
         job_dir = os.path.join(self.base_dir, job_id)
         os.makedirs(job_dir, exist_ok=True)
-        blob_name = f"{job_id}/scene_{index:03d}.png"
+        ext = os.path.splitext(local_path)[1] or ".png"
+        suffix = f"_{variant}" if variant else ""
+        blob_name = f"{job_id}/scene_{index:03d}{suffix}{ext}"
         dest = os.path.join(self.base_dir, blob_name)
         shutil.copy2(local_path, dest)
         return blob_name
 
-    def upload_frames(self, frame_paths: list[tuple[str, int]], job_id: str) -> list[str]:
-        blob_names = []
-        for local_path, index in frame_paths:
-            blob_name = self.upload_frame(local_path, job_id, index)
-            blob_names.append(blob_name)
-        return blob_names
+    def upload_frames(
+        self, frame_paths: list[tuple], job_id: str, on_result=None
+    ) -> list[UploadResult]:
+        """Copy frames in parallel, with the same per-item results as GCSStorage."""
+        return upload_concurrently(
+            self.upload_frame,
+            frame_paths,
+            job_id,
+            max_workers=self.upload_workers,
+            retries=self.upload_retries,
+            retryable=(OSError,),
+            backoff=0.05,
+            on_result=on_result,
+        )
 
     def write_manifest(self, job_id: str, manifest: dict) -> str:
         job_dir = os.path.join(self.base_dir, job_id)
         os.makedirs(job_dir, exist_ok=True)
         blob_name = f"{job_id}/manifest.json"
         filepath = os.path.join(self.base_dir, blob_name)
-        with open(filepath, "w") as f:
+        # Status polling and event streams read it while jobs write it
+        tmp = f"{filepath}.{uuid.uuid4().hex}"
+        with open(tmp, "w") as f:
             json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, filepath)
         return blob_name
 
     def read_manifest(self, job_id: str) -> dict | None:
@@ -42,9 +74,77 @@ class LocalStorage:
         with open(filepath) as f:
             return json.load(f)
 
+    def write_profile(self, job_id: str, data: bytes) -> str:
+        """Write a job's cProfile dump (pstats format) next to its manifest."""
+        job_dir = os.path.join(self.base_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        blob_name = f"{job_id}/profile.prof"
+        with open(os.path.join(self.base_dir, blob_name), "wb") as f:
+            f.write(data)
+        return blob_name
+
+    def write_scores(self, name: str, scores: np.ndarray) -> str:
+        """Write a scene detection score series as .npy (atomically)."""
+        path = os.path.join(self.base_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.npy"
+        np.save(tmp, scores)
+        os.replace(tmp, path)
+        return name
+
+    def read_scores(self, name: str) -> np.ndarray | None:
+        """Memory-map a score series written by write_scores(). None if not found."""
+        try:
+            return np.load(os.path.join(self.base_dir, name), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
     def get_public_url(self, blob_name: str) -> str:
         """Return a URL that the local FastAPI server can serve."""
         return f"/frames/{blob_name}"
 
     def job_exists(self, job_id: str) -> bool:
         return os.path.exists(os.path.join(self.base_dir, job_id, "manifest.json"))
+
+    def acquire_lease(self, job_id: str, owner: str, ttl_seconds: float) -> bool:
+        """Take the job's processing lease unless another owner holds a live one.
+
+        Lease changes hold a file lock next to the lease, so exactly one
+        caller wins even when several processes race for the same job.
+        """
+        path = os.path.join(self.base_dir, job_id, "lease.json")
+        with self._lease_locked(job_id):
+            lease = _read_json(path)
+            if lease and lease.get("owner") != owner and lease.get("expires_at", 0) > time.time():
+                return False
+            # Missing, expired or already ours; readers see the old or the new lease
+            tmp = f"{path}.{uuid.uuid4().hex}"
+            with open(tmp, "w") as f:
+                json.dump({"owner": owner, "expires_at": time.time() + ttl_seconds}, f)
+            os.replace(tmp, path)
+            return True
+
+    def release_lease(self, job_id: str, owner: str) -> None:
+        """Drop the job's lease if owner still holds it."""
+        path = os.path.join(self.base_dir, job_id, "lease.json")
+        with self._lease_locked(job_id):
+            lease = _read_json(path)
+            if lease and lease.get("owner") == owner:
+                os.remove(path)
+
+    @contextmanager
+    def _lease_locked(self, job_id: str):
+        """Serialize lease changes of a job across threads and processes (flock)."""
+        job_dir = os.path.join(self.base_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        with open(os.path.join(job_dir, "lease.lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+
+def _read_json(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,105 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+# What the downloader reads and yt-dlp needs to select and download a format
+# from a stored info dict (process_ie_result); subtitles, thumbnails,
+# descriptions and the like are dropped
+INFO_KEYS = {
+    "_type", "_format_sort_fields", "id", "display_id", "title", "duration", "fps",
+    "channel", "uploader", "extractor", "extractor_key", "webpage_url",
+    "webpage_url_basename", "webpage_url_domain", "live_status", "is_live",
+    "was_live", "http_headers",
+}
+FORMAT_KEYS = {
+    "format_id", "format", "format_note", "url", "manifest_url", "protocol", "ext",
+    "container", "vcodec", "acodec", "width", "height", "fps", "dynamic_range",
+    "tbr", "vbr", "abr", "asr", "audio_channels", "filesize", "filesize_approx",
+    "quality", "source_preference", "preference", "language", "language_preference",
+    "has_drm", "http_headers", "cookies", "downloader_options",
+}
+
+
+def trim_info(info: dict) -> dict:
+    """The parts of an info dict the downloader uses, as a new dict.
+
+    Fragmented formats (DASH segments, storyboards) carry a list of every
+    fragment and are left out; the plain URL formats cover the download.
+    """
+    trimmed = {k: copy.deepcopy(v) for k, v in info.items() if k in INFO_KEYS}
+    trimmed["formats"] = [
+        {k: copy.deepcopy(v) for k, v in f.items() if k in FORMAT_KEYS}
+        for f in info.get("formats") or []
+        if not f.get("fragments")
+    ]
+    return trimmed
+
+
+class MetadataCache:
+    """In-process LRU of yt-dlp info dicts keyed by video id, with a TTL.
+
+    The info dict carries signed stream URLs that expire after a few hours,
+    so the TTL should stay well below that. Entries are trimmed copies
+    (trim_info), a few KB instead of the MBs of a full info dict, and
+    callers get their own copy, because yt-dlp mutates the dict it processes.
+    """
+
+    def __init__(self, ttl_seconds: int = 1800, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, video_id: str | None) -> dict | None:
+        """Return a copy of the fresh info dict for video_id, or None."""
+        info = self.peek(video_id)
+        return copy.deepcopy(info) if info is not None else None
+
+    def peek(self, video_id: str | None) -> dict | None:
+        """Return the cached info dict itself; callers must not modify it."""
+        if not video_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                return None
+            info, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[video_id]
+                return None
+            self._entries.move_to_end(video_id)
+            return info
+
+    def put(self, video_id: str | None, info: dict) -> None:
+        if not video_id or self.max_entries <= 0:
+            return
+        info = trim_info(info)
+        with self._lock:
+            self._entries[video_id] = (info, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, video_id: str | None) -> None:
+        with self._lock:
+            self._entries.pop(video_id, None)
+
+
+_cache: MetadataCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_metadata_cache() -> MetadataCache:
+    """Return the process-wide metadata cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from config import get_settings
+
+            settings = get_settings()
+            _cache = MetadataCache(
+                ttl_seconds=settings.metadata_cache_ttl,
+                max_entries=settings.metadata_cache_max_entries,
+            )
+        return _cache
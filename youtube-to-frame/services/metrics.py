@@ -0,0 +1,97 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Download and detection of a long video take minutes, frame writes and
+# manifests well under a second
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "mvframe_stage_seconds",
+    "Time spent in each pipeline stage of an extraction job",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+STAGE_FAILURES = Counter(
+    "mvframe_stage_failures_total",
+    "Extraction jobs that failed, by the stage they failed in",
+    ["stage"],
+)
+JOBS_FINISHED = Counter(
+    "mvframe_jobs_finished_total",
+    "Extraction jobs that finished, by where they ran and how they ended",
+    ["source", "status"],
+)
+JOBS_ACTIVE = Gauge(
+    "mvframe_jobs_active",
+    "Extraction jobs running in this process",
+    ["source"],
+)
+JOBS_QUEUED = Gauge(
+    "mvframe_jobs_queued",
+    "Extraction jobs waiting for a worker thread in this process",
+    ["source"],
+)
+DOWNLOADED_BYTES = Counter(
+    "mvframe_downloaded_bytes_total",
+    "Video bytes downloaded from YouTube (video cache hits are not counted)",
+)
+UPLOADED_BYTES = Counter(
+    "mvframe_uploaded_bytes_total",
+    "Frame and variant bytes uploaded to storage",
+)
+
+
+class StageTimer:
+    """Observe how long a job spends in each stage.
+
+    stage() closes the previous stage and starts the next, the same way
+    JobProgress.stage() moves a job along. done() or failed() closes the
+    last one; failed() also counts a failure against it, unless the job
+    was already done. Each call is a clock read and a histogram update, so
+    it costs nothing next to a stage. The job's own seconds per stage are
+    kept in timings.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.timings: dict[str, float] = {}
+        self._stage: str | None = None
+        self._start = 0.0
+        self._created = time.perf_counter()
+        self._finished = False
+        JOBS_ACTIVE.labels(source).inc()
+
+    def elapsed(self) -> float:
+        """Seconds since the job started."""
+        return time.perf_counter() - self._created
+
+    def stage(self, name: str) -> None:
+        self._close()
+        self._stage = name
+        self._start = time.perf_counter()
+
+    def done(self) -> None:
+        self._close()
+        self._finish("completed")
+
+    def failed(self) -> None:
+        if self._finished:
+            return  # e.g. a step after done() failed
+        STAGE_FAILURES.labels(self._stage or "unknown").inc()
+        self._close()
+        self._finish("failed")
+
+    def _close(self) -> None:
+        if self._stage is not None:
+            seconds = time.perf_counter() - self._start
+            STAGE_SECONDS.labels(self._stage).observe(seconds)
+            self.timings[self._stage] = self.timings.get(self._stage, 0.0) + seconds
+            self._stage = None
+
+    def _finish(self, status: str) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        JOBS_FINISHED.labels(self.source, status).inc()
+        JOBS_ACTIVE.labels(self.source).dec()
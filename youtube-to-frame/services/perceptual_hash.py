@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+
+# pHash: DCT of a 32x32 grayscale thumbnail, low 8x8 coefficients vs their median
+THUMB_SIZE = 32
+HASH_SIZE = 8
+
+
+def thumbnail(frame: np.ndarray) -> np.ndarray:
+    """Reduce a BGR frame to the grayscale thumbnail that phash() expects."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+    return small.astype(np.float32)
+
+
+def phash(thumbnails: np.ndarray) -> np.ndarray:
+    """Return 64-bit perceptual hashes of N thumbnails, shape (N, 32, 32).
+
+    The 2-D DCT of the whole batch is two matrix products, so hashing a few
+    hundred candidates costs about as much as decoding one frame.
+    """
+    thumbnails = np.asarray(thumbnails, dtype=np.float32).reshape(-1, THUMB_SIZE, THUMB_SIZE)
+    dct = _dct_matrix(THUMB_SIZE)
+    coeffs = dct @ thumbnails @ dct.T
+    low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(thumbnails), -1)
+    # The DC term only tracks overall brightness; leave it out of the median
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = np.packbits(low > median, axis=1)
+    return bits.view(">u8").ravel().astype(np.uint64)
+
+
+def hamming_matrix(hashes: np.ndarray) -> np.ndarray:
+    """Pairwise Hamming distances (0-64) between hashes, shape (N, N)."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    xor = hashes[:, None] ^ hashes[None, :]
+    return np.unpackbits(xor.view(np.uint8).reshape(*xor.shape, 8), axis=-1).sum(
+        axis=-1, dtype=np.int32
+    )
+
+
+def select_diverse(hashes: np.ndarray, n: int, min_distance: int) -> list[int]:
+    """Pick up to n indices whose hashes differ, in priority order.
+
+    Candidates are taken in order (index 0 first) and skipped while they are
+    within min_distance bits of one already picked. If that leaves fewer than
+    n, the rest are filled with whichever remaining candidate is farthest
+    from everything picked so far. Indices are returned in pick order.
+    """
+    count = len(hashes)
+    if count <= n:
+        return list(range(count))
+
+    distances = hamming_matrix(hashes)
+    nearest = np.full(count, HASH_SIZE * HASH_SIZE + 1, dtype=np.int32)
+    picked: list[int] = []
+    for i in range(count):
+        if nearest[i] >= min_distance:
+            picked.append(i)
+            np.minimum(nearest, distances[i], out=nearest)
+            if len(picked) == n:
+                return picked
+
+    nearest[picked] = -1
+    while len(picked) < n:
+        # argmax returns the first maximum, so ties keep priority order
+        i = int(np.argmax(nearest))
+        picked.append(i)
+        np.minimum(nearest, distances[i], out=nearest)
+        nearest[picked] = -1
+    return picked
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix, so that D @ X @ D.T is the 2-D DCT of X."""
+    k = np.arange(size)[:, None]
+    x = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
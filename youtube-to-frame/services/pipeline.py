@@ -0,0 +1,210 @@
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from config import get_settings
+from models.schemas import ExtractRequest
+from services.downloader import Downloader
+from services.frame_extractor import FrameExtractor
+from services.frame_upload import frame_bytes, upload_extracted_frames
+from services.image_encoder import FrameEncoder
+from services.job_stats import JobProfiler, finish_stats, probe_video
+from services.metadata_cache import get_metadata_cache
+from services.metrics import StageTimer
+from services.progress import NullProgress
+from services.scene_detector import SceneDetector
+from services.single_pass import SinglePassExtractor
+from services.storage_factory import get_storage
+from services.video_cache import get_video_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionFailed(Exception):
+    """An extraction job failed; stats cover the stages it went through."""
+
+    def __init__(self, error: Exception, stats: dict):
+        super().__init__(str(error))
+        self.stats = stats
+
+
+def or_default(value, default):
+    return default if value is None else value
+
+
+def frame_encoder(request: ExtractRequest) -> FrameEncoder:
+    """The encoder for a request's frames, server defaults filled in."""
+    settings = get_settings()
+    return FrameEncoder(
+        fmt=or_default(request.image_format, settings.frame_format),
+        quality=or_default(request.quality, settings.frame_quality),
+        variant_heights=or_default(request.variants, settings.frame_variants),
+    )
+
+
+def run_extraction(
+    job_id: str, request: ExtractRequest, source: str, progress=None
+) -> tuple[dict, dict]:
+    """Download → detect scenes → extract frames → upload → write the manifest.
+
+    Shared by API jobs and Cloud Tasks deliveries; source labels the stage
+    metrics ("api" or "worker"). progress (a JobProgress) receives stage
+    changes, download progress and each frame as soon as it is uploaded.
+
+    Returns (manifest, stats). The manifest is written once, with stats up
+    to the manifest stage; the returned stats add the manifest write.
+    Raises ExtractionFailed.
+    """
+    settings = get_settings()
+    progress = progress or NullProgress()
+    timer = StageTimer(source)
+    profiler = JobProfiler(request.profile)
+    stats: dict = {}
+    tmpdir = tempfile.mkdtemp(prefix="mv-frame-")
+    storage = get_storage(bucket_name=settings.gcs_bucket_name)
+
+    try:
+        progress.stage("downloading")
+        timer.stage("download")
+
+        # 1. Download video
+        downloader = Downloader(
+            max_duration=settings.video_max_duration,
+            metadata_cache=get_metadata_cache(),
+            video_cache=get_video_cache(),
+        )
+        video_info = downloader.download(
+            request.youtube_url,
+            output_dir=tmpdir,
+            profile=settings.download_profile,
+            progress=progress.advance,
+        )
+        stats.update(
+            probe_video(video_info.filepath), bytes_downloaded=video_info.downloaded_bytes
+        )
+
+        video_meta = {
+            "title": video_info.title,
+            "duration": video_info.duration,
+            "channel": video_info.channel,
+            "video_id": video_info.video_id,
+        }
+        progress.stage("detecting_scenes", video_info=video_meta)
+        timer.stage("detect")
+
+        # 2. Detect scenes
+        detector = SceneDetector(
+            threshold=request.scene_threshold,
+            downscale=or_default(request.downscale, settings.scene_downscale),
+            frame_skip=or_default(request.frame_skip, settings.scene_frame_skip),
+            workers=settings.scene_workers,
+            selection=or_default(request.scene_selection, settings.scene_selection),
+            diversity_pool=settings.scene_diversity_pool,
+            min_hash_distance=settings.scene_min_hash_distance,
+        )
+        encoder = frame_encoder(request)
+        sharpness_samples = or_default(
+            request.sharpness_samples, settings.frame_sharpness_samples
+        )
+        frames_dir = os.path.join(tmpdir, "frames")
+        os.makedirs(frames_dir, exist_ok=True)
+
+        # Scores from an earlier job on the same video re-cut scenes without decoding
+        series_name = detector.series_name(
+            video_info.video_id, "full" if video_info.full_stream is None else "detect"
+        )
+        scores = storage.read_scores(series_name) if video_info.video_id else None
+
+        # A low-res detection copy has no frames worth capturing
+        if settings.single_pass and video_info.full_stream is None and scores is None:
+            # 2+3. Capture frames while detecting, in one decode
+            timer.stage("single_pass")
+            single_pass = SinglePassExtractor(
+                detector,
+                buffer_size=settings.single_pass_buffer,
+                encoder=encoder,
+                sharpness_samples=sharpness_samples,
+                sharpness_span=settings.frame_sharpness_span,
+            )
+            scenes, extracted = single_pass.run(
+                video_info.filepath, request.max_frames, frames_dir
+            )
+            stats["frames_decoded"] = detector.frames_decoded
+            if video_info.video_id:
+                storage.write_scores(series_name, detector.scores)
+            if not scenes:
+                raise RuntimeError("No scenes detected in video")
+        else:
+            scenes = detector.detect_top_scenes(
+                video_info.filepath, max_scenes=request.max_frames, scores=scores
+            )
+            stats["frames_decoded"] = detector.frames_decoded
+            if scores is None and video_info.video_id:
+                storage.write_scores(series_name, detector.scores)
+
+            if not scenes:
+                raise RuntimeError("No scenes detected in video")
+
+            progress.stage("extracting_frames")
+            timer.stage("extract")
+
+            # 3. Extract frames
+            extractor = FrameExtractor(
+                strategy=settings.extract_strategy,
+                max_walk_seconds=settings.extract_max_walk_seconds,
+                encoder=encoder,
+                sharpness_samples=sharpness_samples,
+                sharpness_span=settings.frame_sharpness_span,
+            )
+            if video_info.full_stream:
+                # Detection ran on a low-res copy, fetch full-res frames remotely
+                extracted = extractor.extract_remote(
+                    video_info.full_stream, scenes, frames_dir,
+                    workers=settings.remote_fetch_workers,
+                )
+            else:
+                extracted = extractor.extract_at_timestamps(
+                    video_info.filepath, scenes, frames_dir
+                )
+            stats["frames_decoded"] += extractor.frames_decoded
+
+        progress.stage("uploading")
+        timer.stage("upload")
+
+        # 4. Upload to GCS, publishing each frame as soon as it is uploaded
+        frame_infos = upload_extracted_frames(
+            storage, job_id, extracted, encoder.format,
+            on_frame=lambda frame: progress.add_frame(frame, len(extracted)),
+        )
+        stats["bytes_uploaded"] = frame_bytes(extracted)
+
+        # 5. Write manifest, once: its stats cover the stages before it
+        timer.stage("manifest")
+        manifest = {
+            "job_id": job_id,
+            "video_info": video_meta,
+            "frames": frame_infos,
+            "total_frames": len(frame_infos),
+            "completed_at": datetime.now(timezone.utc).isoformat(),
+            "stats": finish_stats(stats, timer, profiler, storage, job_id),
+        }
+        storage.write_manifest(job_id, manifest)
+        timer.done()
+
+        # The profile is already stored, so this only adds the manifest stage
+        final_stats = finish_stats(dict(manifest["stats"]), timer, profiler, storage, job_id)
+        logger.info(
+            "Job %s completed in %.3fs (manifest written in %.3fs)",
+            job_id, final_stats["total_seconds"], final_stats["stages"]["manifest"],
+        )
+        return manifest, final_stats
+
+    except Exception as e:
+        timer.failed()
+        raise ExtractionFailed(e, finish_stats(stats, timer, profiler, storage, job_id)) from e
+
+    finally:
+        profiler.stop()
+        shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+# Share of overall progress (percent) covered by each stage
+STAGES = {
+    "queued": (0.0, 0.0),
+    "downloading": (0.0, 30.0),
+    "detecting_scenes": (30.0, 60.0),
+    "extracting_frames": (60.0, 85.0),
+    "uploading": (85.0, 100.0),
+    "completed": (100.0, 100.0),
+}
+
+
+class JobEvents:
+    """Wakes SSE streams in this process when a job they follow changes.
+
+    Workers run in threads, so notify() hands the wake-up to each
+    subscriber's event loop. Streams also re-read the job store on a short
+    interval, which covers jobs updated by another process.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_id: str) -> asyncio.Event:
+        """Return an event set on every change of job_id. Call from the event loop."""
+        event = asyncio.Event()
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add((asyncio.get_running_loop(), event))
+        return event
+
+    def unsubscribe(self, job_id: str, event: asyncio.Event) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, set())
+            subscribers = {s for s in subscribers if s[1] is not event}
+            if subscribers:
+                self._subscribers[job_id] = subscribers
+            else:
+                self._subscribers.pop(job_id, None)
+
+    def notify(self, job_id: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+
+class JobProgress:
+    """Record a job's stage, percent progress and finished frames.
+
+    Updates go to the job store (the source of truth for every process) and
+    then wake local listeners. Percent updates inside a stage are only
+    written when they move by at least min_step points.
+    """
+
+    def __init__(self, store, job_id: str, events: JobEvents, min_step: float = 1.0):
+        self.store = store
+        self.job_id = job_id
+        self.events = events
+        self.min_step = min_step
+        self.frames: list[dict] = []
+        self._stage = "queued"
+        self._progress = 0.0
+        self._lock = threading.Lock()
+
+    def stage(self, status: str, **fields) -> None:
+        """Enter a stage or final state; extra fields are stored along with it."""
+        with self._lock:
+            self._stage = status
+            self._progress = max(self._progress, STAGES.get(status, (self._progress,))[0])
+            self.store.update(self.job_id, status=status, progress=self._progress, **fields)
+        self.events.notify(self.job_id)
+
+    def advance(self, fraction: float) -> None:
+        """Report progress inside the current stage, fraction in [0, 1]."""
+        start, end = STAGES.get(self._stage, (self._progress, self._progress))
+        progress = round(start + (end - start) * min(max(fraction, 0.0), 1.0), 1)
+        with self._lock:
+            if progress - self._progress < self.min_step:
+                return
+            self._progress = progress
+            self.store.update(self.job_id, progress=progress)
+        self.events.notify(self.job_id)
+
+    def add_frame(self, frame: dict, total: int) -> None:
+        """Publish a frame that finished uploading, out of total frames."""
+        start, end = STAGES["uploading"]
+        with self._lock:
+            self.frames.append(frame)
+            self.frames.sort(key=lambda f: f["index"])
+            progress = round(start + (end - start) * len(self.frames) / total, 1)
+            self._progress = max(self._progress, progress)
+            self.store.update(
+                self.job_id,
+                frames=list(self.frames),
+                total_frames=len(self.frames),
+                progress=self._progress,
+            )
+        self.events.notify(self.job_id)
+
+
+class NullProgress:
+    """JobProgress for jobs nobody follows, e.g. Cloud Tasks deliveries."""
+
+    def stage(self, status: str, **fields) -> None:
+        pass
+
+    def advance(self, fraction: float) -> None:
+        pass
+
+    def add_frame(self, frame: dict, total: int) -> None:
+        pass
+
+
+_events = JobEvents()
+
+
+def get_job_events() -> JobEvents:
+    """Return the process-wide job event hub."""
+    return _events
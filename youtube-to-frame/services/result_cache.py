@@ -0,0 +1,104 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+_JOB_NAMESPACE = uuid.UUID("6f1c1e9a-3b1e-4c55-9a57-2f0d7f0c6a11")
+
+
+class ResultCache:
+    """Maps (video_id, extraction params) to a job whose manifest can be reused.
+
+    Job ids are derived deterministically from the cache key, so the storage
+    manifest itself is the persistent cache entry and survives restarts. An
+    in-process LRU avoids hitting storage for hot keys.
+    """
+
+    def __init__(self, storage, ttl_seconds: int = 86400, max_entries: int = 1024):
+        self.storage = storage
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(video_id: str, params: dict) -> str:
+        """Build a stable cache key from a video id and extraction params."""
+        payload = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode()).hexdigest()[:16]
+        return f"{video_id}:{digest}"
+
+    @staticmethod
+    def job_id_for(key: str) -> str:
+        """Return the deterministic job id for a cache key."""
+        return str(uuid.uuid5(_JOB_NAMESPACE, key))
+
+    def get(self, job_id: str) -> dict | None:
+        """Return a fresh completed manifest for job_id, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is not None:
+                manifest, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(job_id)
+                    return manifest
+                del self._entries[job_id]
+
+        manifest = self.storage.read_manifest(job_id)
+        if not self._is_reusable(manifest):
+            return None
+
+        completed_at = datetime.fromisoformat(manifest["completed_at"])
+        expires_at = completed_at.timestamp() + self.ttl_seconds
+        if expires_at <= now:
+            return None
+
+        self._put(job_id, manifest, expires_at)
+        return manifest
+
+    def put(self, job_id: str, manifest: dict) -> None:
+        """Remember a freshly written manifest."""
+        if self._is_reusable(manifest):
+            self._put(job_id, manifest, time.time() + self.ttl_seconds)
+
+    def invalidate(self, job_id: str) -> None:
+        with self._lock:
+            self._entries.pop(job_id, None)
+
+    def _put(self, job_id: str, manifest: dict, expires_at: float) -> None:
+        with self._lock:
+            self._entries[job_id] = (manifest, expires_at)
+            self._entries.move_to_end(job_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _is_reusable(manifest: dict | None) -> bool:
+        if not manifest or manifest.get("status") == "failed":
+            return False
+        return bool(manifest.get("frames")) and "completed_at" in manifest
+
+
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide result cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from config import get_settings
+            from services.storage_factory import get_storage
+
+            settings = get_settings()
+            _cache = ResultCache(
+                get_storage(bucket_name=settings.gcs_bucket_name),
+                ttl_seconds=settings.result_cache_ttl,
+                max_entries=settings.result_cache_max_entries,
+            )
+        return _cache
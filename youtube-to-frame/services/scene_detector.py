@@ -1,8 +1,56 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 
-from scenedetect import open_video, SceneManager
+import cv2
+import numpy as np
+from scenedetect import FrameTimecode, open_video, SceneManager
 from scenedetect.detectors import ContentDetector
 
+from services.perceptual_hash import THUMB_SIZE, phash, select_diverse, thumbnail
+
+logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the process-wide pool for segment detection, with at least workers processes.
+
+    Jobs share it rather than starting processes each time. Workers come
+    from a fork server: forking the multi-threaded server directly could
+    copy a lock held by another thread (uploads, GCS client, sqlite) and
+    deadlock the child.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or workers > _pool_size:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn"
+            )
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_size = workers
+        return _pool
+
+
+def _drop_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a broken pool, so the next job starts a new one."""
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_size = None, 0
+    pool.shutdown(wait=False)
+
 
 @dataclass
 class Scene:
@@ -14,25 +62,253 @@ class Scene:
 
 
 class SceneDetector:
-    def __init__(self, threshold: float = 30.0, min_scene_len: int = 15):
+    def __init__(
+        self,
+        threshold: float = 30.0,
+        min_scene_len: int = 15,
+        downscale: int = 0,
+        frame_skip: int = 0,
+        workers: int = 1,
+        min_segment_seconds: float = 30.0,
+        selection: str = "duration",
+        diversity_pool: int = 3,
+        min_hash_distance: int = 10,
+    ):
+        if selection not in ("duration", "diverse"):
+            raise ValueError(f"Unknown scene selection: {selection}")
         self.threshold = threshold
         self.min_scene_len = min_scene_len  # minimum frames per scene
+        self.downscale = downscale  # 0 = PySceneDetect auto (~256px wide)
+        self.frame_skip = frame_skip  # frames skipped between analysed frames
+        self.workers = workers or os.cpu_count() or 1  # 0 = all cores
+        self.min_segment_seconds = min_segment_seconds
+        # "diverse": rank like "duration", but skip near-duplicate frames
+        # among the diversity_pool * N longest scenes
+        self.selection = selection
+        self.diversity_pool = max(1, diversity_pool)
+        self.min_hash_distance = min_hash_distance  # bits out of 64
+        # Content score of every frame from the last detection (NaN for
+        # frames skipped with frame_skip), see detect_from_scores()
+        self.scores: np.ndarray | None = None
+        # Frames the last detection read from the video, refinement included
+        self.frames_decoded = 0
 
     def detect(self, video_path: str) -> list[Scene]:
         """Detect scene changes in a video file."""
-        video = open_video(video_path)
+        if self.workers > 1:
+            return self._detect_parallel(video_path)
+        return self.detect_stream(open_video(video_path))
+
+    def series_name(self, video_id: str, source: str) -> str:
+        """Storage name of the score series for a video.
+
+        Scores depend on the decoded frames, so the name covers the download
+        (source: "full" or "detect"), downscale and frame_skip, but not
+        threshold or min_scene_len.
+        """
+        return f"scores/{video_id}/{source}-d{self.downscale}-s{self.frame_skip}.npy"
+
+    def detect_from_scores(self, video_path: str, scores: np.ndarray) -> list[Scene]:
+        """Detect scenes from a stored score series instead of decoding.
+
+        scores is self.scores of an earlier detection of the same video with
+        the same downscale and frame_skip. The scores are replayed through
+        ContentDetector's own cut filter with this detector's threshold and
+        min_scene_len, so the cuts match a full detection. The video is only
+        opened for its frame rate (and, with frame_skip, to refine cuts).
+        """
+        # Same frame rate (and rounding) as SceneManager's timecodes
+        frame_rate = open_video(video_path).frame_rate
+        cuts = _replay_cuts(scores, frame_rate, self.threshold, self.min_scene_len)
+        self.scores = scores
+        self.frames_decoded = 0
+        if not cuts:
+            return []  # as SceneManager.get_scene_list() without start_in_scene
+
+        edges = [0] + cuts + [len(scores)]
+        seconds = [FrameTimecode(edge, frame_rate).get_seconds() for edge in edges]
+        bounds = list(zip(seconds[:-1], seconds[1:]))
+        if self.frame_skip > 0 and len(bounds) > 1:
+            bounds = self._refine_bounds(video_path, bounds, float(frame_rate))
+        return self._to_scenes(bounds)
+
+    def detect_stream(self, video, callback=None) -> list[Scene]:
+        """Detect scene changes in an opened VideoStream.
+
+        callback, if given, is passed through to SceneManager and called with
+        (frame_img, position) at each detected cut.
+        """
+        scene_manager, recorder = self._scene_manager()
+        scene_manager.detect_scenes(
+            video,
+            frame_skip=self.frame_skip,
+            show_progress=False,
+            callback=callback,
+        )
+        scene_list = scene_manager.get_scene_list()
+        self.scores = recorder.series(video.frame_number)
+        self.frames_decoded = video.frame_number
+
+        bounds = [(start.get_seconds(), end.get_seconds()) for start, end in scene_list]
+        if self.frame_skip > 0 and len(bounds) > 1:
+            bounds = self._refine_bounds(video.path, bounds, float(video.frame_rate))
+
+        return self._to_scenes(bounds)
+
+    def _scene_manager(self) -> tuple[SceneManager, "_ScoreRecorder"]:
         scene_manager = SceneManager()
-        scene_manager.add_detector(
-            ContentDetector(threshold=self.threshold, min_scene_len=self.min_scene_len)
+        if self.downscale > 0:
+            scene_manager.auto_downscale = False
+            scene_manager.downscale = self.downscale
+        recorder = _ScoreRecorder(threshold=self.threshold, min_scene_len=self.min_scene_len)
+        scene_manager.add_detector(recorder)
+        return scene_manager, recorder
+
+    def _detect_parallel(self, video_path: str) -> list[Scene]:
+        """Detect scenes by splitting the video into segments across processes.
+
+        Each segment is decoded from a warm-up point before its start, so the
+        detector's min_scene_len/flash-filter state has settled by the time it
+        reaches frames it owns, and runs one warm-up length past its end so
+        delayed cuts are still reported. Each segment keeps only cuts inside
+        its own range. The overlap where two segments both see the same frames
+        is compared; if they disagree, the earlier segment (which has the real
+        history) wins over that stretch.
+        """
+        cap = cv2.VideoCapture(video_path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+
+        step = self.frame_skip + 1
+        segments = min(self.workers, int(total / fps / self.min_segment_seconds)) if fps else 0
+        if segments < 2:
+            return self.detect_stream(open_video(video_path))
+
+        # Keep analysed frames on the same grid as a serial run with frame_skip
+        seg_len = math.ceil(total / segments / step) * step
+        warmup = math.ceil(max(2 * self.min_scene_len, fps) / step) * step
+        starts = [i * seg_len for i in range(segments)]
+        firsts = [max(0, start - warmup) for start in starts]
+
+        pool = _process_pool(self.workers)
+        try:
+            results = list(
+                pool.map(
+                    _detect_segment,
+                    [self] * segments,
+                    [video_path] * segments,
+                    firsts,
+                    [start + seg_len + warmup for start in starts],
+                )
+            )
+        except BrokenProcessPool:
+            _drop_process_pool(pool)
+            raise
+        self.frames_decoded = sum(
+            seg_end - first for first, (_, seg_end, _) in zip(firsts, results)
         )
 
-        scene_manager.detect_scenes(video, show_progress=False)
-        scene_list = scene_manager.get_scene_list()
+        cuts: list[int] = []
+        end_frame = max(seg_end for _, seg_end, _ in results)
+        self.scores = np.full(end_frame, np.nan, dtype=np.float32)
+        owned_from = 0
+        for i, (seg_cuts, seg_end, seg_scores) in enumerate(results):
+            start = starts[i]
+            stop = start + seg_len
+            # Scores do not depend on detector state, only the first
+            # (warm-up) frame of a segment lacks its predecessor
+            for frame_num, score in seg_scores:
+                if start <= frame_num < stop:
+                    self.scores[frame_num] = score
+
+            if i + 1 < len(results):
+                # Overlap after the seam, as seen by this segment and the next
+                seam_left = [c for c in seg_cuts if stop <= c < stop + warmup]
+                seam_right = [c for c in results[i + 1][0] if stop <= c < stop + warmup]
+                if seam_left != seam_right:
+                    logger.warning(
+                        "Segment seam at frame %d disagrees (%s vs %s); using earlier segment",
+                        stop, seam_left, seam_right,
+                    )
+                    stop += warmup
+
+            cuts += [c for c in seg_cuts if max(start, owned_from) <= c < stop]
+            owned_from = stop
+
+        if not cuts:
+            return []
+
+        edges = [0] + cuts + [end_frame]
+        bounds = [(a / fps, b / fps) for a, b in zip(edges[:-1], edges[1:])]
+        if self.frame_skip > 0:
+            bounds = self._refine_bounds(video_path, bounds, fps)
+        return self._to_scenes(bounds)
 
+    def _refine_bounds(
+        self, video_path: str, bounds: list[tuple[float, float]], fps: float
+    ) -> list[tuple[float, float]]:
+        """Move each cut found with frame_skip back to the exact frame.
+
+        A cut reported at analysed frame p happened somewhere after the
+        previous analysed frame p - (frame_skip + 1). Only that window is
+        decoded again, and the cut is placed at the largest frame-to-frame
+        content change inside it.
+        """
+        window = self.frame_skip + 1
+        cuts = [round(start * fps) for start, _ in bounds[1:]]
+        refined: list[int] = []
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return bounds
+
+        # Walking forward is cheaper than a seek (which decodes from the
+        # previous keyframe) while the next window is less than ~1s ahead
+        max_walk = max(window, int(fps))
+        pos = None
+
+        try:
+            for cut in cuts:
+                first = max(0, cut - window)
+                if pos is None or first < pos or first - pos > max_walk:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+                    pos = first
+                while pos < first and cap.grab():
+                    pos += 1
+                    self.frames_decoded += 1
+
+                prev = None
+                best, best_delta = cut, -1.0
+                for frame_num in range(first, cut + 1):
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    pos += 1
+                    self.frames_decoded += 1
+                    hsv = self._small_hsv(frame)
+                    if prev is not None:
+                        delta = float(np.mean(cv2.absdiff(hsv, prev)))
+                        if delta > best_delta:
+                            best, best_delta = frame_num, delta
+                    prev = hsv
+                refined.append(best)
+        finally:
+            cap.release()
+
+        edges = [bounds[0][0]] + [c / fps for c in refined] + [bounds[-1][1]]
+        return list(zip(edges[:-1], edges[1:]))
+
+    def _small_hsv(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        factor = self.downscale or max(1, w // 256)
+        small = cv2.resize(frame, (max(1, w // factor), max(1, h // factor)))
+        return cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+
+    @staticmethod
+    def _to_scenes(bounds: list[tuple[float, float]]) -> list[Scene]:
         scenes = []
-        for i, (start, end) in enumerate(scene_list):
-            start_sec = start.get_seconds()
-            end_sec = end.get_seconds()
+        for i, (start_sec, end_sec) in enumerate(bounds):
             scenes.append(
                 Scene(
                     index=i,
@@ -45,22 +321,164 @@ class SceneDetector:
 
         return scenes
 
-    def detect_top_scenes(self, video_path: str, max_scenes: int = 20) -> list[Scene]:
-        """Detect scenes and return the top N by duration (longer = more significant)."""
-        scenes = self.detect(video_path)
+    def detect_top_scenes(
+        self, video_path: str, max_scenes: int = 20, scores: np.ndarray | None = None
+    ) -> list[Scene]:
+        """Detect scenes and return the top N by duration (longer = more significant).
 
+        With selection="diverse", scenes whose frames look nearly the same as a
+        longer scene's are passed over in favour of different-looking ones.
+        With a stored score series, detection does not decode the video.
+        """
+        if scores is not None:
+            scenes = self.detect_from_scores(video_path, scores)
+        else:
+            scenes = self.detect(video_path)
+        if self.selection == "diverse" and len(scenes) > max_scenes:
+            candidates = self.diversity_candidates(scenes, max_scenes)
+            thumbnails = self.sample_thumbnails(video_path, [s.mid_time for s in candidates])
+            self.frames_decoded += len(candidates)
+            return self.select_diverse_scenes(candidates, thumbnails, max_scenes)
+        return self.select_top_scenes(scenes, max_scenes)
+
+    def diversity_candidates(self, scenes: list[Scene], max_scenes: int) -> list[Scene]:
+        """The longest diversity_pool * max_scenes scenes, longest first."""
+        by_duration = sorted(scenes, key=lambda s: s.duration, reverse=True)
+        return by_duration[: max_scenes * self.diversity_pool]
+
+    def select_diverse_scenes(
+        self, candidates: list[Scene], thumbnails: np.ndarray, max_scenes: int
+    ) -> list[Scene]:
+        """Pick max_scenes of the candidates (longest first) with distinct frames.
+
+        thumbnails holds one perceptual_hash.thumbnail() per candidate.
+        """
+        picked = select_diverse(phash(thumbnails), max_scenes, self.min_hash_distance)
+        return self._reindex([candidates[i] for i in picked])
+
+    @staticmethod
+    def sample_thumbnails(video_path: str, times: list[float]) -> np.ndarray:
+        """Thumbnails for hashing of the frames at the given times, in the given order."""
+        thumbnails = np.zeros((len(times), THUMB_SIZE, THUMB_SIZE), dtype=np.float32)
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        pos = None
+        try:
+            for i in sorted(range(len(times)), key=lambda i: times[i]):
+                target = int(times[i] * fps)
+                # Walk up to ~1s forward instead of seeking back to a keyframe
+                if pos is None or target < pos or target - pos > fps:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                    pos = target
+                while pos < target and cap.grab():
+                    pos += 1
+                ret, frame = cap.read()
+                if not ret:
+                    continue
+                pos += 1
+                thumbnails[i] = thumbnail(frame)
+        finally:
+            cap.release()
+        return thumbnails
+
+    @staticmethod
+    def select_top_scenes(scenes: list[Scene], max_scenes: int) -> list[Scene]:
+        """Return the top N scenes by duration, in time order and re-indexed."""
         if len(scenes) <= max_scenes:
             return scenes
 
         # Sort by duration (longer scenes are typically more significant backgrounds)
         sorted_scenes = sorted(scenes, key=lambda s: s.duration, reverse=True)
-        top_scenes = sorted_scenes[:max_scenes]
+        return SceneDetector._reindex(sorted_scenes[:max_scenes])
 
-        # Re-sort by time order
-        top_scenes.sort(key=lambda s: s.start_time)
-
-        # Re-index
-        for i, scene in enumerate(top_scenes):
+    @staticmethod
+    def _reindex(scenes: list[Scene]) -> list[Scene]:
+        """Sort scenes by time and number them from 0."""
+        scenes.sort(key=lambda s: s.start_time)
+        for i, scene in enumerate(scenes):
             scene.index = i
+        return scenes
+
+
+def _detect_segment(
+    detector: SceneDetector, video_path: str, first: int, end: int
+) -> tuple[list[int], int, list[tuple[int, float]]]:
+    """Detect cuts in frames [first, end). Runs in a worker process.
+
+    Returns the cut frame numbers, the frame number where decoding stopped
+    and the (frame number, score) of every analysed frame.
+    """
+    video = open_video(video_path)
+    if first > 0:
+        video.seek(first)
+
+    scene_manager, recorder = detector._scene_manager()
+    scene_manager.detect_scenes(
+        video, end_time=end, frame_skip=detector.frame_skip, show_progress=False
+    )
+    scene_list = scene_manager.get_scene_list(start_in_scene=True)
+    cuts = [start.frame_num for start, _ in scene_list[1:]]
+    return cuts, video.frame_number, recorder.scores
+
+
+class _ScoreRecorder(ContentDetector):
+    """ContentDetector that keeps the score of every frame it analyses."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scores: list[tuple[int, float]] = []
+
+    def _calculate_frame_score(self, timecode, frame_img) -> float:
+        score = super()._calculate_frame_score(timecode, frame_img)
+        self.scores.append((int(getattr(timecode, "frame_num", timecode)), score))
+        return score
+
+    def series(self, length: int) -> np.ndarray:
+        """The scores as a float32 array over frames [0, length), NaN where skipped."""
+        series = np.full(length, np.nan, dtype=np.float32)
+        for frame_num, score in self.scores:
+            if frame_num < length:
+                series[frame_num] = score
+        return series
+
+
+class _ReplayDetector(ContentDetector):
+    """ContentDetector that takes frame scores from a stored series."""
+
+    def __init__(self, scores: np.ndarray, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._scores = scores
+
+    def _calculate_frame_score(self, timecode, frame_img) -> float:
+        return float(self._scores[timecode.frame_num])
+
+
+def _replay_cuts(
+    scores: np.ndarray, frame_rate, threshold: float, min_scene_len: int
+) -> list[int]:
+    """Cut frame numbers ContentDetector reports for a stored score series.
+
+    The flash filter only acts on frames above the threshold and on the
+    first analysed frame min_scene_len past one of them; any other frame
+    leaves it as it was. Only those frames (and the first) are fed to it,
+    which keeps this to milliseconds.
+    """
+    analysed = np.flatnonzero(~np.isnan(scores))
+    if len(analysed) == 0:
+        return []
+    above = scores[analysed] >= threshold
+    relevant = above.copy()
+    after = np.searchsorted(analysed, analysed[above] + min_scene_len)
+    relevant[after[after < len(analysed)]] = True
+    relevant[0] = True
 
-        return top_scenes
+    detector = _ReplayDetector(scores, threshold=threshold, min_scene_len=min_scene_len)
+    base = FrameTimecode(0, frame_rate)
+    cuts = []
+    for frame_num in analysed[relevant]:
+        cuts += detector.process_frame(base + int(frame_num), None)
+    cuts += detector.post_process(base + int(analysed[-1]))
+    return sorted({int(c.frame_num) for c in cuts})
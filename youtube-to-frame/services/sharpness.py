@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+# Frames are scored on a grayscale copy this wide; blur shows up at any size
+SCORE_WIDTH = 320
+
+
+def score_image(frame: np.ndarray) -> np.ndarray:
+    """Reduce a BGR frame to the grayscale image that laplacian_variance() scores."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    h, w = gray.shape[:2]
+    if w > SCORE_WIDTH:
+        gray = cv2.resize(
+            gray, (SCORE_WIDTH, max(1, round(h * SCORE_WIDTH / w))), interpolation=cv2.INTER_AREA
+        )
+    return gray.astype(np.float32)
+
+
+def laplacian_variance(images: np.ndarray) -> np.ndarray:
+    """Variance of the 4-neighbour Laplacian of N same-sized images, shape (N,).
+
+    Higher is sharper: motion blur flattens edges and with them the Laplacian.
+    """
+    x = np.asarray(images, dtype=np.float32)
+    lap = (
+        x[:, :-2, 1:-1] + x[:, 2:, 1:-1] + x[:, 1:-1, :-2] + x[:, 1:-1, 2:]
+        - 4 * x[:, 1:-1, 1:-1]
+    )
+    return lap.reshape(len(x), -1).var(axis=1)
+
+
+def sharpest(frames: list[np.ndarray]) -> tuple[int, float]:
+    """Return (index, score) of the sharpest of frames."""
+    scores = laplacian_variance(np.stack([score_image(frame) for frame in frames]))
+    best = int(np.argmax(scores))
+    return best, float(scores[best])
+
+
+def sample_frames(start: float, end: float, fps: float, samples: int, span: float) -> list[int]:
+    """Frame numbers to score for a scene from start to end (seconds).
+
+    samples frames are spread evenly over the middle span fraction of the
+    scene, so transitions at either end are never picked. A single sample is
+    the midpoint frame, as used without sharpness selection.
+    """
+    mid = (start + end) / 2
+    if samples <= 1:
+        return [int(mid * fps)]
+    half = (end - start) * span / 2
+    first, last = int((mid - half) * fps), int((mid + half) * fps)
+    last = max(first, min(last, int(end * fps) - 1))
+    return sorted({int(n) for n in np.linspace(first, last, samples).round()})
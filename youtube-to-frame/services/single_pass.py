@@ -0,0 +1,222 @@
+import heapq
+import threading
+
+import numpy as np
+from scenedetect import open_video
+
+from services.frame_extractor import ExtractedFrame, FrameExtractor
+from services.image_encoder import FrameEncoder
+from services.perceptual_hash import thumbnail
+from services.scene_detector import Scene, SceneDetector
+from services.sharpness import sample_frames, sharpest
+
+
+def _frame_num(position) -> int:
+    """Frame number of a scenedetect position (FrameTimecode or plain int)."""
+    return int(getattr(position, "frame_num", position))
+
+
+class _SceneBuffer:
+    """Bounded sample of full-resolution frames from the currently open scene.
+
+    Frames are kept at a fixed stride; when the buffer fills up every other
+    frame is dropped and the stride doubles. The frame closest to any point of
+    the scene is therefore at most one stride away, i.e. within
+    scene_length / capacity frames.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(2, capacity)
+        self.stride = 1
+        self.frames: list[tuple[int, np.ndarray]] = []
+        self._seen = 0
+
+    def add(self, frame_num: int, frame: np.ndarray) -> None:
+        if self._seen % self.stride == 0:
+            self.frames.append((frame_num, frame))
+            if len(self.frames) > self.capacity:
+                self.frames = self.frames[::2]
+                self.stride *= 2
+        self._seen += 1
+
+    def split(self, cut: int) -> "_SceneBuffer":
+        """Move frames at or after cut into a new buffer for the next scene."""
+        nxt = _SceneBuffer(self.capacity)
+        for frame_num, frame in self.frames:
+            if frame_num >= cut:
+                nxt.add(frame_num, frame)
+        self.frames = [(n, f) for n, f in self.frames if n < cut]
+        return nxt
+
+    def closest(self, target: int) -> tuple[int, np.ndarray] | None:
+        if not self.frames:
+            return None
+        return min(self.frames, key=lambda item: abs(item[0] - target))
+
+
+class _TappedVideo:
+    """VideoStream proxy that hands every decoded frame to a callback."""
+
+    def __init__(self, video, on_frame):
+        self._video = video
+        self._on_frame = on_frame
+
+    def read(self, *args, **kwargs):
+        frame = self._video.read(*args, **kwargs)
+        if isinstance(frame, np.ndarray):
+            self._on_frame(_frame_num(self._video.position), frame)
+        return frame
+
+    def __getattr__(self, name):
+        return getattr(self._video, name)
+
+
+class SinglePassExtractor:
+    """Detect scenes and capture their frames in a single decode of the video.
+
+    While PySceneDetect streams over the video, a bounded sample of the open
+    scene is kept. When a cut closes the scene, the frame nearest its midpoint
+    is offered to a heap holding only the max_scenes longest scenes so far, so
+    memory stays at roughly (buffer_size + max_scenes) full-resolution frames.
+
+    With the detector's "diverse" selection, a small hash thumbnail of every
+    scene is kept as well. Picked scenes that lost their frame to a longer
+    scene in the heap are extracted afterwards, like cuts found only in
+    post-processing.
+
+    With sharpness_samples > 1, the buffered frames nearest to that many
+    points around the midpoint are scored and the sharpest one is kept.
+    """
+
+    def __init__(
+        self,
+        detector: SceneDetector,
+        buffer_size: int = 16,
+        encoder: FrameEncoder | None = None,
+        sharpness_samples: int = 1,
+        sharpness_span: float = 0.5,
+    ):
+        self.detector = detector
+        self.buffer_size = buffer_size
+        self.encoder = encoder or FrameEncoder()
+        self.sharpness_samples = max(1, sharpness_samples)
+        self.sharpness_span = sharpness_span
+
+    def run(
+        self, video_path: str, max_scenes: int, output_dir: str
+    ) -> tuple[list[Scene], list[ExtractedFrame]]:
+        """Return the top scenes and their extracted frames."""
+        video = open_video(video_path)
+        fps = float(video.frame_rate)
+
+        lock = threading.Lock()
+        state = {"buffer": _SceneBuffer(self.buffer_size), "start": 0}
+        kept: list[tuple[int, int, int, np.ndarray, float | None]] = []
+        diverse = self.detector.selection == "diverse"
+        thumbnails: dict[int, np.ndarray] = {}  # scene start frame -> thumbnail
+
+        def close_scene(end: int) -> None:
+            start = state["start"]
+            targets = sample_frames(
+                start / fps, end / fps, fps, self.sharpness_samples, self.sharpness_span
+            )
+            candidates = {}
+            for target in targets:
+                nearest = state["buffer"].closest(target)
+                if nearest is not None:
+                    candidates[nearest[0]] = nearest[1]
+            if not candidates:
+                return
+            score = None
+            frame_num, frame = next(iter(candidates.items()))
+            if self.sharpness_samples > 1:
+                best, score = sharpest(list(candidates.values()))
+                frame_num, frame = list(candidates.items())[best]
+            if diverse:
+                thumbnails[start] = thumbnail(frame)
+            item = (end - start, -start, frame_num, frame, score)
+            if len(kept) < max_scenes:
+                heapq.heappush(kept, item)
+            elif item[:2] > kept[0][:2]:
+                heapq.heapreplace(kept, item)
+
+        def on_frame(frame_num: int, frame: np.ndarray) -> None:
+            with lock:
+                state["buffer"].add(frame_num, frame)
+
+        def on_cut(_frame_img, position) -> None:
+            cut = _frame_num(position)
+            with lock:
+                nxt = state["buffer"].split(cut)
+                close_scene(cut)
+                state["buffer"] = nxt
+                state["start"] = cut
+
+        all_scenes = self.detector.detect_stream(
+            _TappedVideo(video, on_frame), callback=on_cut
+        )
+        if all_scenes:
+            close_scene(round(all_scenes[-1].end_time * fps))
+
+        # With frame_skip, refined scene starts may sit a few frames before
+        # the cut position reported during detection
+        slack = self.detector.frame_skip + 1 if self.detector.frame_skip else 0
+
+        def lookup(by_start: dict, scene: Scene):
+            start = round(scene.start_time * fps)
+            return next(
+                (by_start[s] for s in range(start, start + slack + 1) if s in by_start),
+                None,
+            )
+
+        if diverse and len(all_scenes) > max_scenes:
+            candidates = self.detector.diversity_candidates(all_scenes, max_scenes)
+            thumbs = [lookup(thumbnails, scene) for scene in candidates]
+            unseen = [i for i, thumb in enumerate(thumbs) if thumb is None]
+            if unseen:
+                sampled = SceneDetector.sample_thumbnails(
+                    video_path, [candidates[i].mid_time for i in unseen]
+                )
+                for i, thumb in zip(unseen, sampled):
+                    thumbs[i] = thumb
+            scenes = self.detector.select_diverse_scenes(candidates, np.stack(thumbs), max_scenes)
+        else:
+            scenes = SceneDetector.select_top_scenes(all_scenes, max_scenes)
+        captured = {-item[1]: item[2:] for item in kept}
+
+        frames: list[ExtractedFrame] = []
+        missing: list[Scene] = []
+        for scene in scenes:
+            hit = lookup(captured, scene)
+            if hit is None:
+                missing.append(scene)
+                continue
+
+            frame_num, frame, score = hit
+            filepath, variants = self.encoder.write(frame, output_dir, scene.index)
+
+            h, w = frame.shape[:2]
+            frames.append(
+                ExtractedFrame(
+                    index=scene.index,
+                    timestamp=frame_num / fps,
+                    filepath=filepath,
+                    width=w,
+                    height=h,
+                    variants=variants,
+                    sharpness=score,
+                )
+            )
+
+        # Cuts reported only at post-processing (and, with diverse selection,
+        # scenes outside the longest max_scenes) have no captured frame
+        if missing:
+            extractor = FrameExtractor(
+                encoder=self.encoder,
+                sharpness_samples=self.sharpness_samples,
+                sharpness_span=self.sharpness_span,
+            )
+            frames += extractor.extract_at_timestamps(video_path, missing, output_dir)
+            frames.sort(key=lambda f: f.index)
+
+        return scenes, frames
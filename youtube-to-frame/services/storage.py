@@ -1,30 +1,115 @@
+import io
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import timedelta
 
+import numpy as np
+import requests
+from google.api_core import exceptions as api_exceptions
 from google.cloud import storage
 
+from services.batch_upload import UploadResult, upload_concurrently
+from services.image_encoder import content_type_for
+
+# Transient failures worth retrying; anything else (403, 404, ...) fails fast
+RETRYABLE_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.GatewayTimeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+_client: storage.Client | None = None
+_client_pool_size = 0
+_client_lock = threading.Lock()
+
+
+def shared_client(pool_size: int = 10) -> storage.Client:
+    """Return the process-wide GCS client, with at least pool_size connections.
+
+    Building a client resolves credentials and starts a new connection pool,
+    so every GCSStorage shares one instead.
+    """
+    global _client, _client_pool_size
+    with _client_lock:
+        if _client is None:
+            _client = storage.Client()
+        if pool_size > _client_pool_size:
+            # Size the HTTP connection pool to the upload concurrency, otherwise
+            # urllib3 drops connections above its default of 10 per host.
+            # http:// covers STORAGE_EMULATOR_HOST (e.g. fake-gcs-server).
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=max(10, pool_size)
+            )
+            _client._http.mount("https://", adapter)
+            _client._http.mount("http://", adapter)
+            _client_pool_size = pool_size
+        return _client
+
 
 class GCSStorage:
-    def __init__(self, bucket_name: str):
-        self.client = storage.Client()
+    """Frames, manifests and score series in a GCS bucket.
+
+    Manifests read or written here are kept in an LRU (manifest_cache_size
+    entries) with their object generation. Within manifest_fresh_seconds of
+    the last check a cached manifest is returned without a request; after
+    that one GET conditional on the generation either confirms it (304) or
+    returns the new version.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        upload_workers: int = 8,
+        upload_retries: int = 3,
+        manifest_cache_size: int = 512,
+        manifest_fresh_seconds: float = 5.0,
+    ):
+        self.client = shared_client(upload_workers)
         self.bucket = self.client.bucket(bucket_name)
+        self.upload_workers = upload_workers
+        self.upload_retries = upload_retries
+        self.manifest_cache_size = manifest_cache_size
+        self.manifest_fresh_seconds = manifest_fresh_seconds
+        # job_id -> (generation, manifest, last checked), least recent first
+        self._manifests: OrderedDict[str, tuple[int, dict, float]] = OrderedDict()
+        self._manifests_lock = threading.Lock()
 
-    def upload_frame(self, local_path: str, job_id: str, index: int) -> str:
+    def upload_frame(
+        self, local_path: str, job_id: str, index: int, variant: str | None = None
+    ) -> str:
         """Upload a frame image to GCS and return the blob name."""
-        blob_name = f"{job_id}/scene_{index:03d}.png"
+        blob_name = _frame_blob_name(local_path, job_id, index, variant)
         blob = self.bucket.blob(blob_name)
-        blob.upload_from_filename(local_path, content_type="image/png")
+        # upload_frames() retries with its own backoff and attempt count
+        blob.upload_from_filename(
+            local_path, content_type=content_type_for(local_path), retry=None
+        )
         return blob_name
 
     def upload_frames(
-        self, frame_paths: list[tuple[str, int]], job_id: str
-    ) -> list[str]:
-        """Upload multiple frames. frame_paths is list of (local_path, index)."""
-        blob_names = []
-        for local_path, index in frame_paths:
-            blob_name = self.upload_frame(local_path, job_id, index)
-            blob_names.append(blob_name)
-        return blob_names
+        self, frame_paths: list[tuple], job_id: str, on_result=None
+    ) -> list[UploadResult]:
+        """Upload frames in parallel. frame_paths is a list of (local_path, index[, variant]).
+
+        Returns one UploadResult per item, in order, with the blob name or error.
+        """
+        return upload_concurrently(
+            self.upload_frame,
+            frame_paths,
+            job_id,
+            max_workers=self.upload_workers,
+            retries=self.upload_retries,
+            retryable=RETRYABLE_ERRORS,
+            on_result=on_result,
+        )
 
     def write_manifest(self, job_id: str, manifest: dict) -> str:
         """Write job manifest (metadata + frame list) to GCS."""
@@ -34,15 +119,120 @@ class GCSStorage:
             json.dumps(manifest, ensure_ascii=False, indent=2),
             content_type="application/json",
         )
+        self._cache_manifest(job_id, blob.generation, manifest)
         return blob_name
 
     def read_manifest(self, job_id: str) -> dict | None:
-        """Read job manifest from GCS. Returns None if not found."""
-        blob_name = f"{job_id}/manifest.json"
-        blob = self.bucket.blob(blob_name)
-        if not blob.exists():
+        """Read job manifest from GCS. Returns None if not found.
+
+        Costs one GET, conditional on the generation of a cached copy, or
+        none while the cached copy is fresh.
+        """
+        with self._manifests_lock:
+            cached = self._manifests.get(job_id)
+            if cached is not None:
+                self._manifests.move_to_end(job_id)
+        if cached is not None and time.monotonic() - cached[2] < self.manifest_fresh_seconds:
+            return cached[1]
+
+        blob = self.bucket.blob(f"{job_id}/manifest.json")
+        try:
+            if cached is None:
+                data = blob.download_as_bytes()
+            else:
+                data = blob.download_as_bytes(if_generation_not_match=cached[0])
+        except api_exceptions.NotModified:
+            self._cache_manifest(job_id, cached[0], cached[1])
+            return cached[1]
+        except api_exceptions.NotFound:
+            with self._manifests_lock:
+                self._manifests.pop(job_id, None)
             return None
-        return json.loads(blob.download_as_text())
+
+        manifest = json.loads(data)
+        self._cache_manifest(job_id, blob.generation, manifest)
+        return manifest
+
+    def _cache_manifest(self, job_id: str, generation, manifest: dict) -> None:
+        if generation is None or self.manifest_cache_size <= 0:
+            return
+        with self._manifests_lock:
+            self._manifests[job_id] = (int(generation), manifest, time.monotonic())
+            self._manifests.move_to_end(job_id)
+            while len(self._manifests) > self.manifest_cache_size:
+                self._manifests.popitem(last=False)
+
+    def write_profile(self, job_id: str, data: bytes) -> str:
+        """Write a job's cProfile dump (pstats format) next to its manifest."""
+        blob_name = f"{job_id}/profile.prof"
+        self.bucket.blob(blob_name).upload_from_string(
+            data, content_type="application/octet-stream"
+        )
+        return blob_name
+
+    def write_scores(self, name: str, scores: np.ndarray) -> str:
+        """Write a scene detection score series as .npy."""
+        buf = io.BytesIO()
+        np.save(buf, scores)
+        self.bucket.blob(name).upload_from_string(
+            buf.getvalue(), content_type="application/octet-stream"
+        )
+        return name
+
+    def read_scores(self, name: str) -> np.ndarray | None:
+        """Read a score series written by write_scores(). Returns None if not found."""
+        try:
+            data = self.bucket.blob(name).download_as_bytes()
+        except api_exceptions.NotFound:
+            return None
+        return np.load(io.BytesIO(data))
+
+    def acquire_lease(self, job_id: str, owner: str, ttl_seconds: float) -> bool:
+        """Take the job's processing lease unless another owner holds a live one.
+
+        Uses generation preconditions, so exactly one caller wins even when
+        several instances race for the same job.
+        """
+        blob_name = f"{job_id}/lease.json"
+        body = json.dumps({"owner": owner, "expires_at": time.time() + ttl_seconds})
+        try:
+            self.bucket.blob(blob_name).upload_from_string(
+                body, content_type="application/json", if_generation_match=0
+            )
+            return True
+        except api_exceptions.PreconditionFailed:
+            pass
+
+        blob = self.bucket.get_blob(blob_name)
+        if blob is None:
+            return False  # released meanwhile; the caller can retry
+        try:
+            lease = json.loads(blob.download_as_text(if_generation_match=blob.generation))
+        except (api_exceptions.NotFound, api_exceptions.PreconditionFailed):
+            return False
+        if lease.get("owner") != owner and lease.get("expires_at", 0) > time.time():
+            return False
+
+        # Expired (or already ours): take it over if nobody else did first
+        try:
+            blob.upload_from_string(
+                body, content_type="application/json", if_generation_match=blob.generation
+            )
+            return True
+        except api_exceptions.PreconditionFailed:
+            return False
+
+    def release_lease(self, job_id: str, owner: str) -> None:
+        """Drop the job's lease if owner still holds it."""
+        blob = self.bucket.get_blob(f"{job_id}/lease.json")
+        if blob is None:
+            return
+        try:
+            lease = json.loads(blob.download_as_text(if_generation_match=blob.generation))
+            if lease.get("owner") == owner:
+                blob.delete(if_generation_match=blob.generation)
+        except (api_exceptions.NotFound, api_exceptions.PreconditionFailed):
+            pass
 
     def get_signed_url(
         self, blob_name: str, expiration_minutes: int = 60
@@ -60,5 +250,11 @@ class GCSStorage:
 
     def job_exists(self, job_id: str) -> bool:
         """Check if a job manifest exists."""
-        blob = self.bucket.blob(f"{job_id}/manifest.json")
-        return blob.exists()
+        return self.read_manifest(job_id) is not None
+
+
+def _frame_blob_name(local_path: str, job_id: str, index: int, variant: str | None) -> str:
+    """Blob name for a frame, keeping the extension of the encoded file."""
+    ext = os.path.splitext(local_path)[1] or ".png"
+    suffix = f"_{variant}" if variant else ""
+    return f"{job_id}/scene_{index:03d}{suffix}{ext}"
@@ -1,12 +1,42 @@
 import os
+import threading
+
+from config import get_settings
+
+_instances: dict[tuple, object] = {}
+_instances_lock = threading.Lock()
 
 
 def get_storage(bucket_name: str = ""):
-    """Return LocalStorage for local dev, GCSStorage for production."""
-    if os.environ.get("USE_GCS", "").lower() in ("1", "true", "yes"):
+    """Return LocalStorage for local dev, GCSStorage for production.
+
+    Instances are kept per bucket (or directory), so the GCS client's
+    connection pool and the manifest cache live as long as the process.
+    """
+    use_gcs = os.environ.get("USE_GCS", "").lower() in ("1", "true", "yes")
+    base_dir = os.environ.get("FRAMES_DIR", "extracted_frames")
+    key = ("gcs", bucket_name) if use_gcs else ("local", base_dir)
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = _create_storage(use_gcs, bucket_name, base_dir)
+        return _instances[key]
+
+
+def _create_storage(use_gcs: bool, bucket_name: str, base_dir: str):
+    settings = get_settings()
+    if use_gcs:
         from services.storage import GCSStorage
-        return GCSStorage(bucket_name=bucket_name)
+        return GCSStorage(
+            bucket_name=bucket_name,
+            upload_workers=settings.upload_workers,
+            upload_retries=settings.upload_retries,
+            manifest_cache_size=settings.manifest_cache_max_entries,
+            manifest_fresh_seconds=settings.manifest_cache_fresh_seconds,
+        )
     else:
         from services.local_storage import LocalStorage
-        base_dir = os.environ.get("FRAMES_DIR", "extracted_frames")
-        return LocalStorage(base_dir=base_dir)
+        return LocalStorage(
+            base_dir=base_dir,
+            upload_workers=settings.upload_workers,
+            upload_retries=settings.upload_retries,
+        )
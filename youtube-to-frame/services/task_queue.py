@@ -1,23 +1,54 @@
 import json
-
-from google.cloud import tasks_v2
-from google.protobuf import timestamp_pb2
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Callable
 
 
 class TaskQueue:
     def __init__(self, project_id: str, region: str, queue_name: str, worker_url: str):
+        from google.cloud import tasks_v2
+
         self.client = tasks_v2.CloudTasksClient()
         self.parent = self.client.queue_path(project_id, region, queue_name)
         self.worker_url = worker_url
 
-    def enqueue_extraction(self, job_id: str, youtube_url: str, max_frames: int = 20, scene_threshold: float = 30.0) -> str:
+    def enqueue_extraction(
+        self,
+        job_id: str,
+        youtube_url: str,
+        max_frames: int = 20,
+        scene_threshold: float = 30.0,
+        downscale: int | None = None,
+        frame_skip: int | None = None,
+        scene_selection: str | None = None,
+        sharpness_samples: int | None = None,
+        image_format: str | None = None,
+        quality: int | None = None,
+        variants: list[int] | None = None,
+        profile: bool = False,
+    ) -> str:
         """Enqueue a frame extraction task. Returns the task name."""
         payload = {
             "job_id": job_id,
             "youtube_url": youtube_url,
             "max_frames": max_frames,
             "scene_threshold": scene_threshold,
+            "downscale": downscale,
+            "frame_skip": frame_skip,
+            "scene_selection": scene_selection,
+            "sharpness_samples": sharpness_samples,
+            "image_format": image_format,
+            "quality": quality,
+            "variants": variants,
+            "profile": profile,
         }
+        return self._create_task(payload)
+
+    def _create_task(self, payload: dict) -> str:
+        from google.cloud import tasks_v2
 
         task = {
             "http_request": {
@@ -34,3 +65,73 @@ class TaskQueue:
         )
 
         return response.name
+
+
+class LocalTaskQueue(TaskQueue):
+    """Stand-in for Cloud Tasks in local runs and tests.
+
+    Each task is POSTed to {worker_url}/worker/process on a background
+    thread and retried with exponential backoff on any non-2xx response,
+    as Cloud Tasks does. deliveries > 1 sends the same task several times
+    at once to exercise the worker's deduplication. post(url, payload) can
+    replace the HTTP call, e.g. with a TestClient, and must return the
+    status code.
+    """
+
+    def __init__(
+        self,
+        worker_url: str = "http://localhost:8080",
+        post: Callable[[str, dict], int] | None = None,
+        max_attempts: int = 5,
+        backoff: float = 1.0,
+        deliveries: int = 1,
+    ):
+        self.worker_url = worker_url
+        self.post = post or _http_post
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.deliveries = deliveries
+        self.attempts: list[tuple[str, int]] = []  # (task name, status code)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def _create_task(self, payload: dict) -> str:
+        name = f"local-{uuid.uuid4().hex}"
+        for _ in range(self.deliveries):
+            thread = threading.Thread(target=self._deliver, args=(name, payload), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return name
+
+    def join(self, timeout: float | None = None) -> None:
+        """Wait until every delivery has succeeded or run out of attempts."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def _deliver(self, name: str, payload: dict) -> None:
+        url = f"{self.worker_url}/worker/process"
+        for attempt in range(self.max_attempts):
+            try:
+                status = self.post(url, payload)
+            except OSError:
+                status = 0
+            with self._lock:
+                self.attempts.append((name, status))
+            if 200 <= status < 300:
+                return
+            time.sleep(self.backoff * 2**attempt)
+
+
+def _http_post(url: str, payload: dict) -> int:
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req) as res:
+            return res.status
+    except urllib.error.HTTPError as e:
+        return e.code
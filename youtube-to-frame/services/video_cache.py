@@ -0,0 +1,226 @@
+import bisect
+import fcntl
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class KeyframeIndex:
+    """Keyframe positions of a video, in OpenCV frame numbers."""
+
+    fps: float
+    frame_count: int
+    keyframes: list[int]  # sorted, empty if unknown
+
+    def frame_at(self, timestamp: float) -> int:
+        """Frame number shown at timestamp (seconds), clamped to the video."""
+        return min(max(0, int(timestamp * self.fps)), max(0, self.frame_count - 1))
+
+    def keyframe_before(self, frame_number: int) -> int:
+        """The keyframe a decoder has to start from to reach frame_number."""
+        i = bisect.bisect_right(self.keyframes, frame_number)
+        return self.keyframes[i - 1] if i else 0
+
+
+def build_keyframe_index(video_path: str, timeout: float = 60.0) -> KeyframeIndex | None:
+    """Index a video's keyframes from its packets with ffprobe (no decoding).
+
+    Without ffprobe the index has no keyframes, and extraction falls back to
+    FrameExtractor's strategy. Returns None if OpenCV cannot read the file.
+    """
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if not fps:
+        return None
+    unindexed = KeyframeIndex(fps=fps, frame_count=frame_count, keyframes=[])
+
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path,
+    ]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("Cannot index keyframes of %s: %s", video_path, e)
+        return unindexed
+    if proc.returncode != 0:
+        logger.warning("Cannot index keyframes of %s: %s", video_path, proc.stderr.strip())
+        return unindexed
+
+    packets = []
+    for line in proc.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        try:
+            packets.append((float(pts), "K" in flags))
+        except ValueError:
+            continue  # pts N/A
+    if not packets:
+        return unindexed
+
+    # Packets are in decode order; frame numbers follow presentation order
+    packets.sort()
+    keyframes = [n for n, (_, key) in enumerate(packets) if key]
+    return KeyframeIndex(fps=fps, frame_count=len(packets), keyframes=keyframes or [0])
+
+
+@dataclass
+class CachedVideo:
+    path: str
+    meta: dict  # title, duration, channel, video_id
+    index: KeyframeIndex | None = None  # full-resolution videos only
+
+
+class VideoCache:
+    """Downloaded videos kept across jobs, keyed by video id and format.
+
+    fmt is the download profile ("full" or "detect"). Each entry is a
+    directory holding the video, its metadata and, for "full", its keyframe
+    index, so re-extracting a video with other parameters skips the
+    download, and frames at arbitrary timestamps can be decoded from the
+    nearest keyframe. Least recently used entries are evicted once the
+    cache holds more than max_bytes.
+
+    Callers never read from the cache directory itself: checkout()
+    hard-links (or copies) the video into their own directory, so an entry
+    can be evicted at any time without breaking a job that is using it.
+    Adding and evicting entries takes a file lock on the root, so processes
+    on one host can share it.
+    """
+
+    def __init__(self, root: str = "video_cache", max_bytes: int = 5 * 1024**3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, video_id: str, fmt: str = "full") -> CachedVideo | None:
+        """Return the cached entry (path inside the cache), or None."""
+        entry = self._entry(video_id, fmt)
+        try:
+            with open(os.path.join(entry, "entry.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = os.path.join(entry, meta["filename"])
+        try:
+            os.utime(entry)  # most recently used
+        except OSError:
+            return None  # evicted meanwhile
+        index = KeyframeIndex(**meta["index"]) if meta.get("index") else None
+        return CachedVideo(path=path, meta=meta["meta"], index=index)
+
+    def checkout(self, video_id: str, fmt: str, dest_dir: str) -> CachedVideo | None:
+        """Link a cached video into dest_dir and return it there, or None."""
+        cached = self.get(video_id, fmt)
+        if cached is None:
+            return None
+        dest = os.path.join(dest_dir, os.path.basename(cached.path))
+        try:
+            _link_or_copy(cached.path, dest)
+        except FileNotFoundError:
+            return None  # evicted between get() and the link
+        except OSError as e:
+            logger.warning("Cannot use cached video %s: %s", video_id, e)
+            return None
+        cached.path = dest
+        return cached
+
+    def put(self, video_id: str, fmt: str, video_path: str, meta: dict) -> None:
+        """Add a downloaded video (linked or copied, left in place). Never raises."""
+        if not video_id or self.max_bytes <= 0:
+            return
+        entry = self._entry(video_id, fmt)
+        if os.path.exists(entry):
+            return  # another job cached it first
+        staging = os.path.join(self.root, f".staging-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(staging)
+            filename = os.path.basename(video_path)
+            _link_or_copy(video_path, os.path.join(staging, filename))
+            index = build_keyframe_index(os.path.join(staging, filename)) if fmt == "full" else None
+            with open(os.path.join(staging, "entry.json"), "w") as f:
+                json.dump({"filename": filename, "meta": meta, "index": index and asdict(index)}, f)
+
+            with self._locked():
+                if not os.path.exists(entry):
+                    os.replace(staging, entry)
+                self._evict()
+        except OSError as e:
+            logger.warning("Cannot cache video %s: %s", video_id, e)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _entry(self, video_id: str, fmt: str) -> str:
+        return os.path.join(self.root, f"{_safe_name(video_id)}.{_safe_name(fmt)}")
+
+    @contextmanager
+    def _locked(self):
+        """Serialize changes across threads (lock) and processes (flock)."""
+        with self._lock, open(os.path.join(self.root, ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _evict(self) -> None:
+        """Drop least recently used entries beyond max_bytes. Caller holds the lock."""
+        entries = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            entry = os.path.join(self.root, name)
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(entry) if e.is_file())
+                entries.append((os.path.getmtime(entry), size, entry))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+
+        total = 0
+        for _, size, entry in entries:
+            total += size
+            if total > self.max_bytes:
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+def _link_or_copy(src: str, dest: str) -> None:
+    """Hard-link src to dest, copying across filesystems."""
+    try:
+        os.link(src, dest)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def _safe_name(video_id: str) -> str:
+    return "".join(c for c in video_id if c.isalnum() or c in "-_") or "_"
+
+
+_cache: VideoCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_video_cache() -> VideoCache:
+    """Return the process-wide video cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from config import get_settings
+
+            settings = get_settings()
+            _cache = VideoCache(
+                settings.video_cache_dir, max_bytes=settings.video_cache_max_mb * 1024**2
+            )
+        return _cache
@@ -0,0 +1,85 @@
+import functools
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+import pytest
+import yt_dlp
+
+# Keep the app's files out of the working tree; set before settings are read
+_workdir = tempfile.mkdtemp(prefix="mv-frame-tests-")
+os.environ.setdefault("FRAMES_DIR", os.path.join(_workdir, "extracted_frames"))
+os.environ.setdefault("JOB_STORE", "memory")
+os.environ.setdefault("VIDEO_CACHE_DIR", os.path.join(_workdir, "video_cache"))
+os.environ.setdefault("FRAME_VARIANT_CACHE_DIR", os.path.join(_workdir, "frame_variant_cache"))
+
+
+class LocalYouTube:
+    """Videos for the pipeline's Downloader, served from local files by video id.
+
+    A stand-in for YoutubeDL; videos not added fail to download.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.videos: dict[str, str] = {}
+        self.downloads: list[str] = []
+
+    def add(self, video_id: str, scenes: int = 4, frames_per_scene: int = 30) -> None:
+        """A 640x360 video of flat-colored scenes, one hard cut between each."""
+        path = os.path.join(self.root, f"{video_id}.mp4")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (640, 360))
+        rng = np.random.default_rng(len(self.videos))
+        for _ in range(scenes):
+            frame = np.empty((360, 640, 3), np.uint8)
+            frame[:] = rng.integers(0, 255, 3, dtype=np.uint8)
+            for _ in range(frames_per_scene):
+                writer.write(frame)
+        writer.release()
+        self.videos[video_id] = path
+
+    def ydl_class(self, opts: dict):
+        return _LocalYDL(self, opts)
+
+
+class _LocalYDL:
+    def __init__(self, youtube: LocalYouTube, opts: dict):
+        self.youtube = youtube
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def extract_info(self, url, download=False):
+        from services.downloader import Downloader
+
+        video_id = Downloader.extract_video_id(url)
+        return {"id": video_id, "title": "Song", "duration": 4, "channel": "Artist"}
+
+    def process_ie_result(self, info, download=True):
+        self.youtube.downloads.append(info["id"])
+        if info["id"] not in self.youtube.videos:
+            raise yt_dlp.utils.DownloadError("ERROR: Video unavailable")
+        shutil.copyfile(self.youtube.videos[info["id"]], self.opts["outtmpl"])
+
+
+@pytest.fixture
+def youtube(tmp_path, monkeypatch):
+    """Run the extraction pipeline against LocalYouTube, without the video cache."""
+    import services.pipeline as pipeline
+    from config import get_settings
+    from services.downloader import Downloader
+
+    local = LocalYouTube(str(tmp_path / "youtube"))
+    os.makedirs(local.root)
+    monkeypatch.setattr(
+        pipeline, "Downloader", functools.partial(Downloader, ydl_class=local.ydl_class)
+    )
+    monkeypatch.setattr(get_settings(), "download_profile", "full")
+    monkeypatch.setattr(get_settings(), "video_cache_max_mb", 0)
+    return local
@@ -0,0 +1,162 @@
+import os
+
+import pytest
+import yt_dlp
+
+from services.downloader import Downloader
+from services.metadata_cache import MetadataCache
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+def stub_ydl(failing_downloads: int = 0, tag: str = "stub"):
+    """A YoutubeDL stand-in that records calls instead of touching the network.
+
+    Every extract_info() returns a new info dict whose stream URL names the
+    stub's tag and the extraction (1, 2, ...; see stream_of), and
+    process_ie_result() writes a small file where yt-dlp would download, or
+    raises DownloadError for the first failing_downloads calls.
+    """
+    calls = {"extract": [], "process": []}
+
+    class StubYDL:
+        def __init__(self, opts):
+            self.opts = opts
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def extract_info(self, url, download=False):
+            assert download is False
+            calls["extract"].append(url)
+            return {
+                "id": "abcdefghijk",
+                "title": "Song",
+                "duration": 120,
+                "channel": "Artist",
+                "formats": [{
+                    "format_id": "18",
+                    "url": f"https://stream.example/{tag}/{len(calls['extract'])}",
+                    "protocol": "https",
+                }],
+            }
+
+        def process_ie_result(self, info, download=True):
+            calls["process"].append(info)
+            if len(calls["process"]) <= failing_downloads:
+                raise yt_dlp.utils.DownloadError("HTTP Error 403: Forbidden")
+            os.makedirs(os.path.dirname(self.opts["outtmpl"]), exist_ok=True)
+            with open(self.opts["outtmpl"], "wb") as f:
+                f.write(b"video")
+
+    return StubYDL, calls
+
+
+def stream_of(info: dict) -> str:
+    """The "<tag>/<extraction>" an info dict from stub_ydl was extracted as."""
+    return info["formats"][0]["url"].removeprefix("https://stream.example/")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the metadata cache."""
+    now = [1_000_000.0]
+    monkeypatch.setattr("services.metadata_cache.time.time", lambda: now[0])
+    return now
+
+
+def test_one_extraction_per_job_and_info_reused_for_download(tmp_path):
+    ydl, calls = stub_ydl()
+    downloader = Downloader(ydl_class=ydl)
+
+    video = downloader.download(URL, output_dir=str(tmp_path))
+
+    assert calls["extract"] == [URL]
+    assert [stream_of(info) for info in calls["process"]] == ["stub/1"]
+    assert (video.video_id, video.title, video.duration) == ("abcdefghijk", "Song", 120)
+    assert video.filepath == os.path.join(str(tmp_path), "video.mp4")
+    assert video.downloaded_bytes == len(b"video")
+
+
+def test_metadata_cache_hit_skips_extraction(tmp_path, clock):
+    ydl, calls = stub_ydl()
+    downloader = Downloader(metadata_cache=MetadataCache(ttl_seconds=60), ydl_class=ydl)
+
+    downloader.download(URL, output_dir=str(tmp_path / "a"))
+    downloader.download(URL, output_dir=str(tmp_path / "b"))
+
+    assert len(calls["extract"]) == 1
+    assert [stream_of(info) for info in calls["process"]] == ["stub/1", "stub/1"]
+
+
+def test_metadata_cache_entry_expires_after_ttl(tmp_path, clock):
+    ydl, calls = stub_ydl()
+    downloader = Downloader(metadata_cache=MetadataCache(ttl_seconds=60), ydl_class=ydl)
+
+    downloader.download(URL, output_dir=str(tmp_path / "a"))
+    clock[0] += 59
+    downloader.download(URL, output_dir=str(tmp_path / "b"))
+    clock[0] += 2
+    downloader.download(URL, output_dir=str(tmp_path / "c"))
+
+    assert len(calls["extract"]) == 2
+    assert [stream_of(info) for info in calls["process"]] == ["stub/1", "stub/1", "stub/2"]
+
+
+def test_download_error_on_cached_info_invalidates_and_retries(tmp_path, clock):
+    cache = MetadataCache(ttl_seconds=60)
+    ydl, calls = stub_ydl(tag="first")
+    Downloader(metadata_cache=cache, ydl_class=ydl).download(URL, output_dir=str(tmp_path / "a"))
+
+    # The cached stream URLs have expired by the next job
+    ydl, calls = stub_ydl(failing_downloads=1, tag="fresh")
+    video = Downloader(metadata_cache=cache, ydl_class=ydl).download(
+        URL, output_dir=str(tmp_path / "b")
+    )
+
+    assert len(calls["extract"]) == 1
+    assert [stream_of(info) for info in calls["process"]] == ["first/1", "fresh/1"]
+    assert stream_of(cache.peek("abcdefghijk")) == "fresh/1"
+    assert os.path.exists(video.filepath)
+
+
+def test_download_error_on_fresh_info_is_not_retried(tmp_path):
+    ydl, calls = stub_ydl(failing_downloads=1)
+    downloader = Downloader(metadata_cache=MetadataCache(), ydl_class=ydl)
+
+    with pytest.raises(yt_dlp.utils.DownloadError):
+        downloader.download(URL, output_dir=str(tmp_path))
+
+    assert len(calls["extract"]) == 1
+    assert len(calls["process"]) == 1
+
+
+def test_cached_metadata_rejects_long_video_without_extraction(clock):
+    cache = MetadataCache()
+    cache.put("abcdefghijk", {"id": "abcdefghijk", "duration": 900})
+    ydl, calls = stub_ydl()
+
+    with pytest.raises(ValueError, match="exceeds limit"):
+        Downloader(max_duration=600, metadata_cache=cache, ydl_class=ydl).check_cached(URL)
+
+    assert calls["extract"] == []
+
+
+def test_pick_stream_takes_only_plain_http_formats():
+    formats = [
+        {"url": "u1", "vcodec": "avc1", "height": 1080, "protocol": "http_dash_segments"},
+        {"url": "u2", "vcodec": "avc1", "height": 1080, "protocol": "m3u8_native"},
+        {"url": "u3", "vcodec": "avc1", "height": 1080, "protocol": None},
+        {"url": "u4", "vcodec": "avc1", "height": 2160, "protocol": "https"},
+        {"url": "u5", "vcodec": "avc1", "height": 720, "protocol": "https", "fps": 30},
+        {"url": "u6", "vcodec": "avc1", "height": 480, "protocol": "http"},
+        {"url": "u7", "vcodec": "avc1", "height": 720},
+    ]
+
+    stream = Downloader._pick_stream(formats, max_height=1080)
+
+    assert (stream["url"], stream["fps"]) == ("u5", 30)
+    assert Downloader._pick_stream(formats[:3], max_height=1080) is None
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+import pytest
+import yt_dlp
+from fastapi.testclient import TestClient
+
+from main import app
+from services.downloader import Downloader
+from services.job_store import get_job_store
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def job_id():
+    """A completed job for a 60s video that is not in the video cache."""
+    get_job_store().put("exact-job", {
+        "status": "completed",
+        "created_at": datetime.now(timezone.utc),
+        "video_info": {"title": "Song", "duration": 60, "channel": "Artist",
+                       "video_id": "notcached00"},
+        "completed_at": datetime.now(timezone.utc),
+    })
+    yield "exact-job"
+    get_job_store().delete("exact-job")
+
+
+def test_timestamp_beyond_duration_is_rejected(job_id):
+    response = client.post(f"/api/jobs/{job_id}/frames", json={"timestamps": [30.0, 61.5]})
+
+    assert response.status_code == 400
+    assert "61.5" in response.json()["detail"]
+
+
+def test_timestamp_in_the_last_fractional_second_is_accepted(job_id, monkeypatch):
+    monkeypatch.setattr(Downloader, "get_full_stream", lambda self, url: None)
+
+    response = client.post(f"/api/jobs/{job_id}/frames", json={"timestamps": [60.6]})
+
+    assert response.status_code == 409  # past validation, no stream to fetch from
+
+
+def test_negative_timestamp_is_rejected(job_id):
+    response = client.post(f"/api/jobs/{job_id}/frames", json={"timestamps": [-1.0]})
+
+    assert response.status_code == 422
+
+
+def test_upstream_fetch_failure_is_502(job_id, monkeypatch):
+    def unavailable(self, url):
+        raise yt_dlp.utils.DownloadError("ERROR: Video unavailable")
+
+    monkeypatch.setattr(Downloader, "get_full_stream", unavailable)
+
+    response = client.post(f"/api/jobs/{job_id}/frames", json={"timestamps": [1.0]})
+
+    assert response.status_code == 502
+    assert "Video unavailable" in response.json()["detail"]
+
+
+def test_video_over_duration_limit_is_400(job_id, monkeypatch):
+    def too_long(self, url):
+        raise ValueError("Video duration (900s) exceeds limit (600s)")
+
+    monkeypatch.setattr(Downloader, "get_full_stream", too_long)
+
+    response = client.post(f"/api/jobs/{job_id}/frames", json={"timestamps": [1.0]})
+
+    assert response.status_code == 400
+
+
+def test_stream_without_seekable_format_is_409(job_id, monkeypatch):
+    monkeypatch.setattr(Downloader, "get_full_stream", lambda self, url: None)
+
+    response = client.post(f"/api/jobs/{job_id}/frames", json={"timestamps": [1.0]})
+
+    assert response.status_code == 409
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import services.frame_extractor as frame_extractor
+from services.frame_extractor import FrameExtractor
+from services.scene_detector import Scene
+
+SCENE = Scene(index=0, start_time=10.0, end_time=12.0, mid_time=11.0, duration=2.0)
+
+
+def frame(sharp: bool) -> np.ndarray:
+    image = np.full((36, 64, 3), 128, dtype=np.uint8)
+    if sharp:
+        image[::2] = 0  # stripes: high Laplacian variance
+    return image
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    """Record remote fetches instead of running ffmpeg."""
+    calls = {"single": [], "many": []}
+
+    def fetch_one(stream, timestamp, timeout=60.0):
+        calls["single"].append(timestamp)
+        return frame(sharp=False)
+
+    def fetch_many(stream, numbers, fps, timeout=120.0):
+        calls["many"].append(numbers)
+        return [frame(sharp=i == 2) for i in range(len(numbers))]
+
+    monkeypatch.setattr(frame_extractor, "_fetch_remote_frame", fetch_one)
+    monkeypatch.setattr(frame_extractor, "_fetch_remote_frames", fetch_many)
+    return calls
+
+
+def test_remote_sharpness_without_fps_falls_back_to_midpoint(tmp_path, remote):
+    extractor = FrameExtractor(sharpness_samples=5)
+
+    frames = extractor.extract_remote({"url": "http://video", "fps": None}, [SCENE], str(tmp_path))
+
+    assert remote == {"single": [11.0], "many": []}
+    assert [(f.index, f.timestamp, f.sharpness) for f in frames] == [(0, 11.0, None)]
+
+
+def test_remote_sharpness_picks_sharpest_sample(tmp_path, remote):
+    extractor = FrameExtractor(sharpness_samples=5)
+
+    frames = extractor.extract_remote({"url": "http://video", "fps": 25.0}, [SCENE], str(tmp_path))
+
+    [numbers] = remote["many"]
+    assert len(numbers) == 5 and remote["single"] == []
+    assert frames[0].timestamp == numbers[2] / 25.0
+    assert frames[0].sharpness > 0
@@ -0,0 +1,122 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+import services.storage as gcs_storage
+from benchmarks.fake_gcs import FakeGCS
+from services.local_storage import LocalStorage
+from services.storage import GCSStorage
+
+
+@pytest.fixture
+def frames(tmp_path):
+    """Twelve small frame files, as (local_path, index) upload items."""
+    items = []
+    for index in range(12):
+        path = tmp_path / f"frame_{index}.png"
+        path.write_bytes(b"png-%d" % index)
+        items.append((str(path), index))
+    return items
+
+
+@pytest.fixture
+def fake_gcs(monkeypatch):
+    with FakeGCS(latency=0.05) as fake:
+        monkeypatch.setenv("STORAGE_EMULATOR_HOST", fake.url)
+        # A fresh shared client, pointed at this endpoint
+        monkeypatch.setattr(gcs_storage, "_client", None)
+        monkeypatch.setattr(gcs_storage, "_client_pool_size", 0)
+        yield fake
+
+
+def test_gcs_upload_is_bounded_by_upload_workers(fake_gcs, frames):
+    storage = GCSStorage("bucket", upload_workers=3)
+
+    results = storage.upload_frames(frames, "job")
+
+    assert [r.blob_name for r in results] == [f"job/scene_{i:03d}.png" for i in range(12)]
+    assert all(r.ok and r.attempts == 1 for r in results)
+    assert fake_gcs.objects["bucket/job/scene_005.png"][1] == b"png-5"
+    assert 1 < fake_gcs.max_in_flight <= 3
+
+
+def test_gcs_upload_retries_after_503(fake_gcs, frames):
+    fake_gcs.failures["job/scene_001.png"] = [503]
+    storage = GCSStorage("bucket", upload_workers=4)
+
+    results = storage.upload_frames(frames, "job")
+
+    assert all(r.ok for r in results)
+    assert results[1].attempts == 2
+    assert fake_gcs.objects["bucket/job/scene_001.png"][1] == b"png-1"
+
+
+def test_gcs_upload_reports_errors_per_blob(fake_gcs, frames):
+    fake_gcs.failures["job/scene_002.png"] = [403]  # not retryable
+    fake_gcs.failures["job/scene_007.png"] = [503, 503]  # retries run out
+    storage = GCSStorage("bucket", upload_workers=4, upload_retries=1)
+
+    results = storage.upload_frames(frames, "job")
+
+    failed = {r.index: r for r in results if not r.ok}
+    assert sorted(failed) == [2, 7]
+    assert failed[2].attempts == 1 and "Forbidden" in failed[2].error
+    assert failed[7].attempts == 2 and "ServiceUnavailable" in failed[7].error
+    assert "bucket/job/scene_002.png" not in fake_gcs.objects
+    assert sum(r.ok for r in results) == 10
+
+
+def test_gcs_upload_reports_each_result_as_it_finishes(fake_gcs, frames):
+    storage = GCSStorage("bucket", upload_workers=4)
+    seen = []
+
+    results = storage.upload_frames(frames, "job", on_result=seen.append)
+
+    assert sorted(r.index for r in seen) == list(range(12))
+    assert {id(r) for r in seen} == {id(r) for r in results}
+
+
+def test_local_upload_is_bounded_by_upload_workers(tmp_path, frames, monkeypatch):
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, max
+
+    def slow_copy(src, dst):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.02)
+        shutil.copyfile(src, dst)
+        with lock:
+            in_flight[0] -= 1
+
+    monkeypatch.setattr("services.local_storage.shutil.copy2", slow_copy)
+    storage = LocalStorage(base_dir=str(tmp_path / "out"), upload_workers=3)
+
+    results = storage.upload_frames(frames, "job")
+
+    assert all(r.ok for r in results)
+    assert (tmp_path / "out" / "job" / "scene_004.png").read_bytes() == b"png-4"
+    assert 1 < in_flight[1] <= 3
+
+
+def test_local_upload_retries_and_reports_errors_per_blob(tmp_path, frames, monkeypatch):
+    copy = shutil.copy2
+    flaky = {frames[1][0]: 1}  # fails once
+
+    def flaky_copy(src, dst):
+        if flaky.get(src):
+            flaky[src] -= 1
+            raise OSError("disk busy")
+        return copy(src, dst)
+
+    monkeypatch.setattr("services.local_storage.shutil.copy2", flaky_copy)
+    storage = LocalStorage(base_dir=str(tmp_path / "out"), upload_retries=1)
+    items = frames[:3] + [(str(tmp_path / "missing.png"), 3)]
+
+    results = storage.upload_frames(items, "job")
+
+    assert [r.ok for r in results] == [True, True, True, False]
+    assert results[1].attempts == 2
+    assert results[3].attempts == 2 and "FileNotFoundError" in results[3].error
@@ -0,0 +1,90 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def write_frame(path: str, value: int) -> None:
+    image = np.full((360, 640, 3), value, dtype=np.uint8)
+    assert cv2.imwrite(path, image)
+
+
+@pytest.fixture
+def frame():
+    """A frame of a job in FRAMES_DIR; returns its /frames path and file path."""
+    job_dir = os.path.join(os.environ["FRAMES_DIR"], "frames-job")
+    os.makedirs(job_dir, exist_ok=True)
+    path = os.path.join(job_dir, "scene_000.png")
+    write_frame(path, 100)
+    return "/frames/frames-job/scene_000.png", path
+
+
+def test_frame_has_content_etag_and_short_cache(frame):
+    url, _ = frame
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"] == "public, max-age=60, must-revalidate"
+    assert "immutable" not in response.headers["cache-control"]
+    etag = response.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": f"W/{etag}, \"other\""}).status_code == 304
+
+
+def test_rewritten_frame_gets_new_etag(frame):
+    url, path = frame
+    old = client.get(url).headers["etag"]
+
+    write_frame(path, 200)  # the job ran again
+
+    response = client.get(url, headers={"If-None-Match": old})
+    assert response.status_code == 200
+    assert response.headers["etag"] != old
+
+
+def test_same_content_keeps_its_etag(frame):
+    url, path = frame
+    old = client.get(url).headers["etag"]
+
+    write_frame(path, 100)  # rewritten, same bytes
+
+    assert client.get(url, headers={"If-None-Match": old}).status_code == 304
+
+
+def test_resized_variant_follows_source_content(frame):
+    url, path = frame
+
+    small = client.get(f"{url}?width=320&format=jpeg")
+    image = cv2.imdecode(np.frombuffer(small.content, np.uint8), cv2.IMREAD_COLOR)
+    assert small.headers["content-type"] == "image/jpeg"
+    assert image.shape[:2] == (180, 320)
+
+    write_frame(path, 200)
+    changed = client.get(f"{url}?width=320&format=jpeg")
+    assert changed.headers["etag"] != small.headers["etag"]
+    assert changed.content != small.content
+
+
+def test_other_job_files_are_revalidated(frame):
+    job_dir = os.path.dirname(frame[1])
+    with open(os.path.join(job_dir, "manifest.json"), "w") as f:
+        f.write("{}")
+
+    response = client.get("/frames/frames-job/manifest.json")
+
+    assert response.headers["cache-control"] == "no-cache"
+    assert client.get("/frames/frames-job/manifest.json?width=100").status_code == 400
+
+
+def test_paths_outside_frames_dir_are_not_served(frame):
+    assert client.get("/frames/../config.py").status_code == 404
+    assert client.get("/frames/frames-job/%2e%2e/%2e%2e/config.py").status_code == 404
+    assert client.get("/frames/frames-job/missing.png").status_code == 404
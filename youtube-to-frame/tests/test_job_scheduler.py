@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from services.job_scheduler import JobScheduler, QueueFullError
+
+
+def blocking_job(started: list[str], release: threading.Event):
+    def run(job_id: str) -> None:
+        started.append(job_id)
+        release.wait(10)
+
+    return run
+
+
+def test_batch_jobs_leave_a_worker_for_interactive_ones():
+    scheduler = JobScheduler(workers=2, batch_share=1.0)
+    started, release = [], threading.Event()
+    run = blocking_job(started, release)
+
+    scheduler.submit_batch("batch", [(f"b{i}", run, (f"b{i}",)) for i in range(3)])
+    scheduler.submit("interactive", run, "interactive")
+    try:
+        assert scheduler.batch_slots == 1
+        while len(started) < 2:
+            time.sleep(0.01)
+        assert sorted(started) == ["b0", "interactive"]
+    finally:
+        release.set()
+        assert scheduler.shutdown(10) == []
+    assert sorted(started) == ["b0", "b1", "b2", "interactive"]
+
+
+def test_single_worker_runs_batches_after_interactive_jobs():
+    scheduler = JobScheduler(workers=1, batch_share=0.5)
+    started, release = [], threading.Event()
+    run = blocking_job(started, release)
+
+    scheduler.submit("first", run, "first")
+    while not started:
+        time.sleep(0.01)
+    scheduler.submit_batch("batch", [("b0", run, ("b0",))])
+    scheduler.submit("second", run, "second")
+    release.set()
+
+    assert scheduler.batch_slots == 1
+    assert scheduler.shutdown(10) == []
+    assert started == ["first", "second", "b0"]
+
+
+def test_zero_queue_accepts_jobs_while_workers_are_idle():
+    scheduler = JobScheduler(workers=2, max_queue=0, max_batch_queue=0)
+    started, release = [], threading.Event()
+    run = blocking_job(started, release)
+
+    scheduler.submit("a", run, "a")
+    scheduler.submit_batch("batch", [("b0", run, ("b0",))])
+    try:
+        while len(started) < 2:
+            time.sleep(0.01)
+        with pytest.raises(QueueFullError):
+            scheduler.submit("c", run, "c")
+        with pytest.raises(QueueFullError):
+            scheduler.submit_batch("batch", [("b1", run, ("b1",))])
+    finally:
+        release.set()
+        assert scheduler.shutdown(10) == []
+    assert sorted(started) == ["a", "b0"]
@@ -0,0 +1,63 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from services.job_store import ABANDONED_ERROR, SQLiteJobStore
+
+
+def new_job(status: str = "queued") -> dict:
+    return {"status": status, "created_at": datetime.now(timezone.utc)}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def test_claim_shares_a_job_whose_owner_is_alive(path):
+    first, second = SQLiteJobStore(path), SQLiteJobStore(path)
+
+    assert first.claim("job", new_job())
+    first.update("job", status="downloading")
+
+    assert not second.claim("job", new_job())
+    assert second.get("job")["status"] == "downloading"
+
+
+def test_claim_replaces_a_finished_job(path):
+    first, second = SQLiteJobStore(path), SQLiteJobStore(path)
+    first.claim("job", new_job())
+    first.update("job", status="failed", error="boom")
+
+    assert second.claim("job", new_job())
+    assert second.get("job")["status"] == "queued"
+
+
+def test_heartbeat_keeps_a_long_running_job_owned(path):
+    first = SQLiteJobStore(path, stale_seconds=0.3)
+    second = SQLiteJobStore(path, stale_seconds=0.3)
+    first.claim("job", new_job())
+    first.update("job", status="detecting_scenes")
+
+    time.sleep(0.8)  # several stale windows, no updates from the job
+
+    assert second.get("job")["status"] == "detecting_scenes"
+    assert not second.claim("job", new_job())
+
+
+def test_job_of_a_dead_process_reads_failed_and_is_taken_over(path):
+    crashed = SQLiteJobStore(path, stale_seconds=60)
+    crashed.claim("job", new_job())
+    crashed.update("job", status="downloading")
+    # The process died: nothing renews the heartbeat any more
+    crashed._conn().execute("UPDATE jobs SET heartbeat_at = ?", (time.time() - 61,))
+
+    second = SQLiteJobStore(path, stale_seconds=60)
+    job = second.get("job")
+    assert (job["status"], job["error"]) == ("failed", ABANDONED_ERROR)
+    assert second.get_many(["job"])["job"]["status"] == "failed"
+
+    assert second.claim("job", new_job())
+    assert second.get("job")["status"] == "queued"
+    assert not crashed.claim("job", new_job())  # now owned by a live process
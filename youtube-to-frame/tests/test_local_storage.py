@@ -0,0 +1,62 @@
+import json
+import threading
+
+from services.local_storage import LocalStorage
+
+
+def test_manifest_readers_never_see_a_partial_write(tmp_path):
+    storage = LocalStorage(base_dir=str(tmp_path))
+    frames = [{"index": i, "url": f"/frames/job/scene_{i:03d}.png"} for i in range(2000)]
+    storage.write_manifest("job", {"job_id": "job", "frames": frames, "version": 0})
+    done = threading.Event()
+    seen = []
+
+    def read():
+        while not done.is_set():
+            seen.append(storage.read_manifest("job")["version"])
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for version in range(1, 30):
+            storage.write_manifest("job", {"job_id": "job", "frames": frames, "version": version})
+    finally:
+        done.set()
+        reader.join()
+
+    assert seen and seen == sorted(seen)
+    assert [p.name for p in (tmp_path / "job").iterdir()] == ["manifest.json"]
+
+
+def test_one_caller_takes_over_an_expired_lease(tmp_path):
+    storage = LocalStorage(base_dir=str(tmp_path))
+    assert storage.acquire_lease("job", "crashed", ttl_seconds=-1)
+    start = threading.Barrier(16)
+    won = []
+
+    def take(owner: str):
+        start.wait()
+        if storage.acquire_lease("job", owner, ttl_seconds=60):
+            won.append(owner)
+
+    threads = [threading.Thread(target=take, args=(f"w{i}",)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(won) == 1
+    lease = json.loads((tmp_path / "job" / "lease.json").read_text())
+    assert lease["owner"] == won[0]
+
+
+def test_lease_is_released_by_its_owner_only(tmp_path):
+    storage = LocalStorage(base_dir=str(tmp_path))
+    assert storage.acquire_lease("job", "a", ttl_seconds=60)
+    assert storage.acquire_lease("job", "a", ttl_seconds=60)
+
+    storage.release_lease("job", "b")
+    assert not storage.acquire_lease("job", "b", ttl_seconds=60)
+
+    storage.release_lease("job", "a")
+    assert storage.acquire_lease("job", "b", ttl_seconds=60)
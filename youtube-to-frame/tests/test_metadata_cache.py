@@ -0,0 +1,55 @@
+from services.metadata_cache import MetadataCache
+
+
+def full_info() -> dict:
+    """A yt-dlp info dict with the bulky parts a real one has."""
+    return {
+        "id": "abcdefghijk",
+        "title": "Song",
+        "duration": 120,
+        "channel": "Artist",
+        "extractor": "youtube",
+        "description": "x" * 10_000,
+        "thumbnails": [{"url": f"https://i.example/{i}.jpg"} for i in range(40)],
+        "subtitles": {"en": [{"url": "https://s.example/en.vtt"}]},
+        "automatic_captions": {f"l{i}": [{"url": "https://s.example/a.vtt"}] for i in range(100)},
+        "formats": [
+            {
+                "format_id": "137", "url": "https://v.example/137", "protocol": "https",
+                "vcodec": "avc1", "acodec": "none", "height": 1080, "fps": 30,
+                "http_headers": {"User-Agent": "ua"}, "downloader_options": {"http_chunk_size": 1},
+                "format_index": None, "rows": 1,
+            },
+            {
+                "format_id": "sb0", "url": "https://v.example/sb", "protocol": "mhtml",
+                "fragments": [{"url": f"https://v.example/sb/{i}"} for i in range(300)],
+            },
+        ],
+    }
+
+
+def test_entries_keep_only_what_the_downloader_uses():
+    cache = MetadataCache()
+
+    cache.put("abcdefghijk", full_info())
+    info = cache.peek("abcdefghijk")
+
+    assert set(info) == {"id", "title", "duration", "channel", "extractor", "formats"}
+    assert info["formats"] == [{
+        "format_id": "137", "url": "https://v.example/137", "protocol": "https",
+        "vcodec": "avc1", "acodec": "none", "height": 1080, "fps": 30,
+        "http_headers": {"User-Agent": "ua"}, "downloader_options": {"http_chunk_size": 1},
+    }]
+
+
+def test_callers_get_their_own_copy():
+    cache = MetadataCache()
+    original = full_info()
+    cache.put("abcdefghijk", original)
+    original["formats"][0]["http_headers"]["User-Agent"] = "changed"
+
+    info = cache.get("abcdefghijk")
+    info["formats"][0]["url"] = "mutated by yt-dlp"
+
+    assert cache.peek("abcdefghijk")["formats"][0]["url"] == "https://v.example/137"
+    assert cache.peek("abcdefghijk")["formats"][0]["http_headers"] == {"User-Agent": "ua"}
@@ -0,0 +1,74 @@
+import pytest
+
+from models.schemas import ExtractRequest
+from routers.extract import _process_video
+from services.job_store import get_job_store
+from services.pipeline import ExtractionFailed, run_extraction
+from services.storage_factory import get_storage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Local storage in tmp_path, recording every manifest write."""
+    monkeypatch.setenv("FRAMES_DIR", str(tmp_path / "frames"))
+    storage = get_storage()
+    writes = []
+    write = storage.write_manifest
+
+    def recording_write(job_id, manifest):
+        writes.append((job_id, manifest.get("stats")))
+        return write(job_id, manifest)
+
+    monkeypatch.setattr(storage, "write_manifest", recording_write)
+    storage.writes = writes
+    return storage
+
+
+def request(video_id: str, **params) -> ExtractRequest:
+    return ExtractRequest(youtube_url=f"https://www.youtube.com/watch?v={video_id}", **params)
+
+
+def test_manifest_is_written_once_with_its_stats(youtube, storage):
+    youtube.add("pipeline001")
+
+    manifest, stats = run_extraction("job", request("pipeline001", max_frames=3), "api")
+
+    assert storage.writes == [("job", manifest["stats"])]
+    assert storage.read_manifest("job") == manifest
+    assert list(manifest["stats"]["stages"]) == ["download", "detect", "extract", "upload"]
+    assert list(stats["stages"]) == ["download", "detect", "extract", "upload", "manifest"]
+    assert stats["total_seconds"] >= manifest["stats"]["total_seconds"]
+    assert manifest["total_frames"] == 3
+
+
+def test_explicit_params_are_used_as_given(youtube, storage):
+    youtube.add("pipeline002")
+
+    manifest, _ = run_extraction(
+        "job", request("pipeline002", max_frames=2, image_format="jpeg", variants=[180]), "worker"
+    )
+
+    assert [frame["format"] for frame in manifest["frames"]] == ["jpeg", "jpeg"]
+    assert all(set(frame["variants"]) == {"180p"} for frame in manifest["frames"])
+
+
+def test_failure_carries_stats_of_the_stages_run(youtube, storage):
+    with pytest.raises(ExtractionFailed, match="Video unavailable") as failed:
+        run_extraction("job", request("unavailable"), "api")
+
+    assert list(failed.value.stats["stages"]) == ["download"]
+    assert storage.writes == []
+
+
+def test_api_job_records_manifest_write_in_the_job_store(youtube, storage):
+    youtube.add("pipeline003")
+    jobs = get_job_store()
+    jobs.put("api-job", {"status": "queued", "frames": [], "total_frames": 0})
+
+    _process_video("api-job", request("pipeline003", max_frames=3))
+
+    job = jobs.get("api-job")
+    assert job["status"] == "completed"
+    assert job["total_frames"] == 3
+    assert "manifest" in job["stats"]["stages"]
+    assert len(storage.writes) == 1
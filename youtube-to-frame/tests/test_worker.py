@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import routers.worker as worker
+from config import get_settings
+from main import app
+from services.storage_factory import get_storage
+from services.task_queue import LocalTaskQueue
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+class StubPipeline:
+    """Stands in for _run_extraction: blocks until released, then writes a manifest."""
+
+    def __init__(self):
+        self.runs: list[str] = []
+        self.release = threading.Event()
+
+    def __call__(self, task) -> dict:
+        job_id = task.job_id
+        self.runs.append(job_id)
+        assert self.release.wait(10)
+        manifest = {"job_id": job_id, "frames": [], "total_frames": 3, "completed_at": "now"}
+        get_storage().write_manifest(job_id, manifest)
+        return {"status": "completed", "job_id": job_id, "total_frames": 3}
+
+
+@pytest.fixture
+def worker_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("FRAMES_DIR", str(tmp_path))
+    # A fresh worker pool, sized by the test's settings
+    monkeypatch.setattr(worker, "_executor", None)
+    monkeypatch.setattr(worker, "_slots", None)
+    monkeypatch.setattr(get_settings(), "worker_retry_after", 7)
+    return tmp_path
+
+
+@pytest.fixture
+def pipeline(worker_env, monkeypatch):
+    stub = StubPipeline()
+    monkeypatch.setattr(worker, "_run_extraction", stub)
+    yield stub
+    stub.release.set()
+
+
+@pytest.fixture
+def deliveries():
+    """LocalTaskQueue factory posting through a TestClient; records every response."""
+    responses = []
+    with TestClient(app) as client:
+
+        def post(url: str, payload: dict) -> int:
+            response = client.post("/worker/process", json=payload)
+            responses.append((payload["job_id"], response))
+            return response.status_code
+
+        def queue(count: int, max_attempts: int = 8) -> LocalTaskQueue:
+            return LocalTaskQueue(
+                post=post, backoff=0.05, max_attempts=max_attempts, deliveries=count
+            )
+
+        yield queue, responses
+
+
+def wait_for(condition, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_completed_manifest_short_circuits(pipeline, deliveries):
+    queue, responses = deliveries
+    get_storage().write_manifest("done", {"job_id": "done", "frames": [], "total_frames": 5})
+
+    tasks = queue(3)
+    tasks.enqueue_extraction("done", URL)
+    tasks.join(10)
+
+    assert pipeline.runs == []
+    assert [r.status_code for _, r in responses] == [200, 200, 200]
+    assert all(r.json() == {"status": "completed", "job_id": "done", "total_frames": 5}
+               for _, r in responses)
+
+
+def test_duplicate_delivery_of_running_job_gets_409(pipeline, deliveries, monkeypatch):
+    monkeypatch.setattr(get_settings(), "worker_concurrency", 2)
+    queue, responses = deliveries
+
+    tasks = queue(2)
+    tasks.enqueue_extraction("job", URL)
+    wait_for(lambda: any(r.status_code == 409 for _, r in responses))
+    pipeline.release.set()
+    tasks.join(10)
+
+    conflict = next(r for _, r in responses if r.status_code == 409)
+    assert conflict.headers["Retry-After"] == "7"
+    # Ran once; the duplicate is acknowledged from the manifest on retry
+    assert pipeline.runs == ["job"]
+    assert [r.status_code for _, r in responses].count(200) == 2
+
+
+def test_full_pool_gets_429(pipeline, deliveries, monkeypatch):
+    monkeypatch.setattr(get_settings(), "worker_concurrency", 1)
+    queue, responses = deliveries
+
+    first, second = queue(1), queue(1)
+    first.enqueue_extraction("job-a", URL)
+    wait_for(lambda: pipeline.runs == ["job-a"])
+    second.enqueue_extraction("job-b", URL)
+    wait_for(lambda: any(r.status_code == 429 for _, r in responses))
+    pipeline.release.set()
+    first.join(10)
+    second.join(10)
+
+    busy = next(r for _, r in responses if r.status_code == 429)
+    assert busy.headers["Retry-After"] == "7"
+    assert {job_id for job_id, r in responses if r.status_code == 429} == {"job-b"}
+    assert pipeline.runs == ["job-a", "job-b"]
+    assert all(status == 200 for _, status in final_statuses(first, second))
+
+
+def final_statuses(*queues: LocalTaskQueue) -> list[tuple[str, int]]:
+    """The final attempt of each task."""
+    last = {}
+    for tasks in queues:
+        for name, status in tasks.attempts:
+            last[name] = status
+    return list(last.items())
+
+
+def test_job_finished_while_waiting_for_the_lease_is_not_rerun(pipeline, deliveries, monkeypatch):
+    queue, responses = deliveries
+    storage = get_storage()
+    acquire = storage.acquire_lease
+
+    def acquire_after_other_delivery(job_id, owner, ttl_seconds):
+        # The delivery that held the lease completes the job just before ours gets it
+        storage.write_manifest(job_id, {"job_id": job_id, "frames": [], "total_frames": 4})
+        return acquire(job_id, owner, ttl_seconds)
+
+    monkeypatch.setattr(storage, "acquire_lease", acquire_after_other_delivery)
+
+    tasks = queue(1)
+    tasks.enqueue_extraction("late", URL)
+    tasks.join(10)
+
+    assert pipeline.runs == []
+    assert [r.json() for _, r in responses] == [
+        {"status": "completed", "job_id": "late", "total_frames": 4}
+    ]
+    assert acquire("late", "next", 60)  # released
+
+
+def test_delivery_runs_the_pipeline_once(worker_env, youtube, deliveries):
+    youtube.add("workerjob01")
+    queue, responses = deliveries
+
+    tasks = queue(2)
+    tasks.enqueue_extraction(
+        "real", "https://www.youtube.com/watch?v=workerjob01", max_frames=3,
+        image_format="jpeg", quality=80,
+    )
+    tasks.join(30)
+
+    assert youtube.downloads == ["workerjob01"]
+    # The duplicate waits out the lease (409), then is acknowledged from the manifest
+    assert {r.status_code for _, r in responses} <= {200, 409}
+    assert [r.status_code for _, r in responses].count(200) == 2
+    assert {r.json()["total_frames"] for _, r in responses if r.status_code == 200} == {3}
+    with open(worker_env / "real" / "manifest.json") as f:
+        manifest = json.load(f)
+    assert manifest["video_info"]["video_id"] == "workerjob01"
+    assert [frame["format"] for frame in manifest["frames"]] == ["jpeg"] * 3
+    assert all(
+        os.path.exists(worker_env / frame["url"].removeprefix("/frames/"))
+        for frame in manifest["frames"]
+    )
+    assert list(manifest["stats"]["stages"]) == ["download", "detect", "extract", "upload"]
+    assert manifest["stats"]["frames_decoded"] > 0
+
+
+def test_failed_delivery_writes_an_error_manifest(worker_env, youtube, deliveries):
+    queue, responses = deliveries
+
+    tasks = queue(1, max_attempts=1)
+    tasks.enqueue_extraction("broken", "https://www.youtube.com/watch?v=unavailable")
+    tasks.join(30)
+
+    assert [r.status_code for _, r in responses] == [500]
+    assert "Video unavailable" in responses[0][1].json()["detail"]
+    with open(worker_env / "broken" / "manifest.json") as f:
+        manifest = json.load(f)
+    assert manifest["status"] == "failed"
+    assert list(manifest["stats"]["stages"]) == ["download"]